@@ -0,0 +1,111 @@
+"""Compressed NDJSON responses for the offline delta endpoints."""
+
+from __future__ import annotations
+
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.delta import SyncToken, delta_page
+
+try:  # optional brotli encoding
+    import brotli
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+NDJSON = "application/x-ndjson"
+
+# Uncompressed bytes collected before a chunk is compressed and sent
+CHUNK_SIZE = 64 * 1024
+
+
+def _accepted(request: Request) -> set[str]:
+    """Content codings of ``Accept-Encoding`` that are not refused with ``q=0``."""
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+    buffer: list[bytes] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _compressed(
+    chunks: Iterable[bytes], compress: Callable[[bytes], bytes], finish: Callable[[], bytes]
+) -> Iterator[bytes]:
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def ndjson_response(request: Request, lines: Iterable[bytes]) -> StreamingResponse:
+    """Stream ``lines`` as NDJSON, brotli or gzip encoded if the client accepts it."""
+    accepted = _accepted(request)
+    headers = {"Vary": "Accept-Encoding"}
+    body: Iterator[bytes] = _chunks(lines)
+    if brotli is not None and "br" in accepted:
+        headers["Content-Encoding"] = "br"
+        compressor = brotli.Compressor(quality=5)
+        body = _compressed(body, compressor.process, compressor.finish)
+    elif "gzip" in accepted:
+        headers["Content-Encoding"] = "gzip"
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+        body = _compressed(body, compressor.compress, compressor.flush)
+    return StreamingResponse(body, media_type=NDJSON, headers=headers)
+
+
+def offline_delta_response(
+    request: Request,
+    session: Session,
+    model: Any,
+    fields: Iterable[str],
+    token: str | None,
+    limit: int | None,
+    customer_id: str | None,
+) -> StreamingResponse:
+    """Next page of the offline delta of ``model`` after the sync ``token``.
+
+    Pages hold at most ``DOKUSUITE_OFFLINE_DELTA_PAGE_ROWS`` rows (or ``limit``)
+    and end after the row crossing ``DOKUSUITE_OFFLINE_DELTA_PAGE_BYTES``.
+    """
+    try:
+        position = SyncToken.decode(token)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token"
+        ) from None
+    rows = min(limit or settings.offline_delta_page_rows, settings.offline_delta_page_rows)
+    page = delta_page(
+        session,
+        model,
+        list(fields),
+        position,
+        customer_id,
+        limit=rows,
+        max_bytes=settings.offline_delta_page_bytes,
+    )
+    return ndjson_response(request, page.lines())
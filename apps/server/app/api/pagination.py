@@ -0,0 +1,52 @@
+"""Shared offset/cursor pagination for list endpoints."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any, Literal
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlmodel import Session
+
+from app.api.schemas import CursorPage, Page
+from app.db.pagination import count_rows, keyset_page
+
+CountMode = Literal["exact", "estimate", "none"]
+
+
+def paginate(
+    session: Session,
+    query: Any,
+    schema: type[BaseModel],
+    *,
+    page: int,
+    limit: int,
+    cursor: str | None,
+    count: CountMode | None,
+    keyset: Sequence[Any],
+    descending: bool = False,
+) -> Page[Any] | CursorPage[Any]:
+    """Return a page of ``query`` validated as ``schema``.
+
+    Without ``cursor`` the legacy offset ``Page`` is returned (exact total by
+    default). With ``cursor`` (empty for the first page) rows are paged by the
+    ``keyset`` columns and the total is only computed when ``count`` asks for it.
+    """
+    if cursor is not None:
+        try:
+            results, next_cursor = keyset_page(
+                session, query, keyset, cursor, limit, descending=descending
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            ) from None
+        items = [schema.model_validate(r, from_attributes=True) for r in results]
+        total = count_rows(session, query, count or "none")
+        return CursorPage(items=items, limit=limit, next_cursor=next_cursor, total=total)
+
+    total = count_rows(session, query, count or "exact")
+    results = session.exec(query.offset((page - 1) * limit).limit(limit)).all()
+    items = [schema.model_validate(r, from_attributes=True) for r in results]
+    return Page(items=items, total=total, page=page, limit=limit)
@@ -11,6 +11,7 @@ from app.core.security import (
     create_access_token,
     get_current_user,
     hash_password,
+    principal_claims,
     require_role,
     verify_password,
 )
@@ -60,7 +61,9 @@ def login(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"code": "unauthorized", "message": "Invalid credentials"},
         )
-    token = create_access_token(user.email, settings.access_token_expires_minutes)
+    token = create_access_token(
+        user.email, settings.access_token_expires_minutes, principal_claims(user)
+    )
     return token
 
 
@@ -104,7 +107,9 @@ def accept_invite(req: InviteAcceptRequest, session: Session = Depends(get_sessi
         session.add(user)
     session.delete(invitation)
     session.commit()
-    token = create_access_token(user.email, settings.access_token_expires_minutes)
+    token = create_access_token(
+        user.email, settings.access_token_expires_minutes, principal_claims(user)
+    )
     return token
 
 
@@ -1,6 +1,5 @@
 from typing import Any
 
-import boto3
 from fastapi import APIRouter, Depends, HTTPException, status
 from rq.exceptions import NoSuchJobError
 from rq.job import Job
@@ -11,30 +10,28 @@ from workers.ingestion.queue import (
 )
 
 from app.core.config import settings
-from app.core.security import get_current_user
+from app.core.security import User, get_current_user
+from app.core.storage import get_s3_client
 
 router = APIRouter(prefix="/exports", tags=["exports"], dependencies=[Depends(get_current_user)])
 
 
-def _s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.s3_endpoint_url,
-        region_name=settings.s3_region,
-        aws_access_key_id=settings.s3_access_key,
-        aws_secret_access_key=settings.s3_secret_key,
-    )
+def _scoped(payload: dict[str, Any] | None, user: User) -> dict[str, Any] | None:
+    """Restrict an export to the caller's customer."""
+    if user.customer_id:
+        return {**(payload or {}), "customerId": user.customer_id}
+    return payload
 
 
 @router.post("/zip", status_code=status.HTTP_202_ACCEPTED)
-def export_zip(payload: dict[str, Any] | None = None):
-    job = enqueue_export_zip(payload)
+def export_zip(payload: dict[str, Any] | None = None, user: User = Depends(get_current_user)):
+    job = enqueue_export_zip(_scoped(payload, user))
     return {"export_id": job.id}
 
 
 @router.post("/excel", status_code=status.HTTP_202_ACCEPTED)
-def export_excel(payload: dict[str, Any] | None = None):
-    job = enqueue_export_excel(payload)
+def export_excel(payload: dict[str, Any] | None = None, user: User = Depends(get_current_user)):
+    job = enqueue_export_excel(_scoped(payload, user))
     return {"export_id": job.id}
 
 
@@ -47,7 +44,10 @@ def get_export(export_id: str):
             status_code=status.HTTP_404_NOT_FOUND, detail="Export not found"
         ) from err
     status_ = job.get_status()
-    result: dict[str, str] = {"status": status_}
+    result: dict[str, Any] = {"status": status_}
+    progress = getattr(job, "meta", {}).get("progress")
+    if progress:
+        result["progress"] = progress
     if status_ == "finished":
         key = (
             job.result.get("result_key")
@@ -55,7 +55,7 @@ def get_export(export_id: str):
             else job.result
         )
         if key:
-            client = _s3_client()
+            client = get_s3_client()
             url = client.generate_presigned_url(
                 "get_object",
                 Params={"Bucket": settings.s3_bucket, "Key": key},
@@ -1,22 +1,34 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlmodel import Session, select
 
-from app.api.schemas import LocationRead, LocationUpdate, Page
+from app.api.delta import offline_delta_response
+from app.api.pagination import CountMode, paginate
+from app.api.schemas import (
+    CursorPage,
+    LocationRead,
+    LocationSnapshotRead,
+    LocationUpdate,
+    Page,
+)
+from app.core.config import settings
 from app.core.security import User, get_current_user
-from app.db.models import AuditLog, Location
+from app.core.storage import get_s3_client
+from app.db.delta import SyncToken
+from app.db.models import AuditLog, Location, LocationSnapshot
 from app.db.session import get_session
 
 router = APIRouter(prefix="/locations", tags=["locations"])
 
 
-@router.get("", response_model=Page[LocationRead])
+@router.get("", response_model=Page[LocationRead] | CursorPage[LocationRead])
 def list_locations(
     q: str | None = None,
     page: int = 1,
     limit: int = 10,
+    cursor: str | None = None,
+    count: CountMode | None = None,
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
@@ -26,18 +38,37 @@ def list_locations(
     if q:
         query = query.where(Location.name.contains(q))
 
-    total = session.exec(select(func.count()).select_from(query.subquery())).one()
-    results = session.exec(query.offset((page - 1) * limit).limit(limit)).all()
-    items = [LocationRead.model_validate(r, from_attributes=True) for r in results]
-    return Page(items=items, total=total, page=page, limit=limit)
+    return paginate(
+        session,
+        query,
+        LocationRead,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count=count,
+        keyset=[Location.id],
+    )
 
 
 @router.get("/offline-delta")
 def offline_delta(
-    since: datetime,
+    request: Request,
+    token: str | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    since: datetime | None = Query(default=None, deprecated=True),
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
+    """Changed and deleted locations as NDJSON pages, resumable by sync ``token``.
+
+    Each response ends with a line carrying ``next_token``; ``more`` is false
+    once the client has caught up. The legacy ``since`` timestamp returns all
+    changes in a single JSON document.
+    """
+    if since is None:
+        return offline_delta_response(
+            request, session, Location, LocationRead.model_fields, token, limit, user.customer_id
+        )
     upserts_query = select(Location).where(
         Location.updated_at >= since, Location.deleted_at.is_(None)
     )
@@ -55,6 +86,33 @@ def offline_delta(
     return {"upserts": upserts_data, "tombstones": tombstones_data}
 
 
+@router.get("/snapshot", response_model=LocationSnapshotRead)
+def location_snapshot(
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Download link of the latest location snapshot for the offline cold start.
+
+    Continue with ``/locations/offline-delta?token=`` from the returned token.
+    """
+    snapshot = session.get(LocationSnapshot, user.customer_id) if user.customer_id else None
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    url = get_s3_client().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": settings.s3_bucket, "Key": snapshot.object_key},
+        ExpiresIn=settings.s3_presign_ttl,
+    )
+    return LocationSnapshotRead(
+        version=snapshot.version,
+        url=url,
+        token=SyncToken(snapshot.watermark, 0).encode(),
+        count=snapshot.row_count,
+        size=snapshot.size,
+        created_at=snapshot.created_at,
+    )
+
+
 @router.patch("/{location_id}", response_model=LocationRead)
 def update_location(
     location_id: int,
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.api.schemas import OrderCreate, OrderRead, OrderUpdate, Page
+from app.api.pagination import CountMode, paginate
+from app.api.schemas import CursorPage, OrderCreate, OrderRead, OrderUpdate, Page
 from app.core.security import User, require_role
 from app.db.models import AuditLog, Order
 from app.db.session import get_session
@@ -10,11 +10,13 @@ from app.db.session import get_session
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-@router.get("", response_model=Page[OrderRead])
+@router.get("", response_model=Page[OrderRead] | CursorPage[OrderRead])
 def list_orders(
     customerId: str | None = None,
     page: int = 1,
     limit: int = 10,
+    cursor: str | None = None,
+    count: CountMode | None = None,
     session: Session = Depends(get_session),
     user: User = Depends(require_role("ADMIN")),
 ):
@@ -24,10 +26,16 @@ def list_orders(
     elif customerId:
         query = query.where(Order.customer_id == customerId)
 
-    total = session.exec(select(func.count()).select_from(query.subquery())).one()
-    results = session.exec(query.offset((page - 1) * limit).limit(limit)).all()
-    items = [OrderRead.model_validate(r, from_attributes=True) for r in results]
-    return Page(items=items, total=total, page=page, limit=limit)
+    return paginate(
+        session,
+        query,
+        OrderRead,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count=count,
+        keyset=[Order.id],
+    )
 
 
 @router.get("/{order_id}", response_model=OrderRead)
@@ -1,61 +1,55 @@
-import hashlib
+import logging
 import uuid
 from datetime import UTC, datetime
-from math import asin, cos, radians, sin, sqrt
 
-import boto3
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.responses import JSONResponse
-from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from workers.ingestion.queue import enqueue_ingest
+from workers.ingestion.queue import enqueue_ingest, enqueue_ingest_many
 
+from app.api.delta import offline_delta_response
+from app.api.pagination import CountMode, paginate
 from app.api.schemas import (
     BatchAssignRequest,
+    CursorPage,
     Page,
+    PhotoBatchIngest,
+    PhotoBatchItem,
+    PhotoBatchResult,
     PhotoIngest,
     PhotoRead,
+    PhotoStatus,
     PhotoUpdate,
+    SimilarPhoto,
+    SimilarPhotoList,
     UploadIntent,
     UploadIntentRequest,
 )
 from app.api.schemas.upload import ALLOWED_MIME_PREFIX, MAX_FILE_SIZE
+from app.core import idempotency
 from app.core.config import settings
 from app.core.security import User, get_current_user
-from app.db.models import AuditLog, Location, Photo
+from app.core.storage import get_s3_client
+from app.db.models import AuditLog, Photo
 from app.db.session import get_session
 from app.services.calendar_week import calendar_week_from_taken_at
-from app.services.exif import normalize_orientation
-from app.services.geocoding import GeocodingService
-
-router = APIRouter(prefix="/photos", tags=["photos"])
-
-
-_geocoder = GeocodingService()
-
-
-def _s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.s3_endpoint_url,
-        region_name=settings.s3_region,
-        aws_access_key_id=settings.s3_access_key,
-        aws_secret_access_key=settings.s3_secret_key,
-    )
+from app.services.ingestion import PENDING, process_upload
+from app.services.location_matching import find_nearest_locations
+from app.services.similarity import MAX_DISTANCE, find_similar
 
+logger = logging.getLogger(__name__)
 
-def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371000  # meters
-    phi1, phi2 = radians(lat1), radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
-    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
-    return 2 * r * asin(sqrt(a))
-
-
-def _parse_point(point: str) -> tuple[float, float]:
-    lon, lat = map(float, point.replace("POINT(", "").replace(")", "").split())
-    return lat, lon
+router = APIRouter(prefix="/photos", tags=["photos"])
 
 
 @router.post("/upload-intent", response_model=UploadIntent)
@@ -65,7 +59,7 @@ def upload_intent(payload: UploadIntentRequest) -> JSONResponse:
     if payload.size > MAX_FILE_SIZE:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
-    client = _s3_client()
+    client = get_s3_client()
     key = str(uuid.uuid4())
     presigned = client.generate_presigned_post(
         Bucket=settings.s3_bucket,
@@ -86,10 +80,12 @@ def upload_intent(payload: UploadIntentRequest) -> JSONResponse:
     )
 
 
-@router.get("", response_model=Page[PhotoRead])
+@router.get("", response_model=Page[PhotoRead] | CursorPage[PhotoRead])
 def list_photos(
     page: int = 1,
     limit: int = 10,
+    cursor: str | None = None,
+    count: CountMode | None = None,
     from_: datetime | None = Query(None, alias="from"),
     to: datetime | None = None,
     mode: str | None = None,
@@ -100,7 +96,7 @@ def list_photos(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    query = select(Photo)
+    query = select(Photo).where(Photo.deleted_at.is_(None))
     if user.customer_id:
         query = query.where(Photo.customer_id == user.customer_id)
     if from_:
@@ -118,18 +114,38 @@ def list_photos(
     if uploaderId:
         query = query.where(Photo.uploader_id == uploaderId)
 
-    total = session.exec(select(func.count()).select_from(query.subquery())).one()
-    results = session.exec(query.offset((page - 1) * limit).limit(limit)).all()
-    items = [PhotoRead.model_validate(r, from_attributes=True) for r in results]
-    return Page(items=items, total=total, page=page, limit=limit)
+    return paginate(
+        session,
+        query,
+        PhotoRead,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count=count,
+        keyset=[Photo.taken_at, Photo.id],
+        descending=True,
+    )
 
 
 @router.get("/offline-delta")
 def offline_delta(
-    since: datetime,
+    request: Request,
+    token: str | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    since: datetime | None = Query(default=None, deprecated=True),
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
+    """Changed and deleted photos as NDJSON pages, resumable by sync ``token``.
+
+    Each response ends with a line carrying ``next_token``; ``more`` is false
+    once the client has caught up. The legacy ``since`` timestamp returns all
+    changes in a single JSON document.
+    """
+    if since is None:
+        return offline_delta_response(
+            request, session, Photo, PhotoRead.model_fields, token, limit, user.customer_id
+        )
     upserts_query = select(Photo).where(
         Photo.updated_at >= since, Photo.deleted_at.is_(None)
     )
@@ -150,19 +166,32 @@ def offline_delta(
 @router.post("", response_model=PhotoRead, status_code=status.HTTP_201_CREATED)
 def ingest_photo(
     payload: PhotoIngest,
+    response: Response,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    client = _s3_client()
-    obj = client.get_object(Bucket=settings.s3_bucket, Key=payload.object_key)
-    data = obj["Body"].read()
-    normalized = normalize_orientation(data)
-    client.put_object(Bucket=settings.s3_bucket, Key=payload.object_key, Body=normalized)
-
-    photo_hash = hashlib.sha256(normalized).hexdigest()
-    is_dup = (
-        session.exec(select(Photo).where(Photo.hash == photo_hash)).first() is not None
-    )
+    """Register an uploaded photo.
+
+    Retries are idempotent: a repeated ``Idempotency-Key`` returns the stored
+    response, and an already registered ``object_key`` returns the existing
+    photo. Neither touches S3; a photo the worker has not finished yet is
+    enqueued again, in case the first enqueue or the job was lost.
+    """
+    request_hash = idempotency.fingerprint(payload.model_dump(mode="json"))
+    if idempotency_key:
+        stored = idempotency.replay(user.email, idempotency_key, request_hash)
+        if stored is not None:
+            response.headers[idempotency.REPLAYED_HEADER] = "true"
+            return stored
+
+    existing = _photo_by_object_key(session, payload.object_key, user)
+    if existing is not None:
+        if existing.status == PENDING or existing.phash is None:
+            enqueue_ingest({"photo_id": existing.id, **payload.model_dump()})
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+        return PhotoRead.model_validate(existing, from_attributes=True)
+
     photo = Photo(
         object_key=payload.object_key,
         taken_at=payload.taken_at,
@@ -171,38 +200,33 @@ def ingest_photo(
         site_id=payload.site_id,
         device_id=payload.device_id,
         uploader_id=payload.uploader_id,
-        hash=photo_hash,
-        is_duplicate=is_dup,
+        hash="",
         calendar_week=calendar_week_from_taken_at(payload.taken_at),
     )
-
-    # Find nearest location within 50m
-    lat = payload.ad_hoc_spot.lat
-    lon = payload.ad_hoc_spot.lon
-    address = _geocoder.reverse_geocode(lat, lon)
-    if address:
-        photo.note = address
-    loc_query = select(Location)
-    if user.customer_id:
-        loc_query = loc_query.where(Location.customer_id == user.customer_id)
-    locations = session.exec(loc_query).all()
-    nearest_id: int | None = None
-    min_dist = 50.0
-    for loc in locations:
-        if not loc.geog:
-            continue
-        try:
-            loc_lat, loc_lon = _parse_point(loc.geog)
-        except Exception:  # pragma: no cover - malformed data
-            continue
-        dist = _distance_m(lat, lon, loc_lat, loc_lon)
-        if dist < min_dist:
-            min_dist = dist
-            nearest_id = loc.id
-    if nearest_id is not None:
-        photo.location_id = nearest_id
+    if settings.ingest_fast_ack:
+        # Orientation, hashing and matching run in the ingestion worker.
+        photo.status = PENDING
+    else:
+        process_upload(
+            session,
+            photo,
+            get_s3_client(),
+            payload.ad_hoc_spot.lat,
+            payload.ad_hoc_spot.lon,
+            # pHash and thumbnails are not part of the response; the worker adds them.
+            derivatives=False,
+        )
     session.add(photo)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # A concurrent retry registered the same object first.
+        session.rollback()
+        existing = _photo_by_object_key(session, payload.object_key, user)
+        if existing is None:
+            raise
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+        return PhotoRead.model_validate(existing, from_attributes=True)
     session.refresh(photo)
 
     log = AuditLog(
@@ -216,7 +240,168 @@ def ingest_photo(
     session.commit()
 
     enqueue_ingest({"photo_id": photo.id, **payload.model_dump()})
-    return PhotoRead.model_validate(photo, from_attributes=True)
+    result = PhotoRead.model_validate(photo, from_attributes=True)
+    if idempotency_key:
+        idempotency.remember(user.email, idempotency_key, request_hash, result)
+    return result
+
+
+def _photo_by_object_key(session: Session, object_key: str, user: User) -> Photo | None:
+    photo = session.exec(select(Photo).where(Photo.object_key == object_key)).first()
+    if photo is not None and user.customer_id and photo.customer_id != user.customer_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT)
+    return photo
+
+
+@router.post("/batch", response_model=PhotoBatchResult)
+def ingest_photo_batch(
+    payload: PhotoBatchIngest,
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Register many uploaded photos at once, e.g. when an offline queue drains.
+
+    Photos are always acknowledged as ``PENDING`` and processed by the
+    ingestion worker. Items are keyed by ``object_key``: re-sending an item
+    returns the existing photo (``exists``) and re-enqueues it if it is still
+    pending, so a partially failed batch can simply be retried.
+    """
+    if len(payload.items) > settings.photo_batch_max_items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    try:
+        results, photos = _insert_batch(session, payload, user)
+    except IntegrityError:
+        # A concurrent retry of the same batch registered some objects first;
+        # they are reported as ``exists`` now.
+        session.rollback()
+        results, photos = _insert_batch(session, payload, user)
+
+    pending: dict[str, dict] = {}
+    for index, item in enumerate(payload.items):
+        result = results[index]
+        photo = photos[item.object_key]
+        if result is None:
+            result = PhotoBatchItem(index=index, object_key=item.object_key, status="created")
+        elif result.status == "failed":
+            continue
+        result.photo = PhotoRead.model_validate(photo, from_attributes=True)
+        results[index] = result
+        if photo.status == PENDING and item.object_key not in pending:
+            pending[item.object_key] = {"photo_id": photo.id, **item.model_dump()}
+    try:
+        enqueue_ingest_many(list(pending.values()))
+    except Exception:
+        # Photos stay PENDING; retrying the batch enqueues them again.
+        logger.exception("batch enqueue failed", extra={"count": len(pending)})
+        for result in results:
+            if result is not None and result.photo and result.photo.status == PENDING:
+                result.error = "enqueue failed"
+    return PhotoBatchResult(items=results)
+
+
+def _insert_batch(
+    session: Session, payload: PhotoBatchIngest, user: User
+) -> tuple[list[PhotoBatchItem | None], dict[str, Photo]]:
+    """Insert the new photos of a batch with their audit logs and commit.
+
+    Returns the results decided so far (``exists``/``failed``, ``None`` for
+    created items) and every photo of the batch by ``object_key``.
+    """
+    keys = {item.object_key for item in payload.items}
+    existing_query = select(Photo).where(Photo.object_key.in_(keys))
+    existing = {p.object_key: p for p in session.exec(existing_query)}
+
+    results: list[PhotoBatchItem | None] = [None] * len(payload.items)
+    new_items: list[tuple[int, PhotoIngest]] = []
+    seen: set[str] = set()
+    for index, item in enumerate(payload.items):
+        photo = existing.get(item.object_key)
+        if photo is not None and user.customer_id and photo.customer_id != user.customer_id:
+            results[index] = PhotoBatchItem(
+                index=index, object_key=item.object_key, status="failed", error="conflict"
+            )
+        elif photo is not None or item.object_key in seen:
+            results[index] = PhotoBatchItem(
+                index=index, object_key=item.object_key, status="exists"
+            )
+        else:
+            seen.add(item.object_key)
+            new_items.append((index, item))
+
+    location_ids = find_nearest_locations(
+        session,
+        [(item.ad_hoc_spot.lat, item.ad_hoc_spot.lon) for _index, item in new_items],
+        user.customer_id,
+    )
+    created = [
+        Photo(
+            object_key=item.object_key,
+            taken_at=item.taken_at,
+            mode=item.mode,
+            customer_id=user.customer_id,
+            site_id=item.site_id,
+            device_id=item.device_id,
+            uploader_id=item.uploader_id,
+            quality_flag=item.quality_flag,
+            note=item.note,
+            hash="",
+            calendar_week=calendar_week_from_taken_at(item.taken_at),
+            location_id=location_id,
+            status=PENDING,
+        )
+        for (_index, item), location_id in zip(new_items, location_ids, strict=True)
+    ]
+    session.add_all(created)
+    session.flush()
+    session.add_all(
+        AuditLog(
+            action="create",
+            entity="photo",
+            entity_id=photo.id,
+            user=user.email,
+            payload=item.model_dump(mode="json"),
+        )
+        for photo, (_index, item) in zip(created, new_items, strict=True)
+    )
+    session.commit()
+    return results, {p.object_key: p for p in (*existing.values(), *created)}
+
+
+@router.get("/{photo_id}/status", response_model=PhotoStatus)
+def get_photo_status(
+    photo_id: int,
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    photo = session.get(Photo, photo_id)
+    if not photo or (user.customer_id and photo.customer_id != user.customer_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return PhotoStatus.model_validate(photo, from_attributes=True)
+
+
+@router.get("/{photo_id}/similar", response_model=SimilarPhotoList)
+def get_similar_photos(
+    photo_id: int,
+    distance: int = Query(default=8, ge=0, le=MAX_DISTANCE),
+    limit: int = Query(default=50, ge=1, le=500),
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """Near-duplicates of a photo by pHash Hamming distance (same customer)."""
+    photo = session.get(Photo, photo_id)
+    if not photo or (user.customer_id and photo.customer_id != user.customer_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    matches = find_similar(session, photo, distance, limit)
+    query = select(Photo).where(
+        Photo.id.in_([match_id for match_id, _dist in matches]), Photo.deleted_at.is_(None)
+    )
+    found = {p.id: PhotoRead.model_validate(p, from_attributes=True) for p in session.exec(query)}
+    items = [
+        SimilarPhoto(distance=dist, photo=found[match_id])
+        for match_id, dist in matches
+        if match_id in found
+    ]
+    return SimilarPhotoList(items=items)
 
 
 @router.get("/{photo_id}", response_model=PhotoRead)
@@ -1,49 +1,35 @@
-import secrets
-import time
-from datetime import UTC, datetime
-
-import boto3
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     HTTPException,
     Request,
     Response,
     status,
 )
-from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.api.schemas import Page, PublicPhotoList, ShareCreate, ShareRead
+from app.api.pagination import CountMode, paginate
+from app.api.schemas import CursorPage, Page, PublicPhotoList, ShareCreate, ShareRead
 from app.core.config import settings
 from app.core.limiter import limiter
 from app.core.security import User, require_role
+from app.core.storage import get_s3_client
 from app.db.models import AuditLog, Order, Photo, Share
 from app.db.session import get_session
 from app.services.mail import send_mail
-from app.services.watermark import apply_watermark
+from app.services.media import thumbnail_key
+from app.services.renditions import get_or_create_rendition
+from app.services.share_tokens import (
+    hash_token,
+    invalidate_share,
+    new_token,
+    resolve_share,
+)
 
 router = APIRouter(prefix="/shares", tags=["shares"])
 public_router = APIRouter(prefix="/public/shares", tags=["public-shares"])
 
 
-def _s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.s3_endpoint_url,
-        region_name=settings.s3_region,
-        aws_access_key_id=settings.s3_access_key,
-        aws_secret_access_key=settings.s3_secret_key,
-    )
-
-
-def _delete_after_delay(key: str, delay: int) -> None:
-    time.sleep(delay)
-    client = _s3_client()
-    client.delete_object(Bucket=settings.s3_bucket, Key=key)
-
-
 @router.post("", response_model=ShareRead, status_code=status.HTTP_201_CREATED)
 def create_share(
     payload: ShareCreate,
@@ -53,11 +39,12 @@ def create_share(
     order = session.get(Order, payload.order_id)
     if not order or (user.customer_id and order.customer_id != user.customer_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    token = secrets.token_urlsafe(16)
+    token = new_token()
     share = Share(
         order_id=payload.order_id,
         customer_id=order.customer_id,
         url=f"{settings.share_base_url}/{token}",
+        token_hash=hash_token(token),
         expires_at=payload.expires_at,
         download_allowed=payload.download_allowed,
         watermark_policy=payload.watermark_policy,
@@ -85,11 +72,13 @@ def create_share(
     return ShareRead.model_validate(share, from_attributes=True)
 
 
-@router.get("", response_model=Page[ShareRead])
+@router.get("", response_model=Page[ShareRead] | CursorPage[ShareRead])
 def list_shares(
     orderId: int | None = None,
     page: int = 1,
     limit: int = 10,
+    cursor: str | None = None,
+    count: CountMode | None = None,
     session: Session = Depends(get_session),
     user: User = Depends(require_role("ADMIN")),
 ):
@@ -99,10 +88,16 @@ def list_shares(
     if orderId is not None:
         query = query.where(Share.order_id == orderId)
 
-    total = session.exec(select(func.count()).select_from(query.subquery())).one()
-    results = session.exec(query.offset((page - 1) * limit).limit(limit)).all()
-    items = [ShareRead.model_validate(r, from_attributes=True) for r in results]
-    return Page(items=items, total=total, page=page, limit=limit)
+    return paginate(
+        session,
+        query,
+        ShareRead,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        count=count,
+        keyset=[Share.id],
+    )
 
 
 @router.get("/{share_id}", response_model=ShareRead)
@@ -128,6 +123,7 @@ def revoke_share(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     session.delete(share)
     session.commit()
+    invalidate_share(share.token_hash)
 
     log = AuditLog(
         action="delete",
@@ -147,32 +143,19 @@ def public_photo(
     token: str,
     photo_id: int,
     request: Request,
-    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
 ):
-    share = session.exec(
-        select(Share).where(Share.url == f"{settings.share_base_url}/{token}")
-    ).one_or_none()
+    share = resolve_share(session, token)
     if not share:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    now = datetime.now(UTC)
-    if share.expires_at and share.expires_at.replace(tzinfo=UTC) < now:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     photo = session.get(Photo, photo_id)
     if not photo or photo.order_id != share.order_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    client = _s3_client()
+    client = get_s3_client()
     key = photo.object_key
-    thumb_key = f"{photo.object_key}-thumb"
+    thumb_key = thumbnail_key(photo.object_key)
     if not share.download_allowed:
-        obj = client.get_object(Bucket=settings.s3_bucket, Key=photo.object_key)
-        wm_bytes = apply_watermark(obj["Body"].read())
-        wm_key = f"{photo.object_key}-wm"
-        client.put_object(Bucket=settings.s3_bucket, Key=wm_key, Body=wm_bytes)
-        key = wm_key
-        background_tasks.add_task(
-            _delete_after_delay, wm_key, settings.s3_presign_ttl
-        )
+        key = get_or_create_rendition(client, photo, share.watermark_policy)
     original_url = client.generate_presigned_url(
         "get_object",
         Params={"Bucket": settings.s3_bucket, "Key": key},
@@ -188,13 +171,8 @@ def public_photo(
 
 @public_router.get("/{token}/photos", response_model=PublicPhotoList)
 def public_photos(token: str, session: Session = Depends(get_session)):
-    share = session.exec(
-        select(Share).where(Share.url == f"{settings.share_base_url}/{token}")
-    ).one_or_none()
+    share = resolve_share(session, token)
     if not share:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    now = datetime.now(UTC)
-    if share.expires_at and share.expires_at.replace(tzinfo=UTC) < now:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     photos = session.exec(select(Photo.id).where(Photo.order_id == share.order_id)).all()
     return {"items": [{"id": pid} for pid in photos]}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 
 from app.api.schemas.user import UserRead, UserUpdate
-from app.core.security import User, require_role
+from app.core.security import User, invalidate_principal, require_role
 from app.db.models import User as UserModel
 from app.db.session import get_session
 
@@ -33,6 +33,7 @@ def update_user(
     session.add(user_obj)
     session.commit()
     session.refresh(user_obj)
+    invalidate_principal(user_obj.email)
     return UserRead.model_validate(user_obj, from_attributes=True)
 
 
@@ -47,4 +48,5 @@ def delete_user(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     session.delete(user_obj)
     session.commit()
+    invalidate_principal(user_obj.email)
     return None
@@ -1,13 +1,19 @@
-from .location import LocationRead, LocationUpdate
+from .location import LocationRead, LocationSnapshotRead, LocationUpdate
 from .order import OrderCreate, OrderRead, OrderUpdate
-from .pagination import Page
+from .pagination import CursorPage, Page
 from .photo import (
     BatchAssignRequest,
+    PhotoBatchIngest,
+    PhotoBatchItem,
+    PhotoBatchResult,
     PhotoIngest,
     PhotoRead,
+    PhotoStatus,
     PhotoUpdate,
     PublicPhoto,
     PublicPhotoList,
+    SimilarPhoto,
+    SimilarPhotoList,
 )
 from .share import ShareCreate, ShareRead
 from .upload import UploadIntent, UploadIntentRequest
@@ -15,14 +21,22 @@ from .user import UserRead, UserUpdate
 
 __all__ = [
     "LocationRead",
+    "LocationSnapshotRead",
     "LocationUpdate",
+    "CursorPage",
     "Page",
     "BatchAssignRequest",
+    "PhotoBatchIngest",
+    "PhotoBatchItem",
+    "PhotoBatchResult",
     "PhotoIngest",
     "PhotoRead",
+    "PhotoStatus",
     "PhotoUpdate",
     "PublicPhoto",
     "PublicPhotoList",
+    "SimilarPhoto",
+    "SimilarPhotoList",
     "UploadIntent",
     "UploadIntentRequest",
     "OrderCreate",
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
@@ -15,3 +17,12 @@ class LocationUpdate(BaseModel):
     original_name: str | None = None
     address: str | None = None
     active: bool | None = None
+
+
+class LocationSnapshotRead(BaseModel):
+    version: int
+    url: str
+    token: str
+    count: int
+    size: int
+    created_at: datetime
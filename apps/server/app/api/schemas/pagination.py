@@ -8,6 +8,13 @@ T = TypeVar("T")
 
 class Page(BaseModel, Generic[T]):
     items: Sequence[T]
-    total: int
+    total: int | None
     page: int
     limit: int
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: Sequence[T]
+    limit: int
+    next_cursor: str | None = None
+    total: int | None = None
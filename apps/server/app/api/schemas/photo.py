@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -30,6 +31,10 @@ class PhotoIngest(BaseModel):
     note: str | None = None
 
 
+class PhotoBatchIngest(BaseModel):
+    items: list[PhotoIngest]
+
+
 class PhotoRead(BaseModel):
     id: int
     object_key: str
@@ -41,6 +46,34 @@ class PhotoRead(BaseModel):
     uploader_id: str | None = None
 
 
+class PhotoBatchItem(BaseModel):
+    index: int
+    object_key: str
+    status: Literal["created", "exists", "failed"]
+    photo: PhotoRead | None = None
+    error: str | None = None
+
+
+class PhotoBatchResult(BaseModel):
+    items: list[PhotoBatchItem]
+
+
+class SimilarPhoto(BaseModel):
+    distance: int
+    photo: PhotoRead
+
+
+class SimilarPhotoList(BaseModel):
+    items: list[SimilarPhoto]
+
+
+class PhotoStatus(BaseModel):
+    id: int
+    status: str
+    is_duplicate: bool
+    location_id: int | None = None
+
+
 class PhotoUpdate(BaseModel):
     quality_flag: str | None = None
     note: str | None = None
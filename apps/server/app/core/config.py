@@ -8,6 +8,11 @@ class Settings(BaseSettings):
     jwt_secret: str = "dev-secret-change-me"
     jwt_algorithm: str = "HS256"
     access_token_expires_minutes: int = 60
+    # Cache resolved users per token (subject + iat) instead of a lookup per request
+    principal_cache_size: int = 10_000
+    principal_cache_ttl: float = 60.0
+    # Embed role and customer_id as signed token claims and skip the lookup entirely
+    jwt_embed_claims: bool = False
     admin_email: str = "admin@example.com"
     # For development, default to plain 'admin'. Provide a bcrypt hash via env for production.
     admin_password_hash: str = "admin"
@@ -20,9 +25,85 @@ class Settings(BaseSettings):
     s3_secret_key: str = "test"
     s3_presign_ttl: int = 3600  # seconds
     s3_cors_origin: str = "*"
+    # Shared client connection pool and timeouts
+    s3_max_pool_connections: int = 32
+    s3_connect_timeout: float = 5.0
+    s3_read_timeout: float = 60.0
+    s3_max_attempts: int = 3
+    # Part size (bytes) for multipart uploads of exports; S3 requires >= 5 MiB
+    s3_multipart_part_size: int = 16 * 1024 * 1024
+
+    # Object storage backend: "s3", "memory" or "filesystem" (tests/benchmarks)
+    storage_backend: str = "s3"
+    storage_path: str = "./.storage"
+
+    # Acknowledge POST /photos immediately and process the upload in the worker
+    ingest_fast_ack: bool = False
+    # Maximum number of photos per POST /photos/batch request
+    photo_batch_max_items: int = 500
+    # Responses remembered per Idempotency-Key (seconds / entries per process)
+    idempotency_ttl: float = 24 * 3600
+    idempotency_cache_size: int = 10_000
+
+    # Longest edge (px) of the thumbnails generated on ingest
+    thumbnail_sizes: list[int] = [256, 1024]
+
+    # Photo ↔ location matching radius (ADR 0004)
+    match_radius_m: float = 50.0
+
+    # Reverse geocoding cache: grid cell size (m) shared by nearby coordinates,
+    # lifetime (s) of addresses and of "no address" results, in-process entries
+    geocode_grid_m: float = 10.0
+    geocode_cache_ttl: float = 24 * 3600
+    geocode_negative_ttl: float = 3600
+    geocode_cache_size: int = 10_000
+    # Geocoding runs in the worker: "google" (GOOGLE_MAPS_API_KEY) or "stub" (offline load tests)
+    geocode_provider: str = "google"
+    geocode_timeout: float = 5.0
+    geocode_rate_limit_per_min: float = 600
+    geocode_stub_latency: float = 0.0
+
+    # Offline delta pages: at most this many rows, cut after the row crossing
+    # offline_delta_page_bytes of NDJSON (before compression)
+    offline_delta_page_rows: int = 5000
+    offline_delta_page_bytes: int = 1024 * 1024
+    # Per-customer location snapshots built after each Ninox sync: object key prefix
+    # and versions kept per customer (older presigned URLs stay valid meanwhile)
+    location_snapshot_prefix: str = "snapshots/locations"
+    location_snapshot_keep: int = 2
+
+    # Lifetime (s) of cached list totals for count=estimate without PostgreSQL
+    count_cache_ttl: float = 60.0
+
+    # Objects fetched ahead in parallel while streaming a ZIP export
+    export_concurrency: int = 8
+    # Rows fetched per round trip from the server-side cursor of Excel exports
+    export_batch_size: int = 2000
+    # Excel exports larger than this (bytes) are spooled to disk before upload
+    export_spool_max_size: int = 8 * 1024 * 1024
+
+    # Days to keep watermarked share renditions (minimum 1)
+    rendition_retention_days: int = 1
 
     # Public share base URL
     share_base_url: str = "https://example.com/share"
+    # Seconds a resolved share token (incl. unknown tokens) is cached per process
+    share_cache_ttl: float = 30.0
+
+    # Ninox records per sync batch (one lookup, insert and commit per batch)
+    ninox_sync_batch_size: int = 1000
+    # Paged fetch: records per page, pages requested ahead, per-request timeout (s),
+    # retries on throttling/5xx/network errors with exponential backoff from ninox_retry_backoff (s)
+    ninox_page_size: int = 500
+    ninox_prefetch: int = 4
+    ninox_timeout: float = 30.0
+    ninox_max_retries: int = 5
+    ninox_retry_backoff: float = 0.5
+
+    # Rate limit storage URI (limits syntax); default Redis at REDIS_URL, else per process.
+    rate_limit_storage_uri: str | None = None
+    # Keys remembered by the local pre-check in front of Redis
+    rate_limit_local_keys: int = 10_000
 
     # SMTP mail configuration
     smtp_host: str = "localhost"
@@ -31,6 +112,13 @@ class Settings(BaseSettings):
     smtp_password: str | None = None
     smtp_from: str = "no-reply@example.com"
 
+    # Logging: bounded queue drained by a background thread (0 = write synchronously)
+    log_queue_size: int = 10_000
+    # "json" or "orjson" (requires the orjson extra)
+    log_serializer: str = "json"
+    # Fraction of successful (< 400) request logs that are kept
+    log_success_sample_rate: float = 1.0
+
     # OpenTelemetry tracing
     tracing_exporter: str | None = None  # e.g. "otlp"
     tracing_endpoint: str | None = None
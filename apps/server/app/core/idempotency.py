@@ -0,0 +1,49 @@
+"""Replay cache for requests sent with an ``Idempotency-Key`` header.
+
+Responses are remembered per caller and key together with a fingerprint of
+the request body. A replay with the same body returns the stored response
+without running the handler again; reusing a key for a different body is
+rejected with 422. The cache is per process; handlers additionally dedupe
+on a natural key (e.g. ``Photo.object_key``) so replays that land on
+another process stay idempotent.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+from fastapi import HTTPException
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_responses = TTLCache(maxsize=settings.idempotency_cache_size, ttl=settings.idempotency_ttl)
+
+
+def fingerprint(body: Any) -> str:
+    """Stable hash of a JSON-serialisable request body."""
+    data = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def replay(caller: str, key: str, request_hash: str) -> Any | None:
+    """Return the stored response for ``key`` or ``None`` if there is none."""
+    entry = _responses.get((caller, key))
+    if entry is None:
+        return None
+    stored_hash, response = entry
+    if stored_hash != request_hash:
+        # Literal code: the constant's name depends on the Starlette release.
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    return response
+
+
+def remember(caller: str, key: str, request_hash: str, response: Any) -> None:
+    _responses.set((caller, key), (request_hash, response))
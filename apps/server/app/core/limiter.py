@@ -1,4 +1,173 @@
+"""Rate limiting for slowapi, shared across processes through Redis.
+
+With ``REDIS_URL`` (or ``DOKUSUITE_RATE_LIMIT_STORAGE_URI``) limits are
+counted in Redis by :class:`RedisWindowStorage`: a sliding window log kept
+by a Lua script on the Redis clock, so every worker process and host sees
+the same window. Without Redis each process counts on its own.
+
+In front of Redis, :class:`LocalPrecheck` rejects keys that are certainly
+over their limit without a round trip. Keys under the limit are always
+counted in Redis; answering those locally would let every process admit
+the full limit again.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from limits.storage import RedisStorage
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from .cache import TTLCache
+from .config import settings
+from .metrics import RATE_LIMIT_CHECKS
+
+# Admit ``amount`` entries if fewer than ``limit`` remain in the window;
+# otherwise return the seconds until enough entries have expired. Entries are
+# server timestamps, newest first, trimmed to ``limit``.
+_ACQUIRE_WINDOW = """
+local now = redis.call('TIME')
+local timestamp = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local expiry = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+if amount > limit then
+    return {0, tostring(expiry)}
+end
+local entry = redis.call('LINDEX', KEYS[1], limit - amount)
+if entry and tonumber(entry) > timestamp - expiry then
+    return {0, tostring(tonumber(entry) + expiry - timestamp)}
+end
+for i = 1, amount do
+    redis.call('LPUSH', KEYS[1], timestamp)
+end
+redis.call('LTRIM', KEYS[1], 0, limit - 1)
+redis.call('EXPIRE', KEYS[1], expiry)
+return {1}
+"""
+
+# Age (s) of the oldest entry in the window and the number of entries.
+_WINDOW = """
+local now = redis.call('TIME')
+local timestamp = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local expiry = tonumber(ARGV[2])
+local count, oldest = 0, nil
+for _, entry in ipairs(redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)) do
+    if tonumber(entry) <= timestamp - expiry then
+        break
+    end
+    count = count + 1
+    oldest = tonumber(entry)
+end
+if oldest then
+    return {tostring(timestamp - oldest), count}
+end
+return {'0', 0}
+"""
+
+
+class LocalPrecheck:
+    """Per-process token buckets in front of the shared window.
+
+    A key's bucket holds ``limit`` tokens, refills at ``limit / expiry`` per
+    second and is only charged for hits the shared window admitted. An empty
+    bucket therefore means this process alone admitted ``limit`` hits within
+    the last ``expiry`` seconds, so the shared window is full as well. Keys
+    the shared window rejected are blocked until it frees up. State is kept
+    for at most ``maxsize`` keys.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._buckets = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _refill(self, state: list[float], limit: int, expiry: int, now: float) -> None:
+        tokens, updated, _ = state
+        state[0] = min(limit, tokens + (now - updated) * limit / expiry)
+        state[1] = now
+
+    def blocked(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        """Whether ``key`` is certainly over its limit."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                return False
+            if state[2] > now:
+                return True
+            self._refill(state, limit, expiry, now)
+            return state[0] < amount
+
+    def admitted(self, key: str, limit: int, expiry: int, amount: int = 1) -> None:
+        """Charge ``key``'s bucket for a hit the shared window admitted."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key) or [float(limit), now, 0.0]
+            self._refill(state, limit, expiry, now)
+            state[0] = max(0.0, state[0] - amount)
+            # A bucket untouched for ``expiry`` seconds is full again, i.e. unknown.
+            self._buckets.set(key, state, ex=expiry)
+
+    def rejected(self, key: str, limit: int, expiry: int, retry_after: float) -> None:
+        """Block ``key`` for ``retry_after`` seconds after the shared window rejected it."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key) or [float(limit), now, 0.0]
+            state[2] = now + retry_after
+            self._buckets.set(key, state, ex=max(expiry, retry_after))
+
+
+class RedisWindowStorage(RedisStorage):
+    """``limits`` storage for the ``moving-window`` strategy with a local pre-check.
+
+    Selected with a ``dokusuite+redis://`` (``+rediss``, ``+redis+unix``)
+    storage URI; the remainder is the Redis URL.
+    """
+
+    STORAGE_SCHEME = ["dokusuite+redis", "dokusuite+rediss", "dokusuite+redis+unix"]
+
+    def __init__(self, uri: str, **options: float | str | bool) -> None:
+        super().__init__(uri.removeprefix("dokusuite+"), **options)
+        self.precheck = LocalPrecheck(settings.rate_limit_local_keys)
+
+    def initialize_storage(self, uri: str) -> None:
+        super().initialize_storage(uri)
+        self.lua_acquire_window = self.get_connection().register_script(_ACQUIRE_WINDOW)
+        self.lua_window = self.get_connection().register_script(_WINDOW)
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if self.precheck.blocked(key, limit, expiry, amount):
+            RATE_LIMIT_CHECKS.labels(source="local", result="rejected").inc()
+            return False
+        admitted, *retry_after = self.lua_acquire_window(
+            [self.prefixed_key(key)], [limit, expiry, amount]
+        )
+        if admitted:
+            self.precheck.admitted(key, limit, expiry, amount)
+            RATE_LIMIT_CHECKS.labels(source="redis", result="admitted").inc()
+            return True
+        self.precheck.rejected(key, limit, expiry, float(retry_after[0]))
+        RATE_LIMIT_CHECKS.labels(source="redis", result="rejected").inc()
+        return False
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> tuple[float, int]:
+        age, count = self.lua_window([self.prefixed_key(key)], [limit, expiry])
+        return time.time() - float(age), int(count)
+
+
+def storage_uri() -> str:
+    """``limits`` storage URI from the settings, ``REDIS_URL`` or per process."""
+    uri = settings.rate_limit_storage_uri or os.getenv("REDIS_URL") or "memory://"
+    return f"dokusuite+{uri}" if uri.startswith("redis") else uri
+
+
+# Falls back to per-process counting while Redis is unreachable.
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=storage_uri(),
+    strategy="moving-window",
+    in_memory_fallback_enabled=True,
+)
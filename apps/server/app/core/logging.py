@@ -1,11 +1,36 @@
+import atexit
+import copy
 import json
 import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 
+from .config import settings
+from .metrics import LOG_QUEUE_SIZE, LOG_RECORDS_DROPPED
+
+try:  # optional faster serializer
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _dumps_json(data: dict[str, Any]) -> str:
+    return json.dumps(data, default=str)
+
+
+def _dumps_orjson(data: dict[str, Any]) -> str:
+    return orjson.dumps(data, default=str).decode()
+
 
 class JsonFormatter(logging.Formatter):
     """Format log records as JSON."""
 
+    def __init__(self, *args: Any, serializer: str = "json", **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.dumps = _dumps_orjson if serializer == "orjson" and orjson else _dumps_json
+
     def format(self, record: logging.LogRecord) -> str:
         log_record: dict[str, Any] = {
             "timestamp": self.formatTime(record, self.datefmt),
@@ -18,13 +43,95 @@ class JsonFormatter(logging.Formatter):
             log_record["duration_ms"] = record.duration_ms
         if hasattr(record, "status_code"):
             log_record["status_code"] = record.status_code
-        return json.dumps(log_record)
+        return self.dumps(log_record)
+
+
+class SuccessSampler(logging.Filter):
+    """Keep only a ``rate`` fraction of request logs with a status below 400."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        status_code = getattr(record, "status_code", None)
+        if self.rate >= 1 or not isinstance(status_code, int) or status_code >= 400:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full.
+
+    Records are enqueued unformatted; JSON serialization happens on the
+    listener thread.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message while its arguments are still current.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Seconds ``stop`` waits for room in a full queue before giving up on the rest.
+STOP_TIMEOUT = 5.0
+
+
+class DrainingQueueListener(QueueListener):
+    """Queue listener whose ``stop`` also works while the queue is full.
+
+    The stock listener enqueues its stop sentinel with ``put_nowait``, which
+    fails exactly when records are backed up. Waiting for room lets the
+    thread write the queued records first.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel, timeout=STOP_TIMEOUT)
+
+
+_listener: QueueListener | None = None
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # The handler is stuck; the remaining records are lost.
+            pass
+        _listener = None
+
+
+atexit.register(_stop_listener)
 
 
 def configure_logging() -> None:
-    """Configure root logger to use JSON formatting."""
+    """Configure root logger to use JSON formatting.
+
+    With ``DOKUSUITE_LOG_QUEUE_SIZE > 0`` records are handed to a bounded
+    queue and written by a background listener, so log I/O never blocks
+    request handling; records that do not fit are dropped and counted.
+    """
+    _stop_listener()
     handler = logging.StreamHandler()
-    handler.setFormatter(JsonFormatter())
+    handler.setFormatter(JsonFormatter(serializer=settings.log_serializer))
     root_logger = logging.getLogger()
+    if settings.log_queue_size > 0:
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+        LOG_QUEUE_SIZE.set_function(log_queue.qsize)
+        global _listener
+        _listener = DrainingQueueListener(log_queue, handler)
+        _listener.start()
+        handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SuccessSampler(settings.log_success_sample_rate))
     root_logger.handlers = [handler]
     root_logger.setLevel(logging.INFO)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 
 router = APIRouter()
 
@@ -9,10 +9,44 @@ REQUEST_COUNTER = Counter(
     ["method", "path", "status_code"],
 )
 
+REQUEST_LATENCY = Histogram(
+    "dokusuite_request_duration_seconds",
+    "HTTP request latency until the response body was sent",
+    ["method", "path"],
+)
+
 IN_PROGRESS_GAUGE = Gauge(
     "dokusuite_requests_in_progress",
     "In-progress HTTP requests",
-    ["path"],
+    ["method"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "dokusuite_log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+
+LOG_QUEUE_SIZE = Gauge(
+    "dokusuite_log_queue_size",
+    "Log records waiting to be written",
+)
+
+GEOCODE_CACHE_REQUESTS = Counter(
+    "dokusuite_geocode_cache_requests_total",
+    "Reverse geocoding cache lookups by result (hit/miss)",
+    ["result"],
+)
+
+NINOX_SYNC_RECORDS = Counter(
+    "dokusuite_ninox_sync_records_total",
+    "Ninox records synced by table and result (created/updated/deleted/skipped)",
+    ["table", "result"],
+)
+
+RATE_LIMIT_CHECKS = Counter(
+    "dokusuite_rate_limit_checks_total",
+    "Rate limit decisions by source (local pre-check/redis) and result",
+    ["source", "result"],
 )
 
 
@@ -2,35 +2,73 @@ import logging
 import time
 import uuid
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .metrics import IN_PROGRESS_GAUGE, REQUEST_COUNTER
+from .metrics import IN_PROGRESS_GAUGE, REQUEST_COUNTER, REQUEST_LATENCY
 
+# Label for requests that match no route (404 probes, scanners, ...).
+UNMATCHED_ROUTE = "<unmatched>"
 
-class RequestMetricsMiddleware(BaseHTTPMiddleware):
-    """Track request metrics and enrich logs."""
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """Return the path template (``/photos/{photo_id}``) of the routed request.
+
+    The router stores the matched route in the shared ``scope``; metrics are
+    labelled by its template rather than the raw path so the number of series
+    stays bounded by the number of routes.
+    """
+    return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """Track request metrics and enrich logs.
+
+    Implemented as plain ASGI middleware: responses, including streaming
+    ones, are passed through untouched apart from the ``X-Request-ID``
+    header, and duration is measured until the last body chunk was sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id
+        method = scope["method"]
+        status_code = 500
         start_time = time.perf_counter()
-        IN_PROGRESS_GAUGE.labels(path=request.url.path).inc()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        # The route is only known after routing, so in-flight requests are
+        # tracked per method.
+        in_progress = IN_PROGRESS_GAUGE.labels(method=method)
+        in_progress.inc()
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         finally:
-            IN_PROGRESS_GAUGE.labels(path=request.url.path).dec()
-        duration_ms = (time.perf_counter() - start_time) * 1000
-        response.headers["X-Request-ID"] = request_id
-        REQUEST_COUNTER.labels(
-            method=request.method, path=request.url.path, status_code=response.status_code
-        ).inc()
-        logging.getLogger(__name__).info(
-            "request completed",
-            extra={
-                "request_id": request_id,
-                "duration_ms": round(duration_ms, 2),
-                "status_code": response.status_code,
-            },
-        )
-        return response
+            in_progress.dec()
+            duration = time.perf_counter() - start_time
+            path = route_template(scope)
+            REQUEST_COUNTER.labels(method=method, path=path, status_code=status_code).inc()
+            REQUEST_LATENCY.labels(method=method, path=path).observe(duration)
+            logger.info(
+                "request completed",
+                extra={
+                    "request_id": request_id,
+                    "duration_ms": round(duration * 1000, 2),
+                    "status_code": status_code,
+                },
+            )
@@ -9,6 +9,7 @@ from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlmodel import Session, select
 
+from app.core.cache import TTLCache
 from app.db.models import User as UserModel
 from app.db.session import get_session
 
@@ -40,10 +41,13 @@ def secrets_compare(a: str, b: str) -> bool:
     return result == 0
 
 
-def create_access_token(subject: str, expires_in_minutes: int) -> dict[str, Any]:
+def create_access_token(
+    subject: str, expires_in_minutes: int, claims: dict[str, Any] | None = None
+) -> dict[str, Any]:
     now = datetime.now(UTC)
     exp = now + timedelta(minutes=expires_in_minutes)
     payload = {
+        **(claims or {}),
         "sub": subject,
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
@@ -76,6 +80,38 @@ class User:
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
+# Resolved principals by (subject, iat); see invalidate_principal().
+_principals = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl)
+
+
+def _principal(sub: str, user: UserModel | None) -> User | None:
+    if sub == settings.admin_email:
+        return User(email=sub, role="ADMIN", customer_id=user.customer_id if user else None)
+    if user is None:
+        return None
+    role = user.role.value if hasattr(user.role, "value") else str(user.role)
+    return User(email=sub, role=role, customer_id=user.customer_id)
+
+
+def principal_claims(user: UserModel) -> dict[str, Any]:
+    """Signed claims that let get_current_user skip the user lookup.
+
+    Empty unless ``DOKUSUITE_JWT_EMBED_CLAIMS`` is enabled. Embedded role
+    changes only take effect once the token is reissued.
+    """
+    principal = _principal(user.email, user)
+    if not settings.jwt_embed_claims or principal is None:
+        return {}
+    return {"role": principal.role, "customer_id": principal.customer_id}
+
+
+def invalidate_principal(email: str) -> None:
+    """Forget cached principals of ``email`` after its role changed or it was removed."""
+    for key in _principals.keys():
+        if key[0] == email:
+            _principals.pop(key)
+
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials | None = Security(bearer_scheme),
     session: Session = Depends(get_session),
@@ -89,20 +125,21 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
-    if sub == settings.admin_email:
-        role = "ADMIN"
-        user = session.exec(select(UserModel).where(UserModel.email == sub)).first()
-        customer_id = getattr(user, "customer_id", None) if user else None
-    else:
+    sub = str(sub)
+    if settings.jwt_embed_claims and "role" in data:
+        return User(email=sub, role=data["role"], customer_id=data.get("customer_id"))
+    key = (sub, data.get("iat"))
+    principal = _principals.get(key)
+    if principal is None:
         user = session.exec(select(UserModel).where(UserModel.email == sub)).first()
-        if user is None:
+        principal = _principal(sub, user)
+        if principal is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token payload",
             )
-        role = user.role.value if hasattr(user.role, "value") else str(user.role)
-        customer_id = getattr(user, "customer_id", None)
-    return User(email=str(sub), role=role, customer_id=customer_id)
+        _principals.set(key, principal)
+    return principal
 
 
 def require_role(*roles: str):
@@ -0,0 +1,415 @@
+"""Shared object storage access.
+
+All modules obtain their S3 client through :func:`get_s3_client`. The
+boto3 client is created once per process (it is thread-safe) with a
+connection pool sized for the API thread pool and the worker fan-out, so
+requests reuse TLS connections instead of opening a new one per call.
+
+For tests and benchmarks a local stand-in with the same call signatures
+can replace S3, either via ``DOKUSUITE_STORAGE_BACKEND`` or
+:func:`set_s3_client`.
+
+Large outputs (exports) are written through :class:`MultipartWriter`, which
+uploads fixed-size parts as they fill up so memory stays bounded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import shutil
+import threading
+import uuid
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Protocol
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from .config import settings
+
+
+class ObjectStore(Protocol):
+    """Subset of the boto3 S3 client API used by DokuSuite."""
+
+    def get_object(self, Bucket: str, Key: str) -> dict[str, Any]: ...
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs: Any) -> Any: ...
+
+    def delete_object(self, Bucket: str, Key: str) -> Any: ...
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]: ...
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **kwargs: Any) -> dict[str, Any]: ...
+
+    def delete_objects(self, Bucket: str, Delete: dict[str, Any]) -> Any: ...
+
+    def generate_presigned_url(
+        self, ClientMethod: str, Params: dict[str, Any], ExpiresIn: int
+    ) -> str: ...
+
+    def generate_presigned_post(
+        self,
+        Bucket: str,
+        Key: str,
+        Fields: dict[str, Any] | None = None,
+        Conditions: list[Any] | None = None,
+        ExpiresIn: int = 3600,
+    ) -> dict[str, Any]: ...
+
+    def create_multipart_upload(self, Bucket: str, Key: str) -> dict[str, Any]: ...
+
+    def upload_part(
+        self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes
+    ) -> dict[str, Any]: ...
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict[str, Any]
+    ) -> Any: ...
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> Any: ...
+
+
+def _not_found(operation: str, key: str) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "NoSuchKey", "Message": f"{key} not found"}}, operation
+    )
+
+
+class InMemoryObjectStore:
+    """Dictionary-backed stand-in for S3."""
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        try:
+            data = self.objects[(Bucket, Key)]
+        except KeyError:
+            raise _not_found("GetObject", Key) from None
+        return {"Body": BytesIO(data), "ContentLength": len(data)}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **_: Any) -> dict[str, Any]:
+        data = Body if isinstance(Body, bytes) else Body.read()
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        data = self.objects.get((Bucket, Key))
+        if data is None:
+            raise _not_found("HeadObject", Key)
+        return {"ContentLength": len(data)}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **_: Any) -> dict[str, Any]:
+        with self._lock:
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        return {"Contents": [{"Key": k} for k in keys], "IsTruncated": False}
+
+    def delete_objects(self, Bucket: str, Delete: dict[str, Any]) -> dict[str, Any]:
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket=Bucket, Key=obj["Key"])
+        return {}
+
+    def generate_presigned_url(
+        self, ClientMethod: str, Params: dict[str, Any], ExpiresIn: int = 3600
+    ) -> str:
+        return f"memory://{Params['Bucket']}/{Params['Key']}"
+
+    def generate_presigned_post(
+        self,
+        Bucket: str,
+        Key: str,
+        Fields: dict[str, Any] | None = None,
+        Conditions: list[Any] | None = None,
+        ExpiresIn: int = 3600,
+    ) -> dict[str, Any]:
+        return {"url": f"memory://{Bucket}", "fields": {**(Fields or {}), "key": Key}}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **_: Any) -> dict[str, Any]:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes
+    ) -> dict[str, Any]:
+        with self._lock:
+            self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict[str, Any]
+    ) -> dict[str, Any]:
+        with self._lock:
+            parts = self.uploads.pop(UploadId)
+            numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+            self.objects[(Bucket, Key)] = b"".join(parts[n] for n in numbers)
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict[str, Any]:
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+
+class FileSystemObjectStore:
+    """Stand-in for S3 that stores objects below a local directory."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def _path(self, bucket: str, key: str) -> Path:
+        path = (self.root / bucket / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"invalid object key: {key}")
+        return path
+
+    def get_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("GetObject", Key)
+        return {"Body": path.open("rb"), "ContentLength": path.stat().st_size}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **_: Any) -> dict[str, Any]:
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body if isinstance(Body, bytes) else Body.read())
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        self._path(Bucket, Key).unlink(missing_ok=True)
+        return {}
+
+    def head_object(self, Bucket: str, Key: str) -> dict[str, Any]:
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise _not_found("HeadObject", Key)
+        return {"ContentLength": path.stat().st_size}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", **_: Any) -> dict[str, Any]:
+        base = self.root / Bucket
+        keys = sorted(
+            p.relative_to(base).as_posix() for p in base.rglob("*") if p.is_file()
+        ) if base.is_dir() else []
+        return {
+            "Contents": [{"Key": k} for k in keys if k.startswith(Prefix)],
+            "IsTruncated": False,
+        }
+
+    def delete_objects(self, Bucket: str, Delete: dict[str, Any]) -> dict[str, Any]:
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket=Bucket, Key=obj["Key"])
+        return {}
+
+    def generate_presigned_url(
+        self, ClientMethod: str, Params: dict[str, Any], ExpiresIn: int = 3600
+    ) -> str:
+        return self._path(Params["Bucket"], Params["Key"]).as_uri()
+
+    def generate_presigned_post(
+        self,
+        Bucket: str,
+        Key: str,
+        Fields: dict[str, Any] | None = None,
+        Conditions: list[Any] | None = None,
+        ExpiresIn: int = 3600,
+    ) -> dict[str, Any]:
+        url = (self.root / Bucket).resolve().as_uri()
+        return {"url": url, "fields": {**(Fields or {}), "key": Key}}
+
+    def _upload_dir(self, upload_id: str) -> Path:
+        return self.root / ".uploads" / upload_id
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **_: Any) -> dict[str, Any]:
+        upload_id = uuid.uuid4().hex
+        self._upload_dir(upload_id).mkdir(parents=True)
+        return {"UploadId": upload_id}
+
+    def upload_part(
+        self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes
+    ) -> dict[str, Any]:
+        (self._upload_dir(UploadId) / str(PartNumber)).write_bytes(Body)
+        return {"ETag": hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(
+        self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict[str, Any]
+    ) -> dict[str, Any]:
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        upload_dir = self._upload_dir(UploadId)
+        with path.open("wb") as out:
+            for part in MultipartUpload["Parts"]:
+                with (upload_dir / str(part["PartNumber"])).open("rb") as src:
+                    shutil.copyfileobj(src, out)
+        shutil.rmtree(upload_dir)
+        return {}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict[str, Any]:
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
+
+
+class MultipartWriter(io.RawIOBase):
+    """Write-only, non-seekable stream that uploads to S3 in fixed-size parts.
+
+    At most one part is buffered. Output that never fills a part is stored
+    with a single ``put_object``. Leaving a ``with`` block with an exception
+    aborts the multipart upload instead of completing it.
+    """
+
+    def __init__(
+        self, client: Any, bucket: str, key: str, part_size: int | None = None
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or settings.s3_multipart_part_size
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id: str | None = None
+        self._parts: list[dict[str, Any]] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data: Any) -> int:
+        if self.closed:
+            raise ValueError("write to closed MultipartWriter")
+        self._buffer += data
+        size = len(data) if not isinstance(data, memoryview) else data.nbytes
+        self._position += size
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return size
+
+    @property
+    def parts(self) -> int:
+        """Number of parts uploaded so far."""
+        return len(self._parts)
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self._upload_id = response["UploadId"]
+        number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self) -> None:
+        """Discard the upload; already uploaded parts are released."""
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def __del__(self) -> None:
+        # Never complete an upload implicitly on garbage collection.
+        if not self.closed:
+            self.abort()
+
+
+def upload_fileobj(client: Any, bucket: str, key: str, fileobj: Any) -> None:
+    """Upload a readable file object in bounded-size parts."""
+    with MultipartWriter(client, bucket, key) as writer:
+        shutil.copyfileobj(fileobj, writer, writer.part_size)
+
+
+def _create_s3_client() -> Any:
+    config = Config(
+        max_pool_connections=settings.s3_max_pool_connections,
+        connect_timeout=settings.s3_connect_timeout,
+        read_timeout=settings.s3_read_timeout,
+        retries={"max_attempts": settings.s3_max_attempts, "mode": "standard"},
+        tcp_keepalive=True,
+    )
+    # A dedicated session avoids sharing boto3's non thread-safe default session.
+    session = boto3.session.Session(
+        aws_access_key_id=settings.s3_access_key,
+        aws_secret_access_key=settings.s3_secret_key,
+        region_name=settings.s3_region,
+    )
+    return session.client("s3", endpoint_url=settings.s3_endpoint_url, config=config)
+
+
+def _create_client() -> Any:
+    if settings.storage_backend == "memory":
+        return InMemoryObjectStore()
+    if settings.storage_backend == "filesystem":
+        return FileSystemObjectStore(settings.storage_path)
+    return _create_s3_client()
+
+
+_client: Any | None = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client() -> Any:
+    """Return the process-wide object storage client, creating it on first use."""
+    global _client
+    client = _client
+    if client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+            client = _client
+    return client
+
+
+def set_s3_client(client: Any | None) -> None:
+    """Install ``client`` as the shared client; ``None`` resets to lazy creation."""
+    global _client
+    with _client_lock:
+        _client = client
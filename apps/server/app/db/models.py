@@ -4,9 +4,23 @@ import os
 from datetime import UTC, datetime
 from enum import Enum
 
-from sqlalchemy import JSON, Column, DateTime, Integer, String, UniqueConstraint, func
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlmodel import Field, SQLModel
 
+from app.db.delta import change_marker
+
 try:  # geospatial support for PostGIS
     from geoalchemy2 import Geography
 except Exception:  # pragma: no cover - fallback when geoalchemy2 missing
@@ -19,6 +33,19 @@ if Geography is not None and not DATABASE_URL.startswith("sqlite"):
 else:  # SQLite fallback used in tests
     _geog_column = Column(String, nullable=True)
 
+# Partial index predicate for rows that are not soft-deleted (ADR 0005)
+_LIVE = text("deleted_at IS NULL")
+
+
+def _live_index(name: str, *columns) -> Index:
+    return Index(name, *columns, postgresql_where=_LIVE, sqlite_where=_LIVE)
+
+
+def _change_column(table: str) -> Column:
+    # Stamped on every insert and update; orders the offline delta feed.
+    marker = change_marker(table)
+    return Column(BigInteger, nullable=False, default=marker, onupdate=marker)
+
 
 class UserRole(str, Enum):
     ADMIN = "ADMIN"
@@ -64,8 +91,35 @@ class Location(SQLModel, table=True):
         default=None,
         sa_column=Column(DateTime(timezone=True), nullable=True),
     )
+    change_id: int | None = Field(default=None, sa_column=_change_column("location"))
     model_config = {"arbitrary_types_allowed": True}
 
+    __table_args__ = (
+        Index("ix_location_customer_id", "customer_id", "id"),
+        Index("ix_location_customer_change", "customer_id", "change_id", "id"),
+    )
+
+
+class LocationSnapshot(SQLModel, table=True):
+    """Latest offline snapshot of a customer's locations (``GET /locations/snapshot``).
+
+    ``watermark`` is the change marker the snapshot was read at; the app
+    continues with the offline delta from there.
+    """
+
+    __tablename__ = "location_snapshot"
+
+    customer_id: str = Field(primary_key=True)
+    version: int = 0
+    object_key: str = ""
+    watermark: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    row_count: int = 0
+    size: int = 0
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()),
+    )
+
 
 class Order(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -73,6 +127,8 @@ class Order(SQLModel, table=True):
     name: str
     status: str
 
+    __table_args__ = (Index("ix_order_customer_id", "customer_id", "id"),)
+
 
 class ExtRef(SQLModel, table=True):
     __tablename__ = "ext_ref"
@@ -83,6 +139,8 @@ class ExtRef(SQLModel, table=True):
     record_id: str
     local_id: int
     etag: str | None = None
+    # SHA-256 of the synced fields, to skip unchanged records without an etag
+    field_hash: str | None = None
     synced_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC),
         sa_column=Column(
@@ -98,6 +156,29 @@ class ExtRef(SQLModel, table=True):
     )
 
 
+class SyncState(SQLModel, table=True):
+    """Sync progress of an external source (e.g. ``ninox:location``).
+
+    ``cursor`` is the change marker of the last complete pass, ``page`` the
+    next page of an interrupted one.
+    """
+
+    __tablename__ = "sync_state"
+
+    source: str = Field(primary_key=True)
+    cursor: str | None = None
+    page: int | None = None
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_column=Column(
+            DateTime(timezone=True),
+            nullable=False,
+            server_default=func.now(),
+            onupdate=func.now(),
+        ),
+    )
+
+
 class Photo(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     object_key: str
@@ -115,6 +196,10 @@ class Photo(SQLModel, table=True):
     calendar_week: str | None = Field(default=None)
     hash: str
     phash: str | None = Field(default=None)
+    # Compact copies of ``hash`` (SHA-256 digest) and ``phash`` (signed 64 bit);
+    # readers prefer these and fall back to the hex columns until backfilled.
+    hash_bin: bytes | None = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    phash_int: int | None = Field(default=None, sa_column=Column(BigInteger, nullable=True))
     is_duplicate: bool = Field(default=False)
     updated_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC),
@@ -129,6 +214,40 @@ class Photo(SQLModel, table=True):
         default=None,
         sa_column=Column(DateTime(timezone=True), nullable=True),
     )
+    change_id: int | None = Field(default=None, sa_column=_change_column("photo"))
+
+    __table_args__ = (
+        _live_index(
+            "ix_photo_customer_taken_at", "customer_id", text("taken_at DESC"), text("id DESC")
+        ),
+        _live_index("ix_photo_taken_at", text("taken_at DESC"), text("id DESC")),
+        _live_index("ix_photo_customer_order", "customer_id", "order_id", text("taken_at DESC")),
+        _live_index(
+            "ix_photo_customer_location", "customer_id", "location_id", text("taken_at DESC")
+        ),
+        _live_index("ix_photo_customer_status", "customer_id", "status", text("taken_at DESC")),
+        Index(
+            "ix_photo_customer_uploader",
+            "customer_id",
+            "uploader_id",
+            text("taken_at DESC"),
+            postgresql_where=text("deleted_at IS NULL AND uploader_id IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NULL AND uploader_id IS NOT NULL"),
+        ),
+        Index("ix_photo_hash", "hash"),
+        Index("ix_photo_hash_bin", "hash_bin"),
+        # One photo per uploaded object; makes ingest retries idempotent.
+        Index("ux_photo_object_key", "object_key", unique=True),
+        _live_index("ix_photo_customer_updated_at", "customer_id", "updated_at"),
+        Index("ix_photo_customer_change", "customer_id", "change_id", "id"),
+        Index(
+            "ix_photo_customer_deleted_at",
+            "customer_id",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
 
 
 class Share(SQLModel, table=True):
@@ -139,6 +258,13 @@ class Share(SQLModel, table=True):
     expires_at: datetime | None = None
     download_allowed: bool = True
     watermark_policy: str | None = None
+    # SHA-256 of the public token; the token itself is only part of ``url``
+    token_hash: str | None = Field(default=None)
+
+    __table_args__ = (
+        Index("ix_share_customer_order", "customer_id", "order_id", "id"),
+        Index("ix_share_token_hash", "token_hash", unique=True),
+    )
 
 
 class AuditLog(SQLModel, table=True):
@@ -0,0 +1,114 @@
+"""Keyset (cursor) pagination and optional row counts for list endpoints."""
+
+from __future__ import annotations
+
+import base64
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, tuple_
+from sqlmodel import Session, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+_count_cache = TTLCache(maxsize=1024, ttl=settings.count_cache_ttl)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Return an opaque cursor for the sort key ``values`` of the last row."""
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> list[Any]:
+    """Decode ``cursor`` into sort key values for ``columns``.
+
+    Raises ``ValueError`` for malformed cursors.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("invalid cursor")
+    decoded = []
+    for column, value in zip(columns, values, strict=True):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as exc:
+                raise ValueError("invalid cursor") from exc
+        decoded.append(value)
+    return decoded
+
+
+def keyset_page(
+    session: Session,
+    query: Any,
+    columns: Sequence[Any],
+    cursor: str | None,
+    limit: int,
+    descending: bool = False,
+) -> tuple[list[Any], str | None]:
+    """Return one page of ``query`` ordered by ``columns`` and the next cursor.
+
+    The last column must be unique (usually the primary key) so the order is
+    total. ``cursor`` is the value returned for the previous page, ``None`` or
+    an empty string for the first page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.where(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = list(session.exec(query.order_by(*order).limit(limit + 1)).all())
+    next_cursor = None
+    if limit > 0 and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def _estimate_postgres(session: Session, query: Any) -> int:
+    connection = session.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(session: Session, query: Any, mode: str = "exact") -> int | None:
+    """Count the rows matched by ``query``.
+
+    ``exact`` runs ``COUNT(*)``; ``estimate`` uses the PostgreSQL planner's row
+    estimate and falls back to an exact count cached for
+    ``DOKUSUITE_COUNT_CACHE_TTL`` seconds on other databases; ``none`` skips
+    counting.
+    """
+    if mode == "none":
+        return None
+    count_query = select(func.count()).select_from(query.subquery())
+    if mode != "estimate":
+        return session.exec(count_query).one()
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql":
+        return _estimate_postgres(session, query)
+    compiled = query.compile(dialect=bind.dialect)
+    key = (id(bind), str(compiled), repr(sorted(compiled.params.items())))
+    total = _count_cache.get(key)
+    if total is None:
+        total = session.exec(count_query).one()
+        _count_cache.set(key, total)
+    return total
@@ -0,0 +1,202 @@
+"""Streaming builders for photo exports.
+
+Exports are written to a non-seekable output stream (usually a
+:class:`app.core.storage.MultipartWriter`) so memory use does not grow with
+the size of the export.
+"""
+
+from __future__ import annotations
+
+import shutil
+import zipfile
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from datetime import UTC, datetime
+from pathlib import PurePosixPath
+from typing import Any, BinaryIO, NamedTuple
+
+from botocore.exceptions import ClientError
+from openpyxl import Workbook
+from sqlmodel import select
+
+from app.core.config import settings
+from app.db.models import Location, Photo
+
+# Bytes copied per read from an S3 body into the archive.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_NOT_FOUND = {"NoSuchKey", "404", "NotFound"}
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    object_key: str
+    taken_at: datetime | None = None
+
+
+def apply_photo_filters(query: Any, payload: dict[str, Any]) -> Any:
+    """Apply the export filters in ``payload`` to a photo ``query``.
+
+    Supported filters: ``customerId``, ``orderId``, ``calendarWeek``,
+    ``siteId`` (location) and ``photoIds``. Soft-deleted photos are never
+    exported.
+    """
+    query = query.where(Photo.deleted_at.is_(None))
+    if payload.get("customerId"):
+        query = query.where(Photo.customer_id == payload["customerId"])
+    if payload.get("orderId") is not None:
+        query = query.where(Photo.order_id == int(payload["orderId"]))
+    if payload.get("calendarWeek"):
+        query = query.where(Photo.calendar_week == payload["calendarWeek"])
+    if payload.get("siteId") is not None:
+        query = query.where(Photo.location_id == int(payload["siteId"]))
+    if payload.get("photoIds"):
+        query = query.where(Photo.id.in_([int(i) for i in payload["photoIds"]]))
+    return query
+
+
+def photo_export_query(payload: dict[str, Any]) -> Any:
+    """Return the photos selected by an export request, oldest first."""
+    return apply_photo_filters(select(Photo), payload).order_by(Photo.taken_at, Photo.id)
+
+
+# Header and source columns of the Excel site list.
+EXCEL_COLUMNS = [
+    ("id", Photo.id),
+    ("taken_at", Photo.taken_at),
+    ("calendar_week", Photo.calendar_week),
+    ("order_id", Photo.order_id),
+    ("site", Location.name),
+    ("address", Location.address),
+    ("status", Photo.status),
+    ("mode", Photo.mode),
+    ("uploader_id", Photo.uploader_id),
+    ("note", Photo.note),
+    ("object_key", Photo.object_key),
+]
+
+
+def excel_rows_query(payload: dict[str, Any]) -> Any:
+    """Return the site list rows for an Excel export."""
+    query = select(*(column for _name, column in EXCEL_COLUMNS)).outerjoin(
+        Location, Photo.location_id == Location.id
+    )
+    return apply_photo_filters(query, payload).order_by(Photo.taken_at, Photo.id)
+
+
+def _excel_value(value: Any) -> Any:
+    # Excel has no time zones; export timestamps as naive UTC.
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return value
+
+
+def write_excel(
+    rows: Iterable[Sequence[Any]],
+    out: BinaryIO,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write ``rows`` below the site list header as an XLSX file to ``out``.
+
+    Uses an openpyxl write-only workbook, which streams rows to disk instead
+    of keeping the sheet in memory. Returns the number of rows written.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Export")
+    ws.append([name for name, _column in EXCEL_COLUMNS])
+    count = 0
+    for row in rows:
+        ws.append([_excel_value(v) for v in row])
+        count += 1
+        if progress is not None:
+            progress(count)
+    wb.save(out)
+    return count
+
+
+def zip_entry(photo: Photo) -> ZipEntry:
+    """Archive entry for ``photo``; the id prefix keeps names unique."""
+    return ZipEntry(
+        f"{photo.id}-{PurePosixPath(photo.object_key).name}",
+        photo.object_key,
+        photo.taken_at,
+    )
+
+
+def _zip_info(entry: ZipEntry, size: int | None) -> zipfile.ZipInfo:
+    date_time = (1980, 1, 1, 0, 0, 0)
+    if entry.taken_at is not None and entry.taken_at.year >= 1980:
+        date_time = entry.taken_at.timetuple()[:6]
+    info = zipfile.ZipInfo(entry.name, date_time=date_time)
+    # JPEGs do not compress; storing avoids burning CPU for nothing.
+    info.compress_type = zipfile.ZIP_STORED
+    if size is not None:
+        info.file_size = size
+    return info
+
+
+def _close_body(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result()["Body"].close()
+
+
+def write_photo_zip(
+    client: Any,
+    entries: Iterable[ZipEntry],
+    out: BinaryIO,
+    concurrency: int | None = None,
+    progress: Callable[[int, list[str]], None] | None = None,
+) -> list[str]:
+    """Stream the objects of ``entries`` into a ZIP archive written to ``out``.
+
+    Up to ``concurrency`` objects are requested ahead in parallel; bodies are
+    copied into the archive in order and in chunks, so at most one chunk per
+    object is held in memory. Missing objects are skipped; their keys are
+    returned. ``progress`` is called with the number of processed entries and
+    the skipped keys after every entry.
+    """
+    concurrency = concurrency or settings.export_concurrency
+    skipped: list[str] = []
+    pending: deque[tuple[ZipEntry, Future]] = deque()
+    remaining = iter(entries)
+
+    def fill(pool: ThreadPoolExecutor) -> None:
+        while len(pending) < concurrency:
+            entry = next(remaining, None)
+            if entry is None:
+                return
+            future = pool.submit(
+                client.get_object, Bucket=settings.s3_bucket, Key=entry.object_key
+            )
+            pending.append((entry, future))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            with zipfile.ZipFile(out, "w", allowZip64=True) as zf:
+                fill(pool)
+                done = 0
+                while pending:
+                    entry, future = pending.popleft()
+                    fill(pool)
+                    try:
+                        obj = future.result()
+                    except ClientError as exc:
+                        if exc.response.get("Error", {}).get("Code") not in _NOT_FOUND:
+                            raise
+                        skipped.append(entry.object_key)
+                    else:
+                        size = obj.get("ContentLength")
+                        info = _zip_info(entry, size)
+                        with closing(obj["Body"]) as body, zf.open(
+                            info, "w", force_zip64=size is None
+                        ) as dest:
+                            shutil.copyfileobj(body, dest, COPY_CHUNK_SIZE)
+                    done += 1
+                    if progress is not None:
+                        progress(done, skipped)
+        finally:
+            for _entry, future in pending:
+                future.add_done_callback(_close_body)
+    return skipped
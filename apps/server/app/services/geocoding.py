@@ -1,59 +1,208 @@
 import json
+import math
 import os
+import threading
+import time
 import urllib.parse
 import urllib.request
 from typing import Any
 
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import GEOCODE_CACHE_REQUESTS
+
 try:
     from redis import Redis
 except Exception:  # pragma: no cover - redis optional
     Redis = None
 
+# Metres per degree of latitude (and of longitude at the equator).
+METERS_PER_DEGREE = 111_320.0
+
+# Cached for coordinates without an address, so they are not looked up again.
+NO_ADDRESS = ""
+
+
+def cell_key(lat: float, lon: float, grid_m: float) -> str:
+    """Cache key of the ``grid_m`` sized grid cell containing ``lat``/``lon``.
+
+    The longitude step widens with latitude so cells stay roughly square;
+    GPS jitter within a cell maps to the same key.
+    """
+    lat_step = grid_m / METERS_PER_DEGREE
+    row = math.floor(lat / lat_step)
+    centre_lat = (row + 0.5) * lat_step
+    lon_step = grid_m / (METERS_PER_DEGREE * max(math.cos(math.radians(centre_lat)), 1e-6))
+    col = math.floor(lon / lon_step)
+    return f"geocode:{grid_m:g}:{row}:{col}"
+
+
+class GeocodingError(Exception):
+    """The provider could not answer, e.g. over quota; the lookup may be retried."""
+
+
+class GoogleProvider:
+    """Google Geocoding API.
+
+    ``ZERO_RESULTS`` means the coordinates have no address; any other status
+    besides ``OK`` raises :class:`GeocodingError` so it is not cached as one.
+    """
+
+    def __init__(self, api_key: str, timeout: float) -> None:
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def reverse(self, lat: float, lon: float) -> str | None:
+        params = urllib.parse.urlencode({"latlng": f"{lat},{lon}", "key": self.api_key})
+        url = f"https://maps.googleapis.com/maps/api/geocode/json?{params}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as resp:  # pragma: no cover
+            data = json.load(resp)
+        status = data.get("status", "OK")
+        if status == "ZERO_RESULTS":
+            return None
+        if status != "OK":
+            raise GeocodingError(f"{status}: {data.get('error_message', '')}")
+        return (data.get("results") or [{}])[0].get("formatted_address")
+
+
+class StubProvider:
+    """Offline provider for load tests: a synthetic address after ``latency`` seconds."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    def reverse(self, lat: float, lon: float) -> str | None:
+        if self.latency:
+            time.sleep(self.latency)
+        return f"Stub Address {lat:.5f},{lon:.5f}"
+
+
+class RateLimiter:
+    """Token bucket allowing ``per_minute`` calls; ``acquire`` blocks until one is free."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = max(per_minute / 60.0, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: str | None = None
+        self.error: BaseException | None = None
+
+
+def _default_provider() -> Any | None:
+    if settings.geocode_provider == "stub":
+        return StubProvider(settings.geocode_stub_latency)
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY", "")
+    return GoogleProvider(api_key, settings.geocode_timeout) if api_key else None
+
 
 class GeocodingService:
-    """Reverse geocode coordinates using Google API with simple caching."""
+    """Reverse geocode coordinates with caching, coalescing and rate limiting.
 
-    def __init__(self, api_key: str | None = None, cache: Any | None = None, ttl: int = 86400):
-        self.api_key = api_key or os.getenv("GOOGLE_MAPS_API_KEY", "")
-        self.ttl = ttl
+    Results are cached per grid cell (``DOKUSUITE_GEOCODE_GRID_M``), including
+    coordinates without an address (for ``DOKUSUITE_GEOCODE_NEGATIVE_TTL``).
+    Without Redis a bounded in-process LRU is used. Concurrent lookups of the
+    same cell share one provider call, and provider calls are throttled to
+    ``DOKUSUITE_GEOCODE_RATE_LIMIT_PER_MIN``.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        cache: Any | None = None,
+        ttl: float | None = None,
+        negative_ttl: float | None = None,
+        grid_m: float | None = None,
+        provider: Any | None = None,
+        rate_limit_per_min: float | None = None,
+    ):
+        if provider is None and api_key:
+            provider = GoogleProvider(api_key, settings.geocode_timeout)
+        self.provider = provider if provider is not None else _default_provider()
+        self.ttl = settings.geocode_cache_ttl if ttl is None else ttl
+        self.negative_ttl = settings.geocode_negative_ttl if negative_ttl is None else negative_ttl
+        self.grid_m = settings.geocode_grid_m if grid_m is None else grid_m
+        if rate_limit_per_min is None:
+            rate_limit_per_min = settings.geocode_rate_limit_per_min
+        self.limiter = RateLimiter(rate_limit_per_min)
+        self._inflight: dict[str, _Call] = {}
+        self._lock = threading.Lock()
         if cache is not None:
             self.cache = cache
         else:
             redis_url = os.getenv("REDIS_URL")
+            self.cache = None
             if Redis is not None and redis_url:
                 try:
                     self.cache = Redis.from_url(redis_url)
                 except Exception:  # pragma: no cover - redis misconfigured
-                    self.cache = {}
-            else:
-                self.cache = {}
+                    pass
+            if self.cache is None:
+                self.cache = TTLCache(maxsize=settings.geocode_cache_size, ttl=self.ttl)
 
     def _cache_get(self, key: str) -> str | None:
-        if isinstance(self.cache, dict):
-            return self.cache.get(key)
         val = self.cache.get(key)
-        if val:
-            return val.decode() if isinstance(val, bytes) else val
-        return None
+        return val.decode() if isinstance(val, bytes) else val
 
-    def _cache_set(self, key: str, value: str) -> None:
+    def _cache_set(self, key: str, value: str, ttl: float) -> None:
         if isinstance(self.cache, dict):
+            # Plain dicts passed as ``cache`` keep entries without expiry
             self.cache[key] = value
-        else:
-            self.cache.set(key, value, ex=self.ttl)
+            return
+        # Redis expects whole seconds
+        self.cache.set(key, value, ex=max(1, math.ceil(ttl)))
 
     def reverse_geocode(self, lat: float, lon: float) -> str | None:
-        key = f"{lat},{lon}"
+        key = cell_key(lat, lon, self.grid_m)
         cached = self._cache_get(key)
-        if cached:
-            return cached
-        if not self.api_key:
+        if cached is not None:
+            GEOCODE_CACHE_REQUESTS.labels(result="hit").inc()
+            return cached or None
+        GEOCODE_CACHE_REQUESTS.labels(result="miss").inc()
+        if self.provider is None:
             return None
-        params = urllib.parse.urlencode({"latlng": key, "key": self.api_key})
-        url = f"https://maps.googleapis.com/maps/api/geocode/json?{params}"
-        with urllib.request.urlopen(url) as resp:  # pragma: no cover - network
-            data = json.load(resp)
-        address = data.get("results", [{}])[0].get("formatted_address")
-        if address:
-            self._cache_set(key, address)
-        return address
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            self.limiter.acquire()
+            call.result = self.provider.reverse(lat, lon)
+            if call.result:
+                self._cache_set(key, call.result, self.ttl)
+            else:
+                self._cache_set(key, NO_ADDRESS, self.negative_ttl)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
@@ -0,0 +1,136 @@
+"""Photo ingestion steps shared by the API and the ingestion worker."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.models import Photo
+from app.services.geocoding import cell_key
+from app.services.location_matching import find_nearest_location
+from app.services.media import MediaResult, process_image, stage_timer, thumbnail_key
+from app.services.phash import phash_to_int
+
+# Photo lifecycle states used by the ingest pipeline.
+PENDING = "PENDING"
+INGESTED = "INGESTED"
+FAILED = "FAILED"
+
+
+def is_duplicate_hash(session: Session, photo_hash: str, exclude_id: int | None = None) -> bool:
+    """Return whether another photo with the same content hash exists.
+
+    Matches the binary digest and, for rows not yet backfilled, the hex hash.
+    """
+    query = select(Photo.id).where(
+        or_(
+            Photo.hash_bin == bytes.fromhex(photo_hash),
+            and_(Photo.hash_bin.is_(None), Photo.hash == photo_hash),
+        )
+    )
+    if exclude_id is not None:
+        query = query.where(Photo.id != exclude_id)
+    return session.exec(query.limit(1)).first() is not None
+
+
+def fill_addresses(session: Session, spots: list[dict[str, Any]], geocoder: Any) -> int:
+    """Reverse geocode ``{"photo_id", "lat", "lon"}`` spots into ``Photo.note``.
+
+    Spots in the same grid cell share one lookup; photos that already carry a
+    note keep it. Returns the number of photos updated. The caller commits.
+    """
+    by_cell: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for spot in spots:
+        by_cell[cell_key(spot["lat"], spot["lon"], geocoder.grid_m)].append(spot)
+    updated = 0
+    for cell in by_cell.values():
+        address = geocoder.reverse_geocode(cell[0]["lat"], cell[0]["lon"])
+        if not address:
+            continue
+        photos = session.exec(
+            select(Photo).where(
+                Photo.id.in_([spot["photo_id"] for spot in cell]), Photo.note.is_(None)
+            )
+        )
+        for photo in photos:
+            photo.note = address
+            session.add(photo)
+            updated += 1
+    return updated
+
+
+def process_upload(
+    session: Session,
+    photo: Photo,
+    client: Any,
+    lat: float | None = None,
+    lon: float | None = None,
+    derivatives: bool = True,
+) -> MediaResult:
+    """Run the ingest pipeline for an uploaded original.
+
+    The object is fetched once and decoded once; the corrected original (if
+    rotated) and all thumbnails are written back, and hash, pHash, duplicate
+    flag, location and status are set on ``photo``. The caller commits.
+    Without ``derivatives`` (the synchronous API path) pHash and thumbnails
+    are left to the worker (:func:`add_derivatives`).
+    Reverse geocoding is a separate worker stage (:func:`fill_addresses`).
+    """
+    timings: dict[str, float] = {}
+    with stage_timer(timings, "fetch"):
+        obj = client.get_object(Bucket=settings.s3_bucket, Key=photo.object_key)
+        data = obj["Body"].read()
+    if derivatives:
+        result = process_image(data, settings.thumbnail_sizes)
+    else:
+        result = process_image(data, (), phash=False)
+    with stage_timer(timings, "upload"):
+        if result.rotated:
+            client.put_object(
+                Bucket=settings.s3_bucket, Key=photo.object_key, Body=result.data
+            )
+        for size, thumb in result.thumbnails.items():
+            client.put_object(
+                Bucket=settings.s3_bucket, Key=thumbnail_key(photo.object_key, size), Body=thumb
+            )
+    with stage_timer(timings, "match"):
+        photo.hash = result.sha256
+        photo.hash_bin = bytes.fromhex(result.sha256)
+        if result.phash is not None:
+            photo.phash = result.phash
+            photo.phash_int = phash_to_int(result.phash)
+        photo.is_duplicate = is_duplicate_hash(session, result.sha256, exclude_id=photo.id)
+        # Photos registered via POST /photos/batch were already matched there.
+        if lat is not None and lon is not None and photo.location_id is None:
+            photo.location_id = find_nearest_location(session, lat, lon, photo.customer_id)
+    photo.status = INGESTED
+    result.timings = {**timings, **result.timings}
+    return result
+
+
+def add_derivatives(session: Session, photo: Photo, client: Any) -> MediaResult:
+    """Write thumbnails and set the pHash of a photo the API already hashed.
+
+    The original in storage is already upright; hash, duplicate flag and
+    location are kept. This is a second read of the original after the one
+    in the request, the price of keeping thumbnails out of the response
+    time. The caller commits.
+    """
+    timings: dict[str, float] = {}
+    with stage_timer(timings, "fetch"):
+        obj = client.get_object(Bucket=settings.s3_bucket, Key=photo.object_key)
+        data = obj["Body"].read()
+    result = process_image(data, settings.thumbnail_sizes)
+    with stage_timer(timings, "upload"):
+        for size, thumb in result.thumbnails.items():
+            client.put_object(
+                Bucket=settings.s3_bucket, Key=thumbnail_key(photo.object_key, size), Body=thumb
+            )
+    photo.phash = result.phash
+    photo.phash_int = phash_to_int(result.phash)
+    result.timings = {**timings, **result.timings}
+    return result
@@ -0,0 +1,293 @@
+"""Nearest-location lookup for photo ingestion.
+
+On PostgreSQL the lookup is delegated to PostGIS (``ST_DWithin`` plus KNN
+``<->`` ordering), which is served by the ``ix_location_geog`` GiST index.
+Other databases (SQLite in development and tests) use an in-process grid
+index per customer that is built lazily on first use and kept up to date
+from committed ORM changes. Before each lookup it also picks up rows other
+processes (e.g. the Ninox sync worker) stamped with a newer ``change_id``;
+on SQLite change markers are assigned in commit order, so the highest one
+seen is an exact watermark.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import defaultdict
+from math import asin, ceil, cos, floor, radians, sin, sqrt
+from typing import Any
+
+from sqlalchemy import Float, Integer, column, event, func, values
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.models import Location
+
+EARTH_RADIUS_M = 6371000
+# Length of one degree of latitude in metres.
+METERS_PER_DEGREE = 111320.0
+
+_PENDING_KEY = "location_index_changes"
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return the haversine distance between two WGS84 points in metres."""
+    phi1, phi2 = radians(lat1), radians(lat2)
+    dphi = radians(lat2 - lat1)
+    dlambda = radians(lon2 - lon1)
+    a = sin(dphi / 2) ** 2 + cos(phi1) * cos(phi2) * sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(a))
+
+
+def parse_point(point: str) -> tuple[float, float]:
+    """Parse a ``POINT(lon lat)`` WKT string into ``(lat, lon)``."""
+    wkt = point.split(";", 1)[-1]
+    lon, lat = map(float, wkt.replace("POINT(", "").replace(")", "").split())
+    return lat, lon
+
+
+class LocationIndex:
+    """Uniform lat/lon grid for radius queries.
+
+    Cells are ``cell_m`` high; a radius query only inspects the cells that
+    overlap the search circle, so its cost depends on local density rather
+    than on the total number of locations.
+    """
+
+    def __init__(self, cell_m: float) -> None:
+        self._cell_deg = cell_m / METERS_PER_DEGREE
+        self._cells: dict[tuple[int, int], dict[int, tuple[float, float]]] = defaultdict(dict)
+        self._points: dict[int, tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return floor(lat / self._cell_deg), floor(lon / self._cell_deg)
+
+    def upsert(self, location_id: int, lat: float, lon: float) -> None:
+        self.remove(location_id)
+        self._points[location_id] = (lat, lon)
+        self._cells[self._cell(lat, lon)][location_id] = (lat, lon)
+
+    def remove(self, location_id: int) -> None:
+        point = self._points.pop(location_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(location_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def nearest(self, lat: float, lon: float, radius_m: float) -> int | None:
+        """Return the id of the closest point strictly within ``radius_m``."""
+        radius_deg = radius_m / METERS_PER_DEGREE
+        lon_scale = max(cos(radians(lat)), 0.01)
+        lat_span = ceil(radius_deg / self._cell_deg)
+        lon_span = ceil(radius_deg / lon_scale / self._cell_deg)
+        row, col = self._cell(lat, lon)
+        best_id: int | None = None
+        best_dist = radius_m
+        for r in range(row - lat_span, row + lat_span + 1):
+            for c in range(col - lon_span, col + lon_span + 1):
+                bucket = self._cells.get((r, c))
+                if not bucket:
+                    continue
+                for location_id, (loc_lat, loc_lon) in bucket.items():
+                    dist = distance_m(lat, lon, loc_lat, loc_lon)
+                    if dist < best_dist:
+                        best_dist = dist
+                        best_id = location_id
+        return best_id
+
+
+class _EngineIndexes:
+    """Lazily built :class:`LocationIndex` instances for one engine."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # ``None`` holds the cross-customer index used by unscoped users.
+        self.by_customer: dict[str | None, LocationIndex] = {}
+        # Lowest ``change_id`` not yet applied to each index.
+        self.watermarks: dict[str | None, int] = {}
+
+
+_registry: weakref.WeakKeyDictionary[Engine, _EngineIndexes] = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+
+def _indexes_for(engine: Engine) -> _EngineIndexes:
+    with _registry_lock:
+        indexes = _registry.get(engine)
+        if indexes is None:
+            indexes = _registry[engine] = _EngineIndexes()
+        return indexes
+
+
+def _load(
+    session: Session, index: LocationIndex, customer_id: str | None, since: int
+) -> int:
+    """Apply rows with ``change_id >= since`` to ``index``; return the next watermark."""
+    query = select(Location.id, Location.geog, Location.change_id).where(
+        Location.change_id >= since
+    )
+    if customer_id:
+        query = query.where(Location.customer_id == customer_id)
+    for location_id, geog, change_id in session.exec(query):
+        since = max(since, change_id + 1)
+        try:
+            lat, lon = parse_point(geog)
+        except (AttributeError, TypeError, ValueError):
+            index.remove(location_id)
+            continue
+        index.upsert(location_id, lat, lon)
+    return since
+
+
+def _nearest(
+    session: Session,
+    points: list[tuple[float, float]],
+    customer_id: str | None,
+    radius_m: float,
+) -> list[int | None]:
+    indexes = _indexes_for(session.get_bind())
+    # Held for the lookups too: commits of other threads update the same buckets.
+    with indexes.lock:
+        index = indexes.by_customer.get(customer_id)
+        if index is None:
+            index = indexes.by_customer[customer_id] = LocationIndex(settings.match_radius_m)
+        since = indexes.watermarks.get(customer_id, 0)
+        indexes.watermarks[customer_id] = _load(session, index, customer_id, since)
+        return [index.nearest(lat, lon, radius_m) for lat, lon in points]
+
+
+def invalidate(engine: Engine, customer_id: str | None = None) -> None:
+    """Drop cached indexes so they are rebuilt on next use.
+
+    Needed after hard deletes outside this process, which leave no change
+    marker behind.
+    """
+    indexes = _indexes_for(engine)
+    with indexes.lock:
+        if customer_id is None:
+            indexes.by_customer.clear()
+            indexes.watermarks.clear()
+        else:
+            for key in (customer_id, None):
+                indexes.by_customer.pop(key, None)
+                indexes.watermarks.pop(key, None)
+
+
+def _postgis_nearest(
+    session: Session, lat: float, lon: float, customer_id: str | None, radius_m: float
+) -> int | None:
+    point = func.ST_GeogFromText(f"SRID=4326;POINT({lon} {lat})")
+    query = select(Location.id).where(func.ST_DWithin(Location.geog, point, radius_m))
+    if customer_id:
+        query = query.where(Location.customer_id == customer_id)
+    query = query.order_by(Location.geog.op("<->")(point)).limit(1)
+    return session.exec(query).first()
+
+
+def find_nearest_location(
+    session: Session,
+    lat: float,
+    lon: float,
+    customer_id: str | None = None,
+    radius_m: float | None = None,
+) -> int | None:
+    """Return the id of the nearest location within ``radius_m`` of a point."""
+    radius = settings.match_radius_m if radius_m is None else radius_m
+    if session.get_bind().dialect.name == "postgresql":
+        return _postgis_nearest(session, lat, lon, customer_id, radius)
+    return _nearest(session, [(lat, lon)], customer_id, radius)[0]
+
+
+def _postgis_nearest_many(
+    session: Session,
+    points: list[tuple[float, float]],
+    customer_id: str | None,
+    radius_m: float,
+) -> list[int | None]:
+    pts = values(
+        column("idx", Integer), column("lat", Float), column("lon", Float), name="pts"
+    ).data([(i, lat, lon) for i, (lat, lon) in enumerate(points)])
+    point = func.ST_GeogFromText(func.concat("SRID=4326;POINT(", pts.c.lon, " ", pts.c.lat, ")"))
+    nearest = select(Location.id).where(func.ST_DWithin(Location.geog, point, radius_m))
+    if customer_id:
+        nearest = nearest.where(Location.customer_id == customer_id)
+    nearest = nearest.order_by(Location.geog.op("<->")(point)).limit(1).scalar_subquery()
+    result: list[int | None] = [None] * len(points)
+    for idx, location_id in session.exec(select(pts.c.idx, nearest)):
+        result[idx] = location_id
+    return result
+
+
+def find_nearest_locations(
+    session: Session,
+    points: list[tuple[float, float]],
+    customer_id: str | None = None,
+    radius_m: float | None = None,
+) -> list[int | None]:
+    """Batch variant of :func:`find_nearest_location` for ``(lat, lon)`` points.
+
+    Runs a single query on PostgreSQL and one index lookup elsewhere.
+    """
+    if not points:
+        return []
+    radius = settings.match_radius_m if radius_m is None else radius_m
+    if session.get_bind().dialect.name == "postgresql":
+        return _postgis_nearest_many(session, points, customer_id, radius)
+    return _nearest(session, points, customer_id, radius)
+
+
+# --- incremental maintenance ------------------------------------------
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changes(session: OrmSession, flush_context: Any) -> None:
+    changes: dict[int, tuple[str | None, Any]] | None = None
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Location) and obj.id is not None:
+            changes = session.info.setdefault(_PENDING_KEY, {})
+            changes[obj.id] = (obj.customer_id, obj.geog)
+    for obj in session.deleted:
+        if isinstance(obj, Location) and obj.id is not None:
+            changes = session.info.setdefault(_PENDING_KEY, {})
+            changes[obj.id] = (obj.customer_id, None)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_changes(session: OrmSession) -> None:
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    indexes = _registry.get(session.get_bind())
+    if indexes is None:
+        return
+    with indexes.lock:
+        if not indexes.by_customer:
+            return
+        for location_id, (customer_id, geog) in changes.items():
+            for index in indexes.by_customer.values():
+                index.remove(location_id)
+            if not isinstance(geog, str):
+                continue
+            try:
+                lat, lon = parse_point(geog)
+            except ValueError:  # pragma: no cover - malformed data
+                continue
+            for key in (customer_id, None):
+                index = indexes.by_customer.get(key)
+                if index is not None:
+                    index.upsert(location_id, lat, lon)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changes(session: OrmSession) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,158 @@
+"""Per-customer location snapshots for the offline cold start of the app.
+
+A snapshot holds every live location of a customer as gzip'd columnar JSON::
+
+    {"format": 1, "version": 7, "customer_id": "c1", "created_at": "...",
+     "token": "...", "count": 2,
+     "columns": {"id": [1, 2], "name": ["A", "B"], ...}}
+
+``token`` is the offline-delta sync token to continue from, so the app
+downloads the snapshot once and then only pages through later changes.
+The watermark behind it is stored with the snapshot: a customer without
+rows stamped at or above it since has nothing new and is skipped.
+Snapshots are stored at ``{prefix}/{customer}/v{version}.json.gz`` and never
+overwritten; the latest one per customer is recorded in
+``location_snapshot``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.storage import get_s3_client
+from app.db.delta import SyncToken, watermark
+from app.db.models import Location, LocationSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Layout of the snapshot file; bump when the app has to parse it differently.
+FORMAT = 1
+
+# Columns of a snapshot, the fields of ``LocationRead`` as in the offline delta.
+FIELDS = ["id", "name", "original_name", "revision", "address", "active"]
+
+_SAFE_SEGMENT = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _customer_segment(customer_id: str) -> str:
+    if _SAFE_SEGMENT.match(customer_id):
+        return customer_id
+    return "h-" + hashlib.sha256(customer_id.encode()).hexdigest()[:16]
+
+
+def snapshot_key(customer_id: str, version: int) -> str:
+    """Object key of version ``version`` of ``customer_id``'s snapshot."""
+    prefix = settings.location_snapshot_prefix.rstrip("/")
+    return f"{prefix}/{_customer_segment(customer_id)}/v{version}.json.gz"
+
+
+@dataclass
+class SnapshotResult:
+    customer_id: str
+    version: int
+    count: int
+    size: int
+    built: bool
+
+
+class LocationSnapshotService:
+    """Build location snapshots into object storage."""
+
+    def __init__(self, session: Session, client: Any | None = None) -> None:
+        self.session = session
+        self.client = client if client is not None else get_s3_client()
+
+    def build_all(self) -> list[SnapshotResult]:
+        """Build the snapshot of every customer with locations."""
+        customers = self.session.exec(select(Location.customer_id).distinct()).all()
+        return [self.build(customer_id) for customer_id in sorted(customers)]
+
+    def build(self, customer_id: str) -> SnapshotResult:
+        """Build a new snapshot version unless nothing changed since the last one."""
+        current = self.session.get(LocationSnapshot, customer_id)
+        if current is not None and not self._changed_since(customer_id, current.watermark):
+            return SnapshotResult(
+                customer_id, current.version, current.row_count, current.size, built=False
+            )
+
+        # Taken before reading, so changes racing with the build reach the app as deltas.
+        mark = watermark(self.session, Location)
+        columns: dict[str, list[Any]] = {f: [] for f in FIELDS}
+        query = (
+            select(*[getattr(Location, f) for f in FIELDS])
+            .where(Location.customer_id == customer_id, Location.deleted_at.is_(None))
+            .order_by(Location.id)
+            .execution_options(yield_per=settings.export_batch_size)
+        )
+        count = 0
+        for row in self.session.exec(query):
+            for name, value in zip(FIELDS, row, strict=True):
+                columns[name].append(value)
+            count += 1
+
+        version = (current.version if current is not None else 0) + 1
+        now = datetime.now(UTC)
+        document = {
+            "format": FORMAT,
+            "version": version,
+            "customer_id": customer_id,
+            "created_at": now.isoformat(),
+            "token": SyncToken(mark, 0).encode(),
+            "count": count,
+            "columns": columns,
+        }
+        body = gzip.compress(
+            json.dumps(document, separators=(",", ":"), default=str).encode(), mtime=0
+        )
+        key = snapshot_key(customer_id, version)
+        self.client.put_object(
+            Bucket=settings.s3_bucket,
+            Key=key,
+            Body=body,
+            ContentType="application/json",
+            ContentEncoding="gzip",
+            # Versioned keys are never rewritten. Customer data, so no shared
+            # (CDN) caching; see ADR 0007.
+            CacheControl="private, max-age=31536000, immutable",
+        )
+
+        snapshot = current or LocationSnapshot(customer_id=customer_id)
+        snapshot.version = version
+        snapshot.object_key = key
+        snapshot.watermark = mark
+        snapshot.row_count = count
+        snapshot.size = len(body)
+        snapshot.created_at = now
+        self.session.add(snapshot)
+        self.session.commit()
+
+        # Older versions stay readable while presigned URLs handed out for them are valid.
+        stale = version - max(1, settings.location_snapshot_keep)
+        if stale > 0:
+            self.client.delete_object(
+                Bucket=settings.s3_bucket, Key=snapshot_key(customer_id, stale)
+            )
+        logger.info(
+            "location snapshot built",
+            extra={"customer_id": customer_id, "version": version, "count": count},
+        )
+        return SnapshotResult(customer_id, version, count, len(body), built=True)
+
+    def _changed_since(self, customer_id: str, mark: int) -> bool:
+        # Any write, including a soft delete, stamps change_id at or above the watermark.
+        query = (
+            select(Location.id)
+            .where(Location.customer_id == customer_id, Location.change_id >= mark)
+            .limit(1)
+        )
+        return self.session.exec(query).first() is not None
@@ -0,0 +1,112 @@
+"""Single-decode image pipeline for uploaded photos.
+
+The original is decoded once; orientation, thumbnails, the perceptual hash
+and the content hash are all derived from that in-memory image.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from app.services.exif import get_orientation
+from app.services.phash import compute_phash_image
+
+# Longest edge in pixels of the default thumbnail (kept at the legacy key).
+DEFAULT_THUMBNAIL_SIZE = 256
+
+
+def thumbnail_key(object_key: str, size: int = DEFAULT_THUMBNAIL_SIZE) -> str:
+    """Return the object key under which a thumbnail of ``size`` is stored."""
+    if size == DEFAULT_THUMBNAIL_SIZE:
+        return f"thumbnails/{object_key}.jpg"
+    return f"thumbnails/{size}/{object_key}.jpg"
+
+
+@dataclass
+class MediaResult:
+    """Derivatives computed from one decoded image."""
+
+    data: bytes
+    rotated: bool
+    sha256: str
+    phash: str | None
+    thumbnails: dict[int, bytes] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@contextmanager
+def stage_timer(timings: dict[str, float], stage: str) -> Iterator[None]:
+    """Record the wall time of a block in milliseconds under ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def _encode_jpeg(image: Image.Image) -> bytes:
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buf = BytesIO()
+    image.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def process_image(
+    data: bytes,
+    thumbnail_sizes: Iterable[int] = (DEFAULT_THUMBNAIL_SIZE,),
+    phash: bool = True,
+) -> MediaResult:
+    """Decode ``data`` once and compute all ingest derivatives.
+
+    The original bytes are only re-encoded when an EXIF orientation has to be
+    applied; otherwise ``data`` is returned unchanged. Without ``phash`` and
+    thumbnails the pixels are only decoded for that rotation.
+    """
+    timings: dict[str, float] = {}
+    sizes = sorted(set(thumbnail_sizes), reverse=True)
+    with stage_timer(timings, "decode"):
+        image = Image.open(BytesIO(data))
+        if phash or sizes:
+            image.load()
+        image_format = image.format
+
+    rotated = get_orientation(image) not in (None, 1)
+    if rotated:
+        with stage_timer(timings, "orient"):
+            image = ImageOps.exif_transpose(image)
+            buf = BytesIO()
+            image.save(buf, format=image_format)
+            data = buf.getvalue()
+
+    phash_value = None
+    if phash:
+        with stage_timer(timings, "phash"):
+            phash_value = compute_phash_image(image)
+
+    with stage_timer(timings, "sha256"):
+        digest = hashlib.sha256(data).hexdigest()
+
+    thumbnails: dict[int, bytes] = {}
+    with stage_timer(timings, "thumbnails"):
+        # Shrink in place from the largest size down; the full-size image is
+        # not needed any more at this point.
+        for size in sizes:
+            image.thumbnail((size, size))
+            thumbnails[size] = _encode_jpeg(image)
+
+    return MediaResult(
+        data=data,
+        rotated=rotated,
+        sha256=digest,
+        phash=phash_value,
+        thumbnails=thumbnails,
+        timings=timings,
+    )
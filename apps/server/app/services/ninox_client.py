@@ -0,0 +1,123 @@
+"""Paginated HTTP client for the Ninox export endpoints.
+
+Each table is served at ``{base_url}/{table}?page=N&perPage=M[&since=cursor]``
+and answers with ``{"records": [...], "cursor": "..."}`` (a bare list of
+records is accepted as well). A page shorter than ``perPage`` is the last
+one. Pages are fetched ahead concurrently but yielded in order, so only a
+few pages are held in memory regardless of the table size.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: throttling and transient server errors.
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class Page:
+    number: int
+    records: list[dict[str, Any]]
+    cursor: str | None = None
+
+
+class NinoxClient:
+    """Fetch Ninox tables page by page with prefetch and retry/backoff."""
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str | None = None,
+        page_size: int | None = None,
+        prefetch: int | None = None,
+        timeout: float | None = None,
+        max_retries: int | None = None,
+        backoff: float | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.page_size = page_size or settings.ninox_page_size
+        self.prefetch = max(1, prefetch or settings.ninox_prefetch)
+        self.timeout = settings.ninox_timeout if timeout is None else timeout
+        self.max_retries = settings.ninox_max_retries if max_retries is None else max_retries
+        self.backoff = settings.ninox_retry_backoff if backoff is None else backoff
+
+    def pages(self, table: str, since: str | None = None, start: int = 0) -> Iterator[Page]:
+        """Yield the pages of ``table`` from page ``start`` on, in order.
+
+        Up to ``prefetch`` pages are requested concurrently ahead of the
+        consumer.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix="ninox")
+        pending: deque[Future[Page]] = deque()
+        next_page = start
+
+        def submit() -> None:
+            nonlocal next_page
+            pending.append(pool.submit(self.get_page, table, next_page, since))
+            next_page += 1
+
+        try:
+            for _ in range(self.prefetch):
+                submit()
+            while pending:
+                page = pending.popleft().result()
+                yield page
+                if len(page.records) < self.page_size:
+                    return
+                submit()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_page(self, table: str, number: int, since: str | None = None) -> Page:
+        params: dict[str, Any] = {"page": number, "perPage": self.page_size}
+        if since:
+            params["since"] = since
+        body = self._request(f"{self.base_url}/{table}?{urllib.parse.urlencode(params)}")
+        if isinstance(body, list):
+            return Page(number, body)
+        cursor = body.get("cursor")
+        return Page(number, body.get("records", []), str(cursor) if cursor else None)
+
+    def _request(self, url: str) -> Any:
+        req = urllib.request.Request(url)
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        for attempt in range(self.max_retries + 1):
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as resp:  # nosec B310
+                    return json.load(resp)
+            except urllib.error.HTTPError as exc:
+                if exc.code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(exc)
+                if delay is None:
+                    delay = self.backoff * 2**attempt
+            except (urllib.error.URLError, TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt
+            logger.warning("ninox request retried", extra={"url": url, "attempt": attempt + 1})
+            time.sleep(delay)
+
+
+def _retry_after(exc: urllib.error.HTTPError) -> float | None:
+    try:
+        return float(exc.headers.get("Retry-After", ""))
+    except (TypeError, ValueError):
+        return None
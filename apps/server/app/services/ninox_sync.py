@@ -1,97 +1,252 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import urllib.request
-from collections.abc import Iterable
+import logging
+import os
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import asdict, dataclass
 from datetime import UTC, datetime
+from itertools import islice
 from typing import Any
 
+from sqlalchemy import null, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlmodel import Session, select
 
-from app.db.models import ExtRef, Location, Order
+from app.core.config import settings
+from app.core.metrics import NINOX_SYNC_RECORDS
+from app.db.models import ExtRef, Location, Order, SyncState
+from app.services.ninox_client import NinoxClient, Page
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "ninox"
+
+# Ninox endpoint per local table
+TABLES = {"location": "locations", "order": "orders"}
+
+
+def _chunks(records: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    it = iter(records)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def field_hash(rec: dict[str, Any], fields: list[str]) -> str:
+    """Stable hash of the synced fields of a record."""
+    values = {f: rec.get(f) for f in fields}
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class SyncStats:
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
 
 
 class NinoxSyncService:
-    """Synchronise data from Ninox into local tables."""
+    """Synchronise data from Ninox into local tables.
+
+    Records are processed in batches of ``DOKUSUITE_NINOX_SYNC_BATCH_SIZE``:
+    mappings and local rows of a batch are loaded with one ``IN`` query each,
+    new rows are inserted in one flush and existing ones updated in one
+    executemany, mappings are upserted with ``INSERT ... ON CONFLICT`` and
+    every batch is committed separately. ``progress(table, done)`` is called
+    after each batch.
+
+    Records whose etag or field hash matches the stored mapping are skipped,
+    so unchanged rows keep their ``updated_at``.
+
+    Without explicit records each table is streamed page by page from
+    ``NINOX_API_BASE`` (:class:`NinoxClient`), asking only for changes since
+    the cursor of the last complete pass. The next page is stored in
+    ``sync_state`` with every committed page, so an interrupted run resumes
+    where it stopped.
+    """
 
     def __init__(
         self,
         session: Session,
         base_url: str | None = None,
         token: str | None = None,
+        batch_size: int | None = None,
+        progress: Callable[[str, int], None] | None = None,
     ) -> None:
         self.session = session
-        self.base_url = base_url
-        self.token = token
-
-    # --- fetching -----------------------------------------------------
-    def fetch(self) -> dict[str, list[dict[str, Any]]]:  # pragma: no cover - requires network
-        if not self.base_url:
-            return {"locations": [], "orders": []}
-        req = urllib.request.Request(self.base_url)
-        if self.token:
-            req.add_header("Authorization", f"Bearer {self.token}")
-        with urllib.request.urlopen(req, timeout=10) as resp:  # nosec B310
-            return json.load(resp)
+        self.base_url = base_url or os.getenv("NINOX_API_BASE")
+        self.token = token or os.getenv("NINOX_API_TOKEN")
+        self.batch_size = batch_size or settings.ninox_sync_batch_size
+        self.progress = progress
 
     # --- public API ---------------------------------------------------
-    def run(self, payload: dict[str, Any] | None = None) -> None:
-        data = payload or self.fetch()
-        self.sync_locations(data.get("locations", []))
-        self.sync_orders(data.get("orders", []))
-        self.session.commit()
+    def run(self, payload: dict[str, Any] | None = None) -> dict[str, dict[str, int]]:
+        """Sync a payload, or fetch the changes from Ninox; return counters per table."""
+        if payload:
+            stats = {
+                "location": self.sync_locations(payload.get("locations", [])),
+                "order": self.sync_orders(payload.get("orders", [])),
+            }
+        else:
+            stats = {"location": self.sync_locations(), "order": self.sync_orders()}
+        return {table: asdict(s) for table, s in stats.items()}
 
     # --- syncing helpers ----------------------------------------------
-    def sync_locations(self, records: Iterable[dict[str, Any]]) -> None:
-        for rec in records:
-            self._sync_record(
-                rec, "location", Location, ["customer_id", "name", "address", "active"]
+    def sync_locations(self, records: Iterable[dict[str, Any]] | None = None) -> SyncStats:
+        """Sync ``records``, or stream the ``locations`` table from Ninox."""
+        return self._sync_table(
+            records, "location", Location, ["customer_id", "name", "address", "active"]
+        )
+
+    def sync_orders(self, records: Iterable[dict[str, Any]] | None = None) -> SyncStats:
+        """Sync ``records``, or stream the ``orders`` table from Ninox."""
+        return self._sync_table(records, "order", Order, ["customer_id", "name", "status"])
+
+    def _sync_table(
+        self,
+        records: Iterable[dict[str, Any]] | None,
+        table: str,
+        model_cls: Any,
+        fields: list[str],
+    ) -> SyncStats:
+        state: SyncState | None = None
+        if records is not None:
+            pages: Iterable[Page] = (
+                Page(number, chunk)
+                for number, chunk in enumerate(_chunks(records, self.batch_size))
             )
+        else:
+            if not self.base_url:
+                return SyncStats()
+            client = NinoxClient(self.base_url, self.token)
+            key = f"{SOURCE}:{table}"
+            state = self.session.get(SyncState, key) or SyncState(source=key)
+            pages = client.pages(TABLES[table], since=state.cursor, start=state.page or 0)
 
-    def sync_orders(self, records: Iterable[dict[str, Any]]) -> None:
-        for rec in records:
-            self._sync_record(rec, "order", Order, ["customer_id", "name", "status"])
+        stats = SyncStats()
+        done = 0
+        cursor = None
+        for page in pages:
+            for chunk in _chunks(page.records, self.batch_size):
+                self._sync_batch(chunk, table, model_cls, fields, stats)
+            if state is not None:
+                # Committed with the page, so an interrupted run resumes after it.
+                state.page = page.number + 1
+                cursor = page.cursor or cursor
+                self.session.add(state)
+            self.session.commit()
+            done += len(page.records)
+            if self.progress is not None:
+                self.progress(table, done)
+        if state is not None:
+            state.page = None
+            state.cursor = cursor or state.cursor
+            self.session.add(state)
+            self.session.commit()
 
-    def _sync_record(
-        self, rec: dict[str, Any], table: str, model_cls: Any, fields: list[str]
+        for result, count in asdict(stats).items():
+            if count:
+                NINOX_SYNC_RECORDS.labels(table=table, result=result).inc(count)
+        logger.info("ninox table synced", extra={"table": table, "stats": asdict(stats)})
+        return stats
+
+    def _sync_batch(
+        self,
+        chunk: list[dict[str, Any]],
+        table: str,
+        model_cls: Any,
+        fields: list[str],
+        stats: SyncStats,
     ) -> None:
-        ext = self.session.exec(
-            select(ExtRef).where(
-                ExtRef.source == "ninox",
-                ExtRef.table == table,
-                ExtRef.record_id == str(rec["id"]),
+        # Later occurrences of a record win, as with sequential processing.
+        records = {str(rec["id"]): rec for rec in chunk}
+        refs = {
+            row.record_id: row
+            for row in self.session.exec(
+                select(
+                    ExtRef.record_id, ExtRef.local_id, ExtRef.etag, ExtRef.field_hash
+                ).where(
+                    ExtRef.source == SOURCE,
+                    ExtRef.table == table,
+                    ExtRef.record_id.in_(records),
+                )
             )
-        ).first()
+        }
+        # Existing local rows and their deletion time; no ORM objects are loaded.
+        deleted_at = getattr(model_cls, "deleted_at", None)
+        local = dict(
+            self.session.exec(
+                select(model_cls.id, deleted_at if deleted_at is not None else null()).where(
+                    model_cls.id.in_({ref.local_id for ref in refs.values()})
+                )
+            ).all()
+        )
 
-        if rec.get("deleted"):
-            if ext:
-                obj = self.session.get(model_cls, ext.local_id)
-                if obj and getattr(obj, "deleted_at", None) is None:
-                    obj.deleted_at = datetime.now(UTC)
-            return
-
-        if ext:
-            obj = self.session.get(model_cls, ext.local_id)
-            if not obj:
+        now = datetime.now(UTC)
+        changes: list[dict[str, Any]] = []
+        mappings: dict[str, tuple[Any, str]] = {}
+        for record_id, rec in records.items():
+            ref = refs.get(record_id)
+            local_id = ref.local_id if ref is not None and ref.local_id in local else None
+            if rec.get("deleted"):
+                if local_id is not None and local[local_id] is None:
+                    changes.append({"id": local_id, "deleted_at": now})
+                    stats.deleted += 1
+                else:
+                    stats.skipped += 1
+                continue
+            digest = field_hash(rec, fields)
+            etag = rec.get("etag")
+            if local_id is None:
                 obj = model_cls(**{f: rec.get(f) for f in fields})
                 self.session.add(obj)
-                self.session.flush()
-                ext.local_id = obj.id
+                mappings[record_id] = (obj, digest)
+                stats.created += 1
+            elif (etag is not None and etag == ref.etag) or digest == ref.field_hash:
+                stats.skipped += 1
+                if etag != ref.etag:
+                    # Same fields under a new etag: remember it, leave the row alone.
+                    mappings[record_id] = (local_id, digest)
             else:
-                for f in fields:
-                    if f in rec:
-                        setattr(obj, f, rec[f])
-        else:
-            obj = model_cls(**{f: rec.get(f) for f in fields})
-            self.session.add(obj)
-            self.session.flush()
-            ext = ExtRef(
-                source="ninox",
-                table=table,
-                record_id=str(rec["id"]),
-                local_id=obj.id,
-            )
-            self.session.add(ext)
+                changes.append({"id": local_id, **{f: rec[f] for f in fields if f in rec}})
+                mappings[record_id] = (local_id, digest)
+                stats.updated += 1
+        self.session.flush()
+        if changes:
+            # ORM bulk UPDATE by primary key: one executemany per batch.
+            self.session.execute(update(model_cls), changes)
 
-        ext.etag = rec.get("etag")
-        ext.synced_at = datetime.now(UTC)
+        self._upsert_ext_refs(
+            [
+                {
+                    "source": SOURCE,
+                    "table": table,
+                    "record_id": record_id,
+                    "local_id": target if isinstance(target, int) else target.id,
+                    "etag": records[record_id].get("etag"),
+                    "field_hash": digest,
+                    "synced_at": now,
+                }
+                for record_id, (target, digest) in mappings.items()
+            ]
+        )
+
+    def _upsert_ext_refs(self, rows: list[dict[str, Any]]) -> None:
+        if not rows:
+            return
+        if self.session.get_bind().dialect.name == "postgresql":
+            stmt = postgresql.insert(ExtRef.__table__)
+        else:
+            stmt = sqlite.insert(ExtRef.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["source", "table", "record_id"],
+            set_={
+                "local_id": stmt.excluded.local_id,
+                "etag": stmt.excluded.etag,
+                "field_hash": stmt.excluded.field_hash,
+                "synced_at": stmt.excluded.synced_at,
+            },
+        )
+        self.session.execute(stmt, rows)
@@ -6,7 +6,34 @@ import imagehash
 from PIL import Image
 
 
+def compute_phash_image(image: Image.Image) -> str:
+    """Return the perceptual hash of an already decoded image."""
+    return str(imagehash.phash(image))
+
+
 def compute_phash(data: bytes) -> str:
     """Return the perceptual hash of the given image bytes."""
     with Image.open(BytesIO(data)) as img:
-        return str(imagehash.phash(img))
+        return compute_phash_image(img)
+
+
+_UINT64 = (1 << 64) - 1
+
+
+def phash_to_int(phash: str) -> int:
+    """Hex pHash as a signed 64-bit integer for the ``photo.phash_int`` column."""
+    value = int(phash, 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def phash_bits(phash_int: int | None, phash: str | None) -> int | None:
+    """Unsigned 64-bit pHash of a photo, preferring the integer column.
+
+    Rows written before the binary columns were backfilled only carry the
+    hex string.
+    """
+    if phash_int is not None:
+        return phash_int & _UINT64
+    if phash:
+        return int(phash, 16)
+    return None
@@ -0,0 +1,116 @@
+"""Content-addressed cache of watermarked renditions for public shares.
+
+Renditions are stored at ``renditions/{hash}/{policy}/{date}.jpg``: the same
+photo under the same watermark policy is rendered at most once per day and
+reused across requests and shares. The date is part of the key because the
+watermark carries it. Old renditions are removed by :func:`sweep_renditions`
+(scheduled worker job) or an S3 lifecycle rule on the ``renditions/`` prefix.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from datetime import UTC, date, datetime, timedelta
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.models import Photo
+from app.services.watermark import apply_watermark
+
+RENDITION_PREFIX = "renditions/"
+
+_NOT_FOUND = {"NoSuchKey", "404", "NotFound"}
+_SAFE_SEGMENT = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Keys known to exist, to skip the HEAD request on hot renditions.
+_known = TTLCache(maxsize=4096, ttl=3600)
+# Striped locks so concurrent requests for one rendition render it once.
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _policy_segment(policy: str | None) -> str:
+    if not policy:
+        return "default"
+    if _SAFE_SEGMENT.match(policy):
+        return policy
+    return "p-" + hashlib.sha256(policy.encode()).hexdigest()[:16]
+
+
+def _content_id(photo: Photo) -> str:
+    # Photos still pending ingest have no hash yet; their object key is unique.
+    return photo.hash or "key-" + hashlib.sha256(photo.object_key.encode()).hexdigest()
+
+
+def rendition_key(photo: Photo, policy: str | None, day: date) -> str:
+    """Return the object key of the watermarked rendition of ``photo``."""
+    segments = (_content_id(photo), _policy_segment(policy), f"{day.isoformat()}.jpg")
+    return RENDITION_PREFIX + "/".join(segments)
+
+
+def _exists(client: Any, key: str) -> bool:
+    try:
+        client.head_object(Bucket=settings.s3_bucket, Key=key)
+    except ClientError as exc:
+        if exc.response.get("Error", {}).get("Code") in _NOT_FOUND:
+            return False
+        raise
+    return True
+
+
+def get_or_create_rendition(
+    client: Any, photo: Photo, policy: str | None, day: date | None = None
+) -> str:
+    """Return the key of today's watermarked rendition, rendering it if missing."""
+    day = day or datetime.now(UTC).date()
+    key = rendition_key(photo, policy, day)
+    if key in _known:
+        return key
+    with _locks[hash(key) % len(_locks)]:
+        if key not in _known and not _exists(client, key):
+            obj = client.get_object(Bucket=settings.s3_bucket, Key=photo.object_key)
+            data = apply_watermark(obj["Body"].read(), day)
+            client.put_object(Bucket=settings.s3_bucket, Key=key, Body=data)
+        _known.set(key, True)
+    return key
+
+
+def _rendition_day(key: str) -> date | None:
+    try:
+        return date.fromisoformat(key.rsplit("/", 1)[-1].removesuffix(".jpg"))
+    except ValueError:
+        return None
+
+
+def sweep_renditions(client: Any, today: date | None = None) -> int:
+    """Delete renditions older than ``DOKUSUITE_RENDITION_RETENTION_DAYS``.
+
+    Returns the number of deleted objects.
+    """
+    today = today or datetime.now(UTC).date()
+    # Keep at least yesterday's renditions: presigned URLs outlive midnight.
+    cutoff = today - timedelta(days=max(1, settings.rendition_retention_days))
+    deleted = 0
+    token: str | None = None
+    while True:
+        kwargs: dict[str, Any] = {"Bucket": settings.s3_bucket, "Prefix": RENDITION_PREFIX}
+        if token:
+            kwargs["ContinuationToken"] = token
+        page = client.list_objects_v2(**kwargs)
+        stale = [
+            {"Key": obj["Key"]}
+            for obj in page.get("Contents", [])
+            if (day := _rendition_day(obj["Key"])) is not None and day < cutoff
+        ]
+        if stale:
+            client.delete_objects(Bucket=settings.s3_bucket, Delete={"Objects": stale})
+            for obj in stale:
+                _known.pop(obj["Key"])
+            deleted += len(stale)
+        if not page.get("IsTruncated"):
+            return deleted
+        token = page.get("NextContinuationToken")
@@ -0,0 +1,78 @@
+"""Share token hashing and cached share resolution for public endpoints.
+
+Only the SHA-256 of a share token is stored (``Share.token_hash``, unique
+index). Public gallery requests resolve a token through a short-lived
+in-process cache, so each token costs at most one database round trip per
+``DOKUSUITE_SHARE_CACHE_TTL`` seconds. Unknown tokens are cached as well.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import secrets
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from sqlmodel import Session, select
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.models import Share
+
+_MISSING = object()
+
+_cache = TTLCache(maxsize=10_000, ttl=settings.share_cache_ttl)
+
+
+@dataclass(frozen=True)
+class ShareInfo:
+    """Detached snapshot of the share fields the public endpoints need."""
+
+    id: int
+    order_id: int
+    customer_id: str
+    expires_at: datetime | None
+    download_allowed: bool
+    watermark_policy: str | None
+
+    def is_expired(self, now: datetime | None = None) -> bool:
+        if self.expires_at is None:
+            return False
+        return self.expires_at.replace(tzinfo=UTC) < (now or datetime.now(UTC))
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def hash_token(token: str) -> str:
+    """Return the value stored in ``Share.token_hash`` for ``token``."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def resolve_share(session: Session, token: str) -> ShareInfo | None:
+    """Return the active share for ``token`` or ``None`` if unknown or expired."""
+    token_hash = hash_token(token)
+    info = _cache.get(token_hash, _MISSING)
+    if info is _MISSING:
+        share = session.exec(select(Share).where(Share.token_hash == token_hash)).one_or_none()
+        info = None
+        if share is not None:
+            info = ShareInfo(
+                id=share.id,
+                order_id=share.order_id,
+                customer_id=share.customer_id,
+                expires_at=share.expires_at,
+                download_allowed=share.download_allowed,
+                watermark_policy=share.watermark_policy,
+            )
+        _cache.set(token_hash, info)
+    if info is None or info.is_expired():
+        return None
+    return info
+
+
+def invalidate_share(token_hash: str | None) -> None:
+    """Drop a cached share, e.g. after it was revoked in this process."""
+    if token_hash:
+        _cache.pop(token_hash)
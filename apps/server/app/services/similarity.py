@@ -0,0 +1,187 @@
+"""Near-duplicate search over 64-bit perceptual hashes.
+
+Photos of one customer are kept in an in-process multi-index hash
+(:class:`PhashIndex`): each pHash is split into four 16-bit bands with one
+lookup table per band. Two hashes within Hamming distance ``k`` agree in at
+least one band up to ``k // 4`` bits (pigeonhole), so a query only probes
+the band values in that small radius instead of scanning every photo.
+
+The index is built lazily per customer and caught up on every query from
+photos changed since the last refresh (``updated_at``/``deleted_at``), so
+hashes written by the ingestion worker in another process are picked up
+incrementally.
+"""
+
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import combinations
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.db.models import Photo
+from app.services.phash import phash_bits
+
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_DISTANCE = 16
+
+# Re-read changes this far behind the watermark: rows committed by
+# transactions that started earlier carry an older ``updated_at``.
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+def _bands(value: int) -> list[int]:
+    return [(value >> (BAND_BITS * band)) & BAND_MASK for band in range(BANDS)]
+
+
+def _neighbours(value: int, radius: int) -> list[int]:
+    """All 16-bit values within Hamming distance ``radius`` of ``value``."""
+    result = [value]
+    for bits in range(1, radius + 1):
+        for positions in combinations(range(BAND_BITS), bits):
+            flipped = value
+            for pos in positions:
+                flipped ^= 1 << pos
+            result.append(flipped)
+    return result
+
+
+class PhashIndex:
+    """Multi-index hash over 64-bit pHashes for Hamming-radius queries."""
+
+    def __init__(self) -> None:
+        self._tables: list[dict[int, set[int]]] = [defaultdict(set) for _ in range(BANDS)]
+        self._hashes: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def upsert(self, photo_id: int, value: int) -> None:
+        self.remove(photo_id)
+        self._hashes[photo_id] = value
+        for table, band in zip(self._tables, _bands(value), strict=True):
+            table[band].add(photo_id)
+
+    def remove(self, photo_id: int) -> None:
+        value = self._hashes.pop(photo_id, None)
+        if value is None:
+            return
+        for table, band in zip(self._tables, _bands(value), strict=True):
+            bucket = table.get(band)
+            if bucket is not None:
+                bucket.discard(photo_id)
+                if not bucket:
+                    del table[band]
+
+    def search(self, value: int, distance: int) -> list[tuple[int, int]]:
+        """Return ``(photo_id, distance)`` of all hashes within ``distance``.
+
+        Results are ordered by distance, then id.
+        """
+        radius = distance // BANDS
+        candidates: set[int] = set()
+        for table, band in zip(self._tables, _bands(value), strict=True):
+            for probe in _neighbours(band, radius):
+                bucket = table.get(probe)
+                if bucket:
+                    candidates |= bucket
+        matches = []
+        for photo_id in candidates:
+            dist = (self._hashes[photo_id] ^ value).bit_count()
+            if dist <= distance:
+                matches.append((dist, photo_id))
+        return [(photo_id, dist) for dist, photo_id in sorted(matches)]
+
+
+class _CustomerIndex:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.index = PhashIndex()
+        self.watermark: datetime | None = None
+        self.deleted_watermark: datetime | None = None
+
+
+class _EngineIndexes:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.by_customer: dict[str, _CustomerIndex] = {}
+
+
+_registry: weakref.WeakKeyDictionary[Engine, _EngineIndexes] = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+
+def _customer_index(session: Session, customer_id: str) -> _CustomerIndex:
+    engine = session.get_bind()
+    with _registry_lock:
+        indexes = _registry.get(engine)
+        if indexes is None:
+            indexes = _registry[engine] = _EngineIndexes()
+    with indexes.lock:
+        entry = indexes.by_customer.get(customer_id)
+        if entry is None:
+            entry = indexes.by_customer[customer_id] = _CustomerIndex()
+        return entry
+
+
+def _refresh(session: Session, customer_id: str, entry: _CustomerIndex) -> None:
+    changed = select(Photo.id, Photo.phash_int, Photo.phash, Photo.updated_at).where(
+        Photo.customer_id == customer_id, Photo.deleted_at.is_(None)
+    )
+    if entry.watermark is not None:
+        changed = changed.where(Photo.updated_at >= entry.watermark - REFRESH_OVERLAP)
+    for photo_id, phash_int, phash, updated_at in session.exec(changed):
+        value = phash_bits(phash_int, phash)
+        if value is not None:
+            entry.index.upsert(photo_id, value)
+        else:
+            entry.index.remove(photo_id)
+        if entry.watermark is None or updated_at > entry.watermark:
+            entry.watermark = updated_at
+
+    deleted = select(Photo.id, Photo.deleted_at).where(
+        Photo.customer_id == customer_id, Photo.deleted_at.is_not(None)
+    )
+    if entry.deleted_watermark is not None:
+        deleted = deleted.where(Photo.deleted_at >= entry.deleted_watermark - REFRESH_OVERLAP)
+    for photo_id, deleted_at in session.exec(deleted):
+        entry.index.remove(photo_id)
+        if entry.deleted_watermark is None or deleted_at > entry.deleted_watermark:
+            entry.deleted_watermark = deleted_at
+
+
+def find_similar(
+    session: Session, photo: Photo, distance: int, limit: int | None = None
+) -> list[tuple[int, int]]:
+    """Return ``(photo_id, distance)`` of the customer's photos near ``photo``.
+
+    ``photo`` itself is excluded; photos without a pHash have no matches.
+    """
+    value = phash_bits(photo.phash_int, photo.phash)
+    if value is None:
+        return []
+    entry = _customer_index(session, photo.customer_id)
+    with entry.lock:
+        _refresh(session, photo.customer_id, entry)
+        matches = entry.index.search(value, min(distance, MAX_DISTANCE))
+    matches = [(photo_id, dist) for photo_id, dist in matches if photo_id != photo.id]
+    return matches[:limit] if limit is not None else matches
+
+
+def invalidate(engine: Engine, customer_id: str | None = None) -> None:
+    """Drop cached indexes so they are rebuilt on next use."""
+    with _registry_lock:
+        indexes = _registry.get(engine)
+    if indexes is None:
+        return
+    with indexes.lock:
+        if customer_id is None:
+            indexes.by_customer.clear()
+        else:
+            indexes.by_customer.pop(customer_id, None)
@@ -1,18 +1,18 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
+from datetime import UTC, date, datetime
 from io import BytesIO
 
 from PIL import Image, ImageDraw, ImageFont
 
 
-def apply_watermark(data: bytes) -> bytes:
-    """Overlay logo and current date onto image bytes."""
+def apply_watermark(data: bytes, day: date | None = None) -> bytes:
+    """Overlay logo and ``day`` (default: today) onto image bytes."""
     with Image.open(BytesIO(data)) as im:
         im = im.convert("RGBA")
         watermark = Image.new("RGBA", im.size)
         draw = ImageDraw.Draw(watermark)
-        text = f"DokuSuite {datetime.now(UTC).date().isoformat()}"
+        text = f"DokuSuite {(day or datetime.now(UTC).date()).isoformat()}"
         try:
             font = ImageFont.load_default()
         except Exception:  # pragma: no cover - fallback
@@ -0,0 +1,166 @@
+"""Local HTTP stand-in for the Ninox export endpoints.
+
+Serves synthetic ``locations`` and ``orders`` tables with the paging
+protocol of :class:`app.services.ninox_client.NinoxClient`. Every record
+carries a ``sequence``; ``since`` returns only records with a higher one,
+and each response reports the highest sequence as ``cursor``. Optional
+per-request latency and periodic 503 responses exercise prefetch and retry.
+
+Usage::
+
+    python benchmarks/ninox_stub.py --locations 50000 --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+
+def synthetic_tables(locations: int, orders: int = 0) -> dict[str, list[dict[str, Any]]]:
+    """Generate ``locations`` and ``orders`` records with ascending sequences."""
+    seq = 0
+    tables: dict[str, list[dict[str, Any]]] = {"locations": [], "orders": []}
+    for i in range(locations):
+        seq += 1
+        tables["locations"].append(
+            {
+                "id": f"L{i}",
+                "customer_id": f"c{i % 10}",
+                "name": f"Standort {i}",
+                "address": f"Musterstraße {i % 500}, Berlin",
+                "active": True,
+                "etag": f"{seq}",
+                "sequence": seq,
+            }
+        )
+    for i in range(orders):
+        seq += 1
+        tables["orders"].append(
+            {
+                "id": f"O{i}",
+                "customer_id": f"c{i % 10}",
+                "name": f"Auftrag {i}",
+                "status": "open",
+                "etag": f"{seq}",
+                "sequence": seq,
+            }
+        )
+    return tables
+
+
+class NinoxStub:
+    """Threaded HTTP server serving ``tables``; use as a context manager."""
+
+    def __init__(
+        self,
+        tables: dict[str, list[dict[str, Any]]],
+        latency: float = 0.0,
+        fail_every: int = 0,
+        port: int = 0,
+    ) -> None:
+        self.tables = tables
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> NinoxStub:
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> NinoxStub:
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def _count(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                n = stub._count()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.fail_every and n % stub.fail_every == 0:
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                url = urlparse(self.path)
+                records = stub.tables.get(url.path.strip("/"))
+                if records is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                query = parse_qs(url.query)
+                page = int(query.get("page", ["0"])[0])
+                per_page = int(query.get("perPage", ["100"])[0])
+                since = int(query.get("since", ["0"])[0])
+                changed = [rec for rec in records if rec["sequence"] > since]
+                cursor = max((rec["sequence"] for rec in records), default=since)
+                body = json.dumps(
+                    {
+                        "records": changed[page * per_page : (page + 1) * per_page],
+                        "cursor": str(cursor),
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=50_000)
+    parser.add_argument("--orders", type=int, default=1_000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request 503")
+    args = parser.parse_args()
+    stub = NinoxStub(
+        synthetic_tables(args.locations, args.orders),
+        latency=args.latency,
+        fail_every=args.fail_every,
+        port=args.port,
+    )
+    print(f"Serving Ninox stub on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Throughput and memory of the paged Ninox sync against the local HTTP stub.
+
+Starts :mod:`ninox_stub` with synthetic tables, runs a full sync followed by
+a delta sync without changes and a re-sync of unchanged records (cursor
+reset), and reports wall time, HTTP requests and peak Python memory per pass.
+
+Usage::
+
+    python benchmarks/ninox_sync.py [--locations 50000] [--latency 0.05] \\
+        [--database-url postgresql://...]
+
+Without ``--database-url`` a scratch SQLite file is used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from ninox_stub import NinoxStub, synthetic_tables  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DOKUSUITE_DATABASE_URL", ""))
+    parser.add_argument("--locations", type=int, default=50_000)
+    parser.add_argument("--orders", type=int, default=1_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds per request")
+    parser.add_argument("--fail-every", type=int, default=0, help="stub answers every n-th 503")
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    # Models pick the geography column type from the URL at import time.
+    os.environ["DOKUSUITE_DATABASE_URL"] = args.database_url
+
+    from sqlmodel import Session, SQLModel, create_engine, select
+
+    from app.core.config import settings
+    from app.db.models import SyncState
+    from app.services.ninox_sync import NinoxSyncService
+
+    engine = create_engine(args.database_url)
+    SQLModel.metadata.create_all(engine)
+    tables = synthetic_tables(args.locations, args.orders)
+
+    print(
+        f"page size {settings.ninox_page_size}, prefetch {settings.ninox_prefetch}, "
+        f"batch size {settings.ninox_sync_batch_size}, latency {args.latency}s\n"
+    )
+    print("| pass | s | requests | peak MiB | location | order |")
+    print("|---|---|---|---|---|---|")
+    with NinoxStub(tables, latency=args.latency, fail_every=args.fail_every) as stub:
+        for label in ("full", "delta", "unchanged re-sync"):
+            with Session(engine) as session:
+                if label == "unchanged re-sync":
+                    for state in session.exec(select(SyncState)):
+                        session.delete(state)
+                    session.commit()
+                requests = stub.requests
+                tracemalloc.start()
+                start = time.perf_counter()
+                stats = NinoxSyncService(session, base_url=stub.base_url).run()
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            print(
+                f"| {label} | {elapsed:.2f} | {stub.requests - requests} | {peak:.1f} "
+                f"| {fmt(stats['location'])} | {fmt(stats['order'])} |"
+            )
+
+    engine.dispose()
+    if scratch is not None:
+        os.unlink(scratch.name)
+
+
+def fmt(stats: dict[str, int]) -> str:
+    return " ".join(f"{key}={value}" for key, value in stats.items() if value)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Full offline sync of one customer's locations: legacy JSON, paged NDJSON, snapshot.
+
+Seeds synthetic locations, then builds the legacy ``since`` response (all
+rows through ``LocationRead.model_validate`` into one JSON document), walks
+the token-paged NDJSON feed to the end, gzip encoded as sent to clients, and
+builds the per-customer snapshot (once per sync instead of once per device).
+Reports wall time, pages, uncompressed/gzip bytes and peak Python memory per
+variant.
+
+Usage::
+
+    python benchmarks/offline_delta.py [--locations 100000] [--database-url postgresql://...]
+
+Without ``--database-url`` a scratch SQLite file is used.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DOKUSUITE_DATABASE_URL", ""))
+    parser.add_argument("--locations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    # Models pick the geography column type from the URL at import time.
+    os.environ["DOKUSUITE_DATABASE_URL"] = args.database_url
+
+    from sqlmodel import Session, SQLModel, create_engine, select
+
+    from app.api.schemas import LocationRead
+    from app.core.config import settings
+    from app.core.storage import InMemoryObjectStore
+    from app.db.delta import SyncToken, delta_page
+    from app.db.models import Location
+    from app.services.location_snapshots import LocationSnapshotService
+
+    engine = create_engine(args.database_url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Location(
+                name=f"Standort {i}",
+                address=f"Musterstraße {i % 500}, Berlin",
+                customer_id="c1",
+            )
+            for i in range(args.locations)
+        )
+        session.commit()
+
+    def legacy(session: Session) -> tuple[int, int, int]:
+        rows = session.exec(select(Location).where(Location.customer_id == "c1")).all()
+        data = [LocationRead.model_validate(r, from_attributes=True) for r in rows]
+        body = json.dumps(
+            {"upserts": [d.model_dump(mode="json") for d in data], "tombstones": []}
+        ).encode()
+        return 1, len(body), len(zlib.compress(body, 6))
+
+    def paged(session: Session) -> tuple[int, int, int]:
+        pages = raw = compressed = 0
+        token = SyncToken()
+        more = True
+        while more:
+            page = delta_page(
+                session,
+                Location,
+                list(LocationRead.model_fields),
+                token,
+                "c1",
+                limit=settings.offline_delta_page_rows,
+                max_bytes=settings.offline_delta_page_bytes,
+            )
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            for line in page.lines():
+                raw += len(line)
+                compressed += len(compressor.compress(line))
+            compressed += len(compressor.flush())
+            end = json.loads(line)
+            token, more = SyncToken.decode(end["next_token"]), end["more"]
+            pages += 1
+        return pages, raw, compressed
+
+    def snapshot(session: Session) -> tuple[int, int, int]:
+        store = InMemoryObjectStore()
+        result = LocationSnapshotService(session, store).build("c1")
+        (body,) = store.objects.values()
+        return 1, len(gzip.decompress(body)), result.size
+
+    print(
+        f"{args.locations} locations, page {settings.offline_delta_page_rows} rows / "
+        f"{settings.offline_delta_page_bytes} bytes\n"
+    )
+    print("| variant | s | pages | MiB | gzip MiB | peak MiB |")
+    print("|---|---|---|---|---|---|")
+    variants = (("legacy since", legacy), ("paged NDJSON", paged), ("snapshot build", snapshot))
+    for label, run in variants:
+        with Session(engine) as session:
+            tracemalloc.start()
+            start = time.perf_counter()
+            pages, raw, compressed = run(session)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        print(
+            f"| {label} | {elapsed:.2f} | {pages} | {raw / 2**20:.1f} "
+            f"| {compressed / 2**20:.1f} | {peak:.1f} |"
+        )
+
+    engine.dispose()
+    if scratch is not None:
+        os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Index size and lookup latency of hex vs. compact photo hash columns (ADR 0006).
+
+Seeds a scratch schema on a PostgreSQL database with a ``photo`` table that
+carries both representations (``hash``/``phash`` as hex text,
+``hash_bin``/``phash_int`` as BYTEA/BIGINT), indexes each column and
+reports index sizes, the mean latency of exact duplicate lookups and the
+cost of a full Hamming-distance scan on text vs. integer pHashes.
+
+Usage::
+
+    python benchmarks/photo_hash_columns.py --database-url postgresql://... [--rows 1000000]
+
+The scratch schema is dropped afterwards unless ``--keep`` is given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+SCHEMA = "bench_photo_hashes"
+
+CREATE_TABLE = """
+CREATE TABLE photo (
+    id bigserial PRIMARY KEY,
+    hash varchar NOT NULL,
+    phash varchar,
+    hash_bin bytea,
+    phash_int bigint
+)
+"""
+
+SEED = """
+INSERT INTO photo (hash, phash, hash_bin, phash_int)
+SELECT
+    encode(sha256(g::text::bytea), 'hex'),
+    substr(md5(g::text), 1, 16),
+    sha256(g::text::bytea),
+    ('x' || substr(md5(g::text), 1, 16))::bit(64)::bigint
+FROM generate_series(1, :rows) AS g
+"""
+
+INDEXES = {
+    "hash (varchar)": "CREATE INDEX ix_hash ON photo (hash)",
+    "hash_bin (bytea)": "CREATE INDEX ix_hash_bin ON photo (hash_bin)",
+    "phash (varchar)": "CREATE INDEX ix_phash ON photo (phash)",
+    "phash_int (bigint)": "CREATE INDEX ix_phash_int ON photo (phash_int)",
+}
+
+LOOKUPS = {
+    "hash = :hex": ("SELECT id FROM photo WHERE hash = :value LIMIT 1", "hex"),
+    "hash_bin = :digest": ("SELECT id FROM photo WHERE hash_bin = :value LIMIT 1", "digest"),
+}
+
+SCANS = {
+    "hex pHash, distance <= 8": """
+        SELECT count(*) FROM photo
+        WHERE length(replace(
+            (('x' || phash)::bit(64) # ('x' || :hex)::bit(64))::text, '0', ''
+        )) <= 8
+    """,
+    "phash_int XOR/popcount, distance <= 8": """
+        SELECT count(*) FROM photo
+        WHERE bit_count((phash_int # :int)::bit(64)) <= 8
+    """,
+}
+
+
+def _timed(conn, sql: str, params: dict, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(text(sql), params).all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url", default=os.getenv("DOKUSUITE_DATABASE_URL", "")
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+    if not args.database_url.startswith("postgresql"):
+        parser.error("a PostgreSQL --database-url is required")
+
+    engine = create_engine(args.database_url)
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.execute(text(CREATE_TABLE))
+        print(f"Seeding {args.rows} rows …", file=sys.stderr)
+        conn.execute(text(SEED), {"rows": args.rows})
+        for ddl in INDEXES.values():
+            conn.execute(text(ddl))
+        conn.execute(text("ANALYZE photo"))
+        conn.commit()
+
+        print("\n## Index size\n")
+        print("| column | size |")
+        print("|---|---|")
+        for label, ddl in INDEXES.items():
+            name = ddl.split()[2]
+            size = conn.execute(
+                text("SELECT pg_size_pretty(pg_relation_size(CAST(:name AS regclass)))"),
+                {"name": name},
+            ).scalar_one()
+            print(f"| {label} | {size} |")
+
+        rng = random.Random(42)
+        keys = [str(rng.randint(1, args.rows)).encode() for _ in range(args.lookups)]
+        print(f"\n## Exact duplicate lookup (mean of {args.lookups})\n")
+        print("| query | ms |")
+        print("|---|---|")
+        for label, (sql, kind) in LOOKUPS.items():
+            start = time.perf_counter()
+            for key in keys:
+                digest = hashlib.sha256(key).digest()
+                value = digest.hex() if kind == "hex" else digest
+                conn.execute(text(sql), {"value": value}).all()
+            elapsed = (time.perf_counter() - start) / len(keys) * 1000
+            print(f"| {label} | {elapsed:.3f} |")
+
+        probe = hashlib.md5(b"123").hexdigest()[:16]
+        probe_int = int(probe, 16)
+        probe_int -= (1 << 64) if probe_int >= 1 << 63 else 0
+        print("\n## Hamming-distance scan (mean of 3)\n")
+        print("| query | ms |")
+        print("|---|---|")
+        for label, sql in SCANS.items():
+            elapsed = _timed(conn, sql, {"hex": probe, "int": probe_int}, 3)
+            print(f"| {label} | {elapsed:.1f} |")
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Query plans for the /photos list filters before and after the ADR 0005 indexes.
+
+Seeds a scratch schema on a PostgreSQL database with a synthetic ``photo``
+table, runs ``EXPLAIN (ANALYZE, BUFFERS)`` for the query shapes issued by
+``GET /photos`` and the duplicate lookup, creates the indexes declared on
+``app.db.models.Photo`` and runs the same queries again.
+
+Usage::
+
+    python benchmarks/photo_list_indexes.py --database-url postgresql://... [--rows 5000000]
+
+The scratch schema is dropped afterwards unless ``--keep`` is given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.db.models import Photo  # noqa: E402
+
+SCHEMA = "bench_photo_indexes"
+
+CREATE_TABLE = """
+CREATE TABLE photo (
+    id bigserial PRIMARY KEY,
+    object_key varchar NOT NULL,
+    taken_at timestamp NOT NULL,
+    status varchar NOT NULL,
+    mode varchar NOT NULL,
+    customer_id varchar NOT NULL,
+    uploader_id varchar,
+    device_id varchar,
+    site_id varchar,
+    location_id integer,
+    order_id integer,
+    quality_flag varchar,
+    note varchar,
+    calendar_week varchar,
+    hash varchar NOT NULL,
+    phash varchar,
+    hash_bin bytea,
+    phash_int bigint,
+    is_duplicate boolean NOT NULL DEFAULT false,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    deleted_at timestamptz,
+    change_id bigint NOT NULL DEFAULT 0
+)
+"""
+
+# 200 customers, ~3 years of photos, 2 % soft-deleted.
+SEED = """
+INSERT INTO photo (
+    object_key, taken_at, status, mode, customer_id, uploader_id,
+    location_id, order_id, hash, updated_at, deleted_at
+)
+SELECT
+    'photos/' || g,
+    timestamp '2023-01-01' + (random() * interval '1000 days'),
+    (ARRAY['INGESTED', 'INGESTED', 'INGESTED', 'PENDING', 'FAILED'])[1 + g % 5],
+    (ARRAY['FIXED_SITE', 'MOBILE'])[1 + g % 2],
+    'c' || (g % 200),
+    'u' || (g % 5000),
+    g % 20000,
+    g % 2000,
+    md5(g::text),
+    now() - (random() * interval '365 days'),
+    CASE WHEN g % 50 = 0 THEN now() - (random() * interval '30 days') END
+FROM generate_series(1, :rows) AS g
+"""
+
+QUERIES = {
+    "list by customer, newest first": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7'
+        ORDER BY taken_at DESC, id DESC LIMIT 50
+    """,
+    "keyset page": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7'
+          AND (taken_at, id) < (timestamp '2024-06-01', 0)
+        ORDER BY taken_at DESC, id DESC LIMIT 50
+    """,
+    "deep offset page": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7'
+        LIMIT 50 OFFSET 20000
+    """,
+    "order + date range": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7' AND order_id = 1207
+          AND taken_at >= '2024-01-01' AND taken_at <= '2024-03-31'
+        LIMIT 50
+    """,
+    "location": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7' AND location_id = 7
+        LIMIT 50
+    """,
+    "status": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7' AND status = 'FAILED'
+        LIMIT 50
+    """,
+    "uploader": """
+        SELECT * FROM photo
+        WHERE deleted_at IS NULL AND customer_id = 'c7' AND uploader_id = 'u7'
+        LIMIT 50
+    """,
+    "exact total for customer": """
+        SELECT count(*) FROM photo WHERE deleted_at IS NULL AND customer_id = 'c7'
+    """,
+    "duplicate hash lookup": """
+        SELECT id FROM photo WHERE hash = md5('123456') LIMIT 1
+    """,
+}
+
+
+def explain_all(conn, label: str) -> None:
+    print(f"\n## {label}\n")
+    for name, sql in QUERIES.items():
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all()
+        print(f"### {name}\n")
+        print("```")
+        print("\n".join(rows))
+        print("```\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url", default=os.getenv("DOKUSUITE_DATABASE_URL", "")
+    )
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    args = parser.parse_args()
+    if not args.database_url.startswith("postgresql"):
+        parser.error("a PostgreSQL --database-url is required")
+
+    engine = create_engine(args.database_url)
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.execute(text(CREATE_TABLE))
+        print(f"Seeding {args.rows} rows …", file=sys.stderr)
+        conn.execute(text(SEED), {"rows": args.rows})
+        conn.execute(text("ANALYZE photo"))
+        conn.commit()
+
+        explain_all(conn, "Before (primary key only)")
+
+        for index in sorted(Photo.__table__.indexes, key=lambda ix: ix.name):
+            ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+            print(f"Creating {index.name} …", file=sys.stderr)
+            conn.execute(text(ddl))
+        conn.execute(text("ANALYZE photo"))
+        conn.commit()
+
+        size = conn.execute(
+            text("SELECT pg_size_pretty(pg_indexes_size('photo'))")
+        ).scalar_one()
+        explain_all(conn, f"After (index size {size})")
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
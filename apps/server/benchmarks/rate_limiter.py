@@ -0,0 +1,91 @@
+"""Rate limiter overhead per request for the available storages.
+
+Times ``MovingWindowRateLimiter.hit`` (what slowapi calls per limited
+request) against per-process memory, the stock ``limits`` Redis storage and
+:class:`app.core.limiter.RedisWindowStorage`, both for keys under their
+limit (one Redis round trip) and for keys the local pre-check rejects (no
+round trip). The Redis rows need a reachable server; the local pre-check
+row runs without one.
+
+Usage::
+
+    python benchmarks/rate_limiter.py [--redis-url redis://localhost:6379/15] [--hits 20000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from limits import parse
+from limits.storage import MemoryStorage, RedisStorage
+from limits.strategies import MovingWindowRateLimiter
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.limiter import RedisWindowStorage  # noqa: E402
+
+
+def measure(hit: Callable[[], bool], hits: int) -> tuple[float, float, float]:
+    """Mean, p50 and p99 microseconds per hit."""
+    samples = []
+    for _ in range(hits):
+        start = time.perf_counter()
+        hit()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.fmean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--hits", type=int, default=20_000)
+    args = parser.parse_args()
+
+    # Large enough that every hit of the under-limit rows is admitted.
+    under = parse(f"{args.hits * 2}/hour")
+    over = parse("5/minute")
+    rows: list[tuple[str, Callable[[], bool]]] = []
+
+    memory = MovingWindowRateLimiter(MemoryStorage())
+    keys = (f"bench-{i}" for i in itertools.count())
+    rows.append(("memory, under limit", lambda: memory.hit(under, next(keys))))
+
+    window = RedisWindowStorage(f"dokusuite+{args.redis_url}")
+    redis_up = window.check()
+    if redis_up:
+        stock = MovingWindowRateLimiter(RedisStorage(args.redis_url))
+        ours = MovingWindowRateLimiter(window)
+        rows.append(("limits redis, under limit", lambda: stock.hit(under, "bench-stock")))
+        rows.append(("dokusuite redis, under limit", lambda: ours.hit(under, "bench-ours")))
+        rows.append(("dokusuite redis, over limit", lambda: ours.hit(over, "bench-over")))
+    else:
+        print(f"Redis at {args.redis_url} not reachable; skipping Redis rows\n")
+        # The pre-check alone: the key already used up its limit in this process.
+        ours = MovingWindowRateLimiter(window)
+        key = over.key_for("bench-over")
+        for _ in range(over.amount):
+            window.precheck.admitted(key, over.amount, over.get_expiry())
+        rows.append(("local pre-check, over limit", lambda: ours.hit(over, "bench-over")))
+
+    print("| storage | mean µs | p50 µs | p99 µs |")
+    print("|---|---|---|---|")
+    for label, hit in rows:
+        mean, p50, p99 = measure(hit, args.hits)
+        print(f"| {label} | {mean:.1f} | {p50:.1f} | {p99:.1f} |")
+
+    if redis_up:
+        for key in ("bench-stock", "bench-ours"):
+            window.clear(under.key_for(key))
+        window.clear(over.key_for("bench-over"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""add indexed token hash to share
+
+Revision ID: a7d4e2b9c6f1
+Revises: f3a9c1d7e8b4
+Create Date: 2026-10-18 12:00:00.000000
+
+Public share endpoints look shares up by the SHA-256 of their token instead
+of comparing the full URL. Existing shares are backfilled from ``url``.
+"""
+from __future__ import annotations
+
+import hashlib
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "a7d4e2b9c6f1"
+down_revision = "f3a9c1d7e8b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("share", sa.Column("token_hash", sa.String(), nullable=True))
+    bind = op.get_bind()
+    share = sa.table("share", sa.column("id", sa.Integer), sa.column("url", sa.String))
+    rows = bind.execute(sa.select(share.c.id, share.c.url)).all()
+    for share_id, url in rows:
+        token = url.rstrip("/").rsplit("/", 1)[-1]
+        bind.execute(
+            sa.text("UPDATE share SET token_hash = :hash WHERE id = :id"),
+            {"hash": hashlib.sha256(token.encode()).hexdigest(), "id": share_id},
+        )
+    op.create_index("ix_share_token_hash", "share", ["token_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_share_token_hash", table_name="share")
+    op.drop_column("share", "token_hash")
@@ -0,0 +1,41 @@
+"""add location_snapshot table
+
+Revision ID: a8c3e5f7b9d1
+Revises: f6b2c8d4a0e3
+Create Date: 2026-10-18 22:00:00.000000
+
+Latest offline snapshot per customer (object key, version and the
+offline-delta watermark it was read at), built after each Ninox sync.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "a8c3e5f7b9d1"
+down_revision = "f6b2c8d4a0e3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "location_snapshot",
+        sa.Column("customer_id", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("object_key", sa.String(), nullable=False),
+        sa.Column("watermark", sa.BigInteger(), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.PrimaryKeyConstraint("customer_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("location_snapshot")
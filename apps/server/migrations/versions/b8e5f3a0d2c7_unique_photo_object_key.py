@@ -0,0 +1,45 @@
+"""make photo.object_key unique
+
+Revision ID: b8e5f3a0d2c7
+Revises: a7d4e2b9c6f1
+Create Date: 2026-10-18 14:00:00.000000
+
+Retried ingest requests could register the same uploaded object twice.
+Such duplicates carry their own order, note, quality flag and location and
+cannot be merged automatically, so the upgrade stops and lists them instead
+of creating the unique index. Resolve them (e.g. keep the live, processed
+row of each object key) and run the upgrade again.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "b8e5f3a0d2c7"
+down_revision = "a7d4e2b9c6f1"
+branch_labels = None
+depends_on = None
+
+# Object keys listed in the error message at most.
+REPORT_LIMIT = 20
+
+
+def upgrade() -> None:
+    duplicates = op.get_bind().execute(
+        sa.text(
+            "SELECT object_key, COUNT(*) FROM photo GROUP BY object_key "
+            "HAVING COUNT(*) > 1 ORDER BY object_key"
+        )
+    ).all()
+    if duplicates:
+        listed = ", ".join(f"{key!r} ({count} rows)" for key, count in duplicates[:REPORT_LIMIT])
+        raise RuntimeError(
+            f"{len(duplicates)} object keys are registered by more than one photo: {listed}. "
+            "Soft-deleting is not enough, the unique index covers every row; remove the "
+            "surplus rows and run the upgrade again."
+        )
+    op.create_index("ux_photo_object_key", "photo", ["object_key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_photo_object_key", table_name="photo")
@@ -0,0 +1,78 @@
+"""add compact binary/integer photo hash columns
+
+Revision ID: c2d7e9f1a3b5
+Revises: b8e5f3a0d2c7
+Create Date: 2026-10-18 15:00:00.000000
+
+Expand step of ADR 0006: ``hash_bin`` (SHA-256 digest, BYTEA) and
+``phash_int`` (pHash, signed BIGINT) next to the hex columns, backfilled in
+batches. The hex columns and ``ix_photo_hash`` are dropped in a later
+revision once every reader uses the compact columns.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "c2d7e9f1a3b5"
+down_revision = "b8e5f3a0d2c7"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 50_000
+
+# Only well-formed hex values are converted; anything else stays NULL and is
+# still found through the hex columns.
+_PG_BACKFILL = """
+UPDATE photo SET
+    hash_bin = CASE WHEN hash ~ '^[0-9a-f]{64}$' THEN decode(hash, 'hex') END,
+    phash_int = CASE WHEN phash ~ '^[0-9a-f]{16}$' THEN ('x' || phash)::bit(64)::bigint END
+WHERE id > :start AND id <= :stop
+"""
+
+
+def _phash_to_int(phash: str) -> int:
+    value = int(phash, 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _backfill_python(bind) -> None:
+    photo = sa.table(
+        "photo",
+        sa.column("id", sa.Integer),
+        sa.column("hash", sa.String),
+        sa.column("phash", sa.String),
+        sa.column("hash_bin", sa.LargeBinary),
+        sa.column("phash_int", sa.BigInteger),
+    )
+    rows = bind.execute(sa.select(photo.c.id, photo.c.hash, photo.c.phash)).all()
+    for photo_id, photo_hash, phash in rows:
+        values = {}
+        try:
+            if photo_hash and len(photo_hash) == 64:
+                values["hash_bin"] = bytes.fromhex(photo_hash)
+            if phash and len(phash) == 16:
+                values["phash_int"] = _phash_to_int(phash)
+        except ValueError:
+            continue
+        if values:
+            bind.execute(sa.update(photo).where(photo.c.id == photo_id).values(**values))
+
+
+def upgrade() -> None:
+    op.add_column("photo", sa.Column("hash_bin", sa.LargeBinary(), nullable=True))
+    op.add_column("photo", sa.Column("phash_int", sa.BigInteger(), nullable=True))
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM photo")).scalar_one()
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(sa.text(_PG_BACKFILL), {"start": start, "stop": start + BATCH_SIZE})
+    else:
+        _backfill_python(bind)
+    op.create_index("ix_photo_hash_bin", "photo", ["hash_bin"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_photo_hash_bin", table_name="photo")
+    op.drop_column("photo", "phash_int")
+    op.drop_column("photo", "hash_bin")
@@ -0,0 +1,40 @@
+"""add ext_ref.field_hash and sync_state
+
+Revision ID: d4f8a2c6e9b1
+Revises: c2d7e9f1a3b5
+Create Date: 2026-10-18 18:00:00.000000
+
+The Ninox sync skips records whose etag or field hash is unchanged and
+fetches only changes since the cursor stored in ``sync_state``. Existing
+mappings start without a hash and are hashed on their next change.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "d4f8a2c6e9b1"
+down_revision = "c2d7e9f1a3b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ext_ref", sa.Column("field_hash", sa.String(), nullable=True))
+    op.create_table(
+        "sync_state",
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("cursor", sa.String(), nullable=True),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.PrimaryKeyConstraint("source"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sync_state")
+    op.drop_column("ext_ref", "field_hash")
@@ -0,0 +1,39 @@
+"""merge heads and add missing photo columns
+
+Revision ID: e1f0a7c3b5d2
+Revises: 93feabdd0497, b59cb3e3e16c
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "e1f0a7c3b5d2"
+down_revision = ("93feabdd0497", "b59cb3e3e16c")
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "photo", sa.Column("hash", sa.String(), nullable=False, server_default="")
+    )
+    op.alter_column("photo", "hash", server_default=None)
+    op.add_column(
+        "photo",
+        sa.Column("is_duplicate", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.alter_column("photo", "is_duplicate", server_default=None)
+    op.add_column("photo", sa.Column("quality_flag", sa.String(), nullable=True))
+    op.add_column("photo", sa.Column("note", sa.String(), nullable=True))
+    op.add_column("photo", sa.Column("calendar_week", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("photo", "calendar_week")
+    op.drop_column("photo", "note")
+    op.drop_column("photo", "quality_flag")
+    op.drop_column("photo", "is_duplicate")
+    op.drop_column("photo", "hash")
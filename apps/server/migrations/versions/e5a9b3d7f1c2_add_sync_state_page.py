@@ -0,0 +1,28 @@
+"""add sync_state.page checkpoint
+
+Revision ID: e5a9b3d7f1c2
+Revises: d4f8a2c6e9b1
+Create Date: 2026-10-18 19:00:00.000000
+
+The Ninox sync fetches tables page by page and records the next page
+after each committed page, so an interrupted run resumes there. Change
+markers are now kept per table (``ninox:location``, ``ninox:order``).
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "e5a9b3d7f1c2"
+down_revision = "d4f8a2c6e9b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("sync_state", sa.Column("page", sa.Integer(), nullable=True))
+    op.execute(sa.text("DELETE FROM sync_state WHERE source = 'ninox'"))
+
+
+def downgrade() -> None:
+    op.drop_column("sync_state", "page")
@@ -0,0 +1,79 @@
+"""add indexes for list filters and duplicate lookup
+
+Revision ID: f3a9c1d7e8b4
+Revises: e1f0a7c3b5d2
+Create Date: 2026-10-18 09:30:00.000000
+
+See docs/adr/0005-photo-list-indexes.md for the index strategy.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "f3a9c1d7e8b4"
+down_revision = "e1f0a7c3b5d2"
+branch_labels = None
+depends_on = None
+
+_LIVE = sa.text("deleted_at IS NULL")
+
+# name, table, columns, partial predicate
+_INDEXES = [
+    (
+        "ix_photo_customer_taken_at",
+        "photo",
+        ["customer_id", sa.text("taken_at DESC"), sa.text("id DESC")],
+        _LIVE,
+    ),
+    ("ix_photo_taken_at", "photo", [sa.text("taken_at DESC"), sa.text("id DESC")], _LIVE),
+    (
+        "ix_photo_customer_order",
+        "photo",
+        ["customer_id", "order_id", sa.text("taken_at DESC")],
+        _LIVE,
+    ),
+    (
+        "ix_photo_customer_location",
+        "photo",
+        ["customer_id", "location_id", sa.text("taken_at DESC")],
+        _LIVE,
+    ),
+    (
+        "ix_photo_customer_status",
+        "photo",
+        ["customer_id", "status", sa.text("taken_at DESC")],
+        _LIVE,
+    ),
+    (
+        "ix_photo_customer_uploader",
+        "photo",
+        ["customer_id", "uploader_id", sa.text("taken_at DESC")],
+        sa.text("deleted_at IS NULL AND uploader_id IS NOT NULL"),
+    ),
+    ("ix_photo_hash", "photo", ["hash"], None),
+    ("ix_photo_customer_updated_at", "photo", ["customer_id", "updated_at"], _LIVE),
+    (
+        "ix_photo_customer_deleted_at",
+        "photo",
+        ["customer_id", "deleted_at"],
+        sa.text("deleted_at IS NOT NULL"),
+    ),
+    ("ix_location_customer_id", "location", ["customer_id", "id"], None),
+    ("ix_order_customer_id", "order", ["customer_id", "id"], None),
+    ("ix_share_customer_order", "share", ["customer_id", "order_id", "id"], None),
+]
+
+
+def upgrade() -> None:
+    # On large production tables run these with CREATE INDEX CONCURRENTLY
+    # (``postgresql_concurrently=True`` inside ``op.get_context().autocommit_block()``).
+    for name, table, columns, where in _INDEXES:
+        op.create_index(
+            name, table, columns, postgresql_where=where, sqlite_where=where
+        )
+
+
+def downgrade() -> None:
+    for name, table, _columns, _where in reversed(_INDEXES):
+        op.drop_index(name, table_name=table)
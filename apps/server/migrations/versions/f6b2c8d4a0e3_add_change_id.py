@@ -0,0 +1,48 @@
+"""add change_id markers for the paged offline delta
+
+Revision ID: f6b2c8d4a0e3
+Revises: e5a9b3d7f1c2
+Create Date: 2026-10-18 21:00:00.000000
+
+``location.change_id`` and ``photo.change_id`` order the offline delta feed.
+Existing rows get 0 and are part of every client's first full sync; new and
+updated rows are stamped by the application (``app.db.delta.change_marker``),
+on PostgreSQL with the writing transaction's id, which is also the server
+default for inserts that bypass the ORM.
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "f6b2c8d4a0e3"
+down_revision = "e5a9b3d7f1c2"
+branch_labels = None
+depends_on = None
+
+_TABLES = ["location", "photo"]
+
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    for table in _TABLES:
+        # Constant default: no table rewrite on PostgreSQL 11+.
+        op.add_column(
+            table,
+            sa.Column("change_id", sa.BigInteger(), nullable=False, server_default="0"),
+        )
+        if postgres:
+            op.alter_column(
+                table,
+                "change_id",
+                server_default=sa.text("pg_current_xact_id()::text::bigint"),
+            )
+        op.create_index(
+            f"ix_{table}_customer_change", table, ["customer_id", "change_id", "id"]
+        )
+
+
+def downgrade() -> None:
+    for table in reversed(_TABLES):
+        op.drop_index(f"ix_{table}_customer_change", table_name=table)
+        op.drop_column(table, "change_id")
@@ -0,0 +1,14 @@
+import pytest
+
+from app.core import idempotency, security
+from app.services import renditions, share_tokens
+
+
+@pytest.fixture(autouse=True)
+def _clear_process_caches():
+    """Keep in-process caches from leaking state between tests."""
+    yield
+    renditions._known.clear()
+    share_tokens._cache.clear()
+    security._principals.clear()
+    idempotency._responses.clear()
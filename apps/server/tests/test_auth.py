@@ -235,3 +235,59 @@ def test_delete_user(monkeypatch):
         assert session.get(models.User, user_id) is None
     finally:
         session_gen.close()
+
+
+def _user_token(client, session_module, models, email="user@example.com"):
+    from app.core.security import principal_claims
+
+    client.post("/auth/register", json={"email": email, "password": "secret"})
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        user = session.exec(select(models.User).where(models.User.email == email)).first()
+        token = create_access_token(
+            email, settings.access_token_expires_minutes, principal_claims(user)
+        )["access_token"]
+        user_id = user.id
+    finally:
+        session_gen.close()
+    return {"Authorization": f"Bearer {token}"}, user_id
+
+
+def test_principal_cached_and_invalidated_on_role_change(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    headers, user_id = _user_token(client, session_module, models)
+    assert client.get("/orders", headers=headers).status_code == 403
+
+    import app.core.security as security
+
+    lookups = []
+    original = security._principal
+    monkeypatch.setattr(
+        security, "_principal", lambda sub, user: lookups.append(sub) or original(sub, user)
+    )
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    assert lookups == []
+
+    r = client.patch(f"/users/{user_id}", json={"role": "ADMIN"}, headers=auth_headers())
+    assert r.status_code == 200
+    assert client.get("/orders", headers=headers).status_code == 200
+    assert "user@example.com" in lookups
+
+    r = client.delete(f"/users/{user_id}", headers=auth_headers())
+    assert r.status_code == 204
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_embedded_claims_skip_user_lookup(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    monkeypatch.setattr(settings, "jwt_embed_claims", True)
+    headers, _ = _user_token(client, session_module, models)
+
+    import app.core.security as security
+
+    monkeypatch.setattr(security, "_principal", lambda sub, user: None)
+    r = client.get("/auth/me", headers=headers)
+    assert r.status_code == 200
+    assert r.json() == {"email": "user@example.com"}
+    assert client.get("/orders", headers=headers).status_code == 403
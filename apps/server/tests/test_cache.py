@@ -0,0 +1,24 @@
+from app.core import cache
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = cache.TTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    c.set("b", 2, ex=20)
+    assert c.get("a") == 1
+    now[0] += 6
+    assert c.get("a") is None
+    assert "b" in c
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    c = cache.TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert sorted(c.keys()) == ["a", "c"]
+    assert c.pop("a") == 1
+    assert len(c) == 1
@@ -1,4 +1,7 @@
 import importlib
+import io
+import zipfile
+from datetime import datetime
 
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel
@@ -67,7 +70,7 @@ def test_export_zip_job(monkeypatch):
     r = client.post("/exports/zip", json=payload, headers=auth_headers())
     assert r.status_code == 202
     assert r.json()["export_id"] == "zip-id"
-    assert calls["zip"] == payload
+    assert calls["zip"] == {**payload, "customerId": "c1"}
 
 
 def test_export_excel_job(monkeypatch):
@@ -76,7 +79,7 @@ def test_export_excel_job(monkeypatch):
     r = client.post("/exports/excel", json=payload, headers=auth_headers())
     assert r.status_code == 202
     assert r.json()["export_id"] == "excel-id"
-    assert calls["excel"] == payload
+    assert calls["excel"] == {**payload, "customerId": "c1"}
 
 
 def test_get_export_status(monkeypatch):
@@ -99,7 +102,7 @@ def test_get_export_status(monkeypatch):
         "fetch",
         classmethod(lambda cls, job_id, connection=None: JobStub()),
     )
-    monkeypatch.setattr(exports_module, "_s3_client", lambda: S3Stub())
+    monkeypatch.setattr(exports_module, "get_s3_client", lambda: S3Stub())
 
     r = client.get("/exports/any", headers=auth_headers())
     assert r.status_code == 200
@@ -121,7 +124,7 @@ def test_export_zip_uploads_to_s3(monkeypatch):
             self.args = {"Bucket": Bucket, "Key": Key, "Body": Body}
 
     stub = S3Stub()
-    monkeypatch.setattr(jobs, "_s3_client", lambda: stub)
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: stub)
     result = jobs.export_zip()
     assert stub.args is not None
     assert stub.args["Key"].endswith(".zip")
@@ -129,6 +132,53 @@ def test_export_zip_uploads_to_s3(monkeypatch):
     assert result["result_key"] == stub.args["Key"]
 
 
+def test_export_zip_streams_order_photos(monkeypatch):
+    _client, _exports, _calls = make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+    from app.core.storage import InMemoryObjectStore
+
+    store = InMemoryObjectStore()
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        order = models.Order(customer_id="c1", name="o1", status="NEW")
+        session.add(order)
+        session.commit()
+        photos = [("a/1.jpg", "c1"), ("a/2.jpg", "c1"), ("gone.jpg", "c1"), ("other.jpg", "c2")]
+        for key, customer in photos:
+            session.add(
+                models.Photo(
+                    object_key=key,
+                    taken_at=datetime(2024, 1, 1),
+                    mode="FIXED_SITE",
+                    hash=key,
+                    customer_id=customer,
+                    order_id=order.id,
+                )
+            )
+            if key != "gone.jpg":
+                store.put_object(Bucket=settings.s3_bucket, Key=key, Body=key.encode() * 100)
+        session.commit()
+        order_id = order.id
+    finally:
+        session_gen.close()
+
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: store)
+    monkeypatch.setattr(settings, "s3_multipart_part_size", 256)
+    result = jobs.export_zip({"orderId": order_id, "customerId": "c1"})
+
+    data = store.objects[(settings.s3_bucket, result["result_key"])]
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert [n.split("-", 1)[1] for n in names] == ["1.jpg", "2.jpg"]
+        assert zf.read(names[0]) == b"a/1.jpg" * 100
+    assert not store.uploads
+
+
 def test_export_excel_uploads_to_s3(monkeypatch):
     from workers.ingestion import jobs
 
@@ -140,9 +190,54 @@ def test_export_excel_uploads_to_s3(monkeypatch):
             self.args = {"Bucket": Bucket, "Key": Key, "Body": Body}
 
     stub = S3Stub()
-    monkeypatch.setattr(jobs, "_s3_client", lambda: stub)
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: stub)
     result = jobs.export_excel()
     assert stub.args is not None
     assert stub.args["Key"].endswith(".xlsx")
     assert stub.args["Body"]
     assert result["result_key"] == stub.args["Key"]
+
+
+def test_export_excel_streams_filtered_rows(monkeypatch):
+    _client, _exports, _calls = make_client(monkeypatch)
+    from openpyxl import load_workbook
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+    from app.core.storage import InMemoryObjectStore
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        site = models.Location(name="Site A", address="Main St 1", customer_id="c1")
+        session.add(site)
+        session.commit()
+        for i, (week, customer) in enumerate(
+            [("2024-W01", "c1"), ("2024-W01", "c1"), ("2024-W02", "c1"), ("2024-W01", "c2")]
+        ):
+            session.add(
+                models.Photo(
+                    object_key=f"k{i}",
+                    taken_at=datetime(2024, 1, 1 + i),
+                    mode="FIXED_SITE",
+                    hash=f"h{i}",
+                    customer_id=customer,
+                    calendar_week=week,
+                    location_id=site.id if i == 0 else None,
+                )
+            )
+        session.commit()
+    finally:
+        session_gen.close()
+
+    store = InMemoryObjectStore()
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: store)
+    result = jobs.export_excel({"customerId": "c1", "calendarWeek": "2024-W01"})
+
+    data = store.objects[(settings.s3_bucket, result["result_key"])]
+    rows = list(load_workbook(io.BytesIO(data), read_only=True).active.values)
+    assert rows[0][:5] == ("id", "taken_at", "calendar_week", "order_id", "site")
+    assert [r[-1] for r in rows[1:]] == ["k0", "k1"]
+    assert rows[1][4:6] == ("Site A", "Main St 1")
+    assert rows[1][1] == datetime(2024, 1, 1)
@@ -1,8 +1,15 @@
 import io
 import json
+import threading
+import time
 import urllib.request
 
-from app.services.geocoding import GeocodingService
+import pytest
+
+from app.core.cache import TTLCache
+from app.core.metrics import GEOCODE_CACHE_REQUESTS
+from app.services import geocoding
+from app.services.geocoding import GeocodingService, cell_key
 
 
 class _FakeResp(io.BytesIO):
@@ -16,7 +23,7 @@ class _FakeResp(io.BytesIO):
 def test_reverse_geocode_uses_cache(monkeypatch):
     calls = {"n": 0}
 
-    def fake_urlopen(url):
+    def fake_urlopen(url, timeout=None):
         calls["n"] += 1
         data = {"results": [{"formatted_address": "Stub Address"}]}
         return _FakeResp(json.dumps(data).encode())
@@ -32,3 +39,124 @@ def test_reverse_geocode_uses_cache(monkeypatch):
     addr2 = svc.reverse_geocode(1.0, 2.0)
     assert addr2 == "Stub Address"
     assert calls["n"] == 1
+
+
+def _count(result):
+    return GEOCODE_CACHE_REQUESTS.labels(result=result)._value.get()
+
+
+def test_reverse_geocode_quantizes_nearby_coordinates(monkeypatch):
+    calls = {"n": 0}
+
+    def fake_urlopen(url, timeout=None):
+        calls["n"] += 1
+        data = {"results": [{"formatted_address": "Stub Address"}]}
+        return _FakeResp(json.dumps(data).encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    svc = GeocodingService(api_key="k", cache=TTLCache(), grid_m=10)
+    hits, misses = _count("hit"), _count("miss")
+
+    # ~2 m apart: same cell
+    assert svc.reverse_geocode(52.520001, 13.404951) == "Stub Address"
+    assert svc.reverse_geocode(52.520015, 13.404962) == "Stub Address"
+    assert calls["n"] == 1
+    # ~100 m north: new cell
+    svc.reverse_geocode(52.521, 13.404951)
+    assert calls["n"] == 2
+    assert _count("hit") - hits == 1
+    assert _count("miss") - misses == 2
+
+
+def test_reverse_geocode_caches_missing_address(monkeypatch):
+    calls = {"n": 0}
+
+    def fake_urlopen(url, timeout=None):
+        calls["n"] += 1
+        return _FakeResp(json.dumps({"results": [], "status": "ZERO_RESULTS"}).encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    cache = TTLCache()
+    svc = GeocodingService(api_key="k", cache=cache, negative_ttl=60)
+
+    assert svc.reverse_geocode(1.0, 2.0) is None
+    assert svc.reverse_geocode(1.0, 2.0) is None
+    assert calls["n"] == 1
+    assert cache.get(cell_key(1.0, 2.0, svc.grid_m)) == ""
+
+
+def test_reverse_geocode_does_not_cache_provider_errors(monkeypatch):
+    responses = [
+        {"results": [], "status": "OVER_QUERY_LIMIT"},
+        {"results": [{"formatted_address": "Stub Address"}], "status": "OK"},
+    ]
+
+    def fake_urlopen(url, timeout=None):
+        return _FakeResp(json.dumps(responses.pop(0)).encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    cache = TTLCache()
+    svc = GeocodingService(api_key="k", cache=cache)
+
+    with pytest.raises(geocoding.GeocodingError):
+        svc.reverse_geocode(1.0, 2.0)
+    assert cache.get(cell_key(1.0, 2.0, svc.grid_m)) is None
+    assert svc.reverse_geocode(1.0, 2.0) == "Stub Address"
+
+
+def test_reverse_geocode_default_cache_is_bounded(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    svc = GeocodingService(api_key="k")
+    assert isinstance(svc.cache, TTLCache)
+    assert svc.cache.maxsize > 0
+
+
+def test_cell_key_longitude_step_widens_with_latitude():
+    # cos(60°) = 0.5: the same longitude span covers half as many cells
+    lons = [10 + i * 0.00001 for i in range(1000)]
+    equator = {cell_key(0.0, lon, 10) for lon in lons}
+    north = {cell_key(60.0, lon, 10) for lon in lons}
+    assert abs(len(equator) - 2 * len(north)) <= 2
+
+
+def test_reverse_geocode_single_flight_per_cell():
+    release = threading.Event()
+    calls = {"n": 0}
+
+    class SlowProvider:
+        def reverse(self, lat, lon):
+            calls["n"] += 1
+            release.wait(5)
+            return "Stub Address"
+
+    svc = GeocodingService(cache=TTLCache(), provider=SlowProvider(), rate_limit_per_min=0)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(svc.reverse_geocode(1.0, 2.0)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls["n"] == 1
+    assert results == ["Stub Address"] * 5
+
+
+def test_rate_limiter_waits_when_bucket_is_empty(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(geocoding.time, "sleep", sleeps.append)
+    limiter = geocoding.RateLimiter(per_minute=60)
+    limiter.acquire()
+    assert sleeps == []
+    limiter.acquire()
+    assert sleeps and 0.9 < sleeps[0] <= 1.0
+
+
+def test_stub_provider_is_used_without_network(monkeypatch):
+    monkeypatch.setattr(geocoding.settings, "geocode_provider", "stub")
+    svc = GeocodingService(cache=TTLCache())
+    assert isinstance(svc.provider, geocoding.StubProvider)
+    assert svc.reverse_geocode(1.0, 2.0).startswith("Stub Address")
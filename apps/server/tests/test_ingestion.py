@@ -1,6 +1,11 @@
+import hashlib
 import importlib
+import io
+from datetime import UTC, datetime
 
+import pytest
 from fastapi.testclient import TestClient
+from PIL import Image, UnidentifiedImageError
 from sqlmodel import SQLModel
 
 from app.core.config import settings
@@ -68,3 +73,345 @@ def test_ingest_job(monkeypatch):
     assert r.status_code == 200
     assert r.json()["job_id"] == "ingest-id"
     assert calls["ingest"] == {"foo": "bar"}
+
+
+def _jpeg_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class _S3Stub:
+    def __init__(self, objects: dict[str, bytes]):
+        self.objects = objects
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+
+def test_ingest_worker_processes_pending_photo(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        loc = models.Location(
+            name="Site", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+        )
+        existing = models.Photo(
+            object_key="old",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="",
+        )
+        pending = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="",
+            status="PENDING",
+        )
+        session.add(loc)
+        session.add(existing)
+        session.add(pending)
+        session.commit()
+        session.refresh(loc)
+        session.refresh(pending)
+        loc_id, photo_id = loc.id, pending.id
+    finally:
+        session_gen.close()
+
+    s3 = _S3Stub({"k1": _jpeg_bytes()})
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: s3)
+    jobs.ingest(
+        {
+            "photo_id": photo_id,
+            "object_key": "k1",
+            "ad_hoc_spot": {"lat": 52.5201, "lon": 13.405},
+        }
+    )
+
+    assert "thumbnails/k1.jpg" in s3.objects
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = session.get(models.Photo, photo_id)
+        assert photo.status == "INGESTED"
+        assert len(photo.hash) == 64
+        assert photo.phash
+        assert photo.hash_bin == bytes.fromhex(photo.hash)
+        assert photo.phash_int & (2**64 - 1) == int(photo.phash, 16)
+        assert photo.is_duplicate is False
+        assert photo.location_id == loc_id
+        assert photo.note is None
+    finally:
+        session_gen.close()
+
+
+def test_ingest_worker_keeps_location_matched_by_batch(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        matched = models.Location(
+            name="Matched", address="Addr", geog="POINT(11.575 48.137)", customer_id="c1"
+        )
+        nearby = models.Location(
+            name="Nearby", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+        )
+        session.add(matched)
+        session.add(nearby)
+        session.commit()
+        pending = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="",
+            status="PENDING",
+            location_id=matched.id,
+        )
+        session.add(pending)
+        session.commit()
+        photo_id, matched_id = pending.id, matched.id
+    finally:
+        session_gen.close()
+
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: _S3Stub({"k1": _jpeg_bytes()}))
+    jobs.ingest(
+        {
+            "photo_id": photo_id,
+            "object_key": "k1",
+            "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+        }
+    )
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = session.get(models.Photo, photo_id)
+        assert photo.status == "INGESTED"
+        assert photo.location_id == matched_id
+    finally:
+        session_gen.close()
+
+
+def test_ingest_worker_marks_failed_photo(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        pending = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="",
+            status="PENDING",
+        )
+        session.add(pending)
+        session.commit()
+        session.refresh(pending)
+        photo_id = pending.id
+    finally:
+        session_gen.close()
+
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: _S3Stub({"k1": b"not an image"}))
+    with pytest.raises(UnidentifiedImageError):
+        jobs.ingest({"photo_id": photo_id, "object_key": "k1"})
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        assert session.get(models.Photo, photo_id).status == "FAILED"
+    finally:
+        session_gen.close()
+
+
+def test_ingest_worker_skips_processed_photo(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="h1",
+            phash="ffff0000ffff0000",
+        )
+        session.add(photo)
+        session.commit()
+        session.refresh(photo)
+        photo_id = photo.id
+    finally:
+        session_gen.close()
+
+    s3 = _S3Stub({})
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: s3)
+    jobs.ingest({"photo_id": photo_id, "object_key": "k1"})
+    assert s3.objects == {}
+
+
+def test_ingest_worker_adds_derivatives_to_hashed_photo(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        # Registered by the synchronous API: hashed and matched, no pHash yet.
+        photo = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c1",
+            hash="h1",
+            is_duplicate=True,
+        )
+        session.add(photo)
+        session.commit()
+        session.refresh(photo)
+        photo_id = photo.id
+    finally:
+        session_gen.close()
+
+    s3 = _S3Stub({"k1": _jpeg_bytes()})
+    monkeypatch.setattr(jobs, "get_s3_client", lambda: s3)
+    jobs.ingest(
+        {"photo_id": photo_id, "object_key": "k1", "ad_hoc_spot": {"lat": 0, "lon": 0}}
+    )
+
+    assert set(s3.objects) == {"k1", "thumbnails/k1.jpg", "thumbnails/1024/k1.jpg"}
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = session.get(models.Photo, photo_id)
+        assert photo.phash
+        assert photo.hash == "h1"
+        assert photo.is_duplicate is True
+        assert photo.status == "INGESTED"
+    finally:
+        session_gen.close()
+
+
+def test_duplicate_check_reads_legacy_hex_hash(monkeypatch):
+    make_client(monkeypatch)
+    import app.db.models as models
+    import app.db.session as session_module
+    from app.services.ingestion import is_duplicate_hash
+
+    digest = hashlib.sha256(b"x").hexdigest()
+    other = hashlib.sha256(b"y").hexdigest()
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        for key, hex_hash, hash_bin in [
+            ("legacy", digest, None),
+            ("compact", other, bytes.fromhex(other)),
+            ("stale-hex", "", bytes.fromhex(other)),
+        ]:
+            session.add(
+                models.Photo(
+                    object_key=key,
+                    taken_at=datetime.now(UTC),
+                    mode="FIXED_SITE",
+                    customer_id="c1",
+                    hash=hex_hash,
+                    hash_bin=hash_bin,
+                )
+            )
+        session.commit()
+        assert is_duplicate_hash(session, digest)
+        assert is_duplicate_hash(session, other)
+        assert not is_duplicate_hash(session, hashlib.sha256(b"z").hexdigest())
+    finally:
+        session_gen.close()
+
+
+def test_geocode_job_coalesces_spots_per_cell(monkeypatch):
+    make_client(monkeypatch)
+    from workers.ingestion import jobs
+
+    import app.db.models as models
+    import app.db.session as session_module
+    from app.core.cache import TTLCache
+    from app.services.geocoding import GeocodingService
+
+    class CountingProvider:
+        def __init__(self):
+            self.calls = 0
+
+        def reverse(self, lat, lon):
+            self.calls += 1
+            return f"Address {self.calls}"
+
+    provider = CountingProvider()
+    monkeypatch.setattr(
+        jobs, "_geocoder", GeocodingService(cache=TTLCache(), provider=provider, grid_m=10)
+    )
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photos = [
+            models.Photo(
+                object_key=f"k{i}",
+                taken_at=datetime.now(UTC),
+                mode="FIXED_SITE",
+                customer_id="c1",
+                hash="",
+                note="Mast 7" if i == 2 else None,
+            )
+            for i in range(4)
+        ]
+        session.add_all(photos)
+        session.commit()
+        ids = [p.id for p in photos]
+    finally:
+        session_gen.close()
+
+    spots = [
+        {"photo_id": ids[0], "lat": 52.520001, "lon": 13.404951},
+        {"photo_id": ids[1], "lat": 52.520015, "lon": 13.404962},
+        {"photo_id": ids[2], "lat": 52.520010, "lon": 13.404955},
+        {"photo_id": ids[3], "lat": 52.521, "lon": 13.404951},
+    ]
+    assert jobs.geocode({"spots": spots}) == {"updated": 3}
+    assert provider.calls == 2
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        notes = [session.get(models.Photo, pid).note for pid in ids]
+    finally:
+        session_gen.close()
+    assert notes == ["Address 1", "Address 1", "Mast 7", "Address 2"]
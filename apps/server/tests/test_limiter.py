@@ -0,0 +1,57 @@
+import os
+import uuid
+
+import pytest
+from limits import parse
+from limits.strategies import MovingWindowRateLimiter
+
+from app.core import limiter as limiter_module
+from app.core.limiter import LocalPrecheck, RedisWindowStorage, storage_uri
+
+
+def test_local_precheck_blocks_only_keys_over_the_limit(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(limiter_module.time, "monotonic", lambda: now[0])
+    precheck = LocalPrecheck(maxsize=10)
+
+    assert not precheck.blocked("k", 5, 60)
+    for _ in range(5):
+        assert not precheck.blocked("k", 5, 60)
+        precheck.admitted("k", 5, 60)
+    assert precheck.blocked("k", 5, 60)
+    # One token refills after expiry / limit seconds.
+    now[0] += 12
+    assert not precheck.blocked("k", 5, 60)
+
+    precheck.rejected("other", 5, 60, retry_after=30)
+    assert precheck.blocked("other", 5, 60)
+    now[0] += 31
+    assert not precheck.blocked("other", 5, 60)
+
+
+def test_storage_uri_prefers_shared_redis(monkeypatch):
+    monkeypatch.setattr(limiter_module.settings, "rate_limit_storage_uri", None)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    assert storage_uri() == "memory://"
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6379/0")
+    assert storage_uri() == "dokusuite+redis://cache:6379/0"
+    monkeypatch.setattr(limiter_module.settings, "rate_limit_storage_uri", "memory://")
+    assert storage_uri() == "memory://"
+
+
+def test_redis_window_is_shared_between_processes():
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/15")
+    first = RedisWindowStorage(f"dokusuite+{url}")
+    if not first.check():
+        pytest.skip("Redis not available")
+    second = RedisWindowStorage(f"dokusuite+{url}")
+    item = parse("3/minute")
+    key = uuid.uuid4().hex
+    workers = [MovingWindowRateLimiter(first), MovingWindowRateLimiter(second)]
+    try:
+        results = [workers[i % 2].hit(item, key) for i in range(5)]
+        assert results == [True, True, True, False, False]
+        stats = workers[0].get_window_stats(item, key)
+        assert stats.remaining == 0
+    finally:
+        first.clear(item.key_for(key))
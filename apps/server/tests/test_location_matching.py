@@ -0,0 +1,112 @@
+import importlib
+
+from sqlalchemy import update
+from sqlmodel import SQLModel
+
+from app.services.location_matching import LocationIndex, find_nearest_location
+
+
+def setup_db(monkeypatch):
+    monkeypatch.setenv("DOKUSUITE_DATABASE_URL", "sqlite:///:memory:")
+    import app.db.session as session_module
+    session_module = importlib.reload(session_module)
+    import app.db.models as models
+    SQLModel.metadata.drop_all(session_module.engine)
+    SQLModel.metadata.create_all(session_module.engine)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    return session, session_gen, models
+
+
+def test_index_nearest_within_radius():
+    index = LocationIndex(50)
+    index.upsert(1, 52.52, 13.405)
+    index.upsert(2, 52.5203, 13.4052)
+    assert index.nearest(52.5203, 13.4053, 50) == 2
+    assert index.nearest(52.53, 13.42, 50) is None
+
+
+def test_index_remove_and_move():
+    index = LocationIndex(50)
+    index.upsert(1, 52.52, 13.405)
+    index.remove(1)
+    assert index.nearest(52.52, 13.405, 50) is None
+    index.upsert(1, 48.137, 11.575)
+    index.upsert(1, 52.52, 13.405)
+    assert len(index) == 1
+    assert index.nearest(52.52, 13.405, 50) == 1
+    assert index.nearest(48.137, 11.575, 50) is None
+
+
+def test_index_searches_neighbouring_cells():
+    index = LocationIndex(50)
+    # ~40 m east of the query point, typically in a different grid column
+    index.upsert(1, 60.0, 10.0007)
+    assert index.nearest(60.0, 10.0, 50) == 1
+
+
+def test_find_nearest_tracks_committed_changes(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        assert find_nearest_location(session, 52.52, 13.405, "c1") is None
+
+        loc = models.Location(
+            name="Site", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+        )
+        other = models.Location(
+            name="Other", address="Addr", geog="POINT(13.405 52.52)", customer_id="c2"
+        )
+        session.add(loc)
+        session.add(other)
+        session.commit()
+        assert find_nearest_location(session, 52.5201, 13.405, "c1") == loc.id
+
+        loc.geog = "POINT(11.575 48.137)"
+        session.add(loc)
+        session.commit()
+        assert find_nearest_location(session, 52.5201, 13.405, "c1") is None
+        assert find_nearest_location(session, 48.137, 11.575, "c1") == loc.id
+
+        session.delete(loc)
+        session.commit()
+        assert find_nearest_location(session, 48.137, 11.575, "c1") is None
+    finally:
+        session_gen.close()
+
+
+def test_find_nearest_ignores_rolled_back_changes(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        assert find_nearest_location(session, 52.52, 13.405, "c1") is None
+        session.add(
+            models.Location(
+                name="Site", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+            )
+        )
+        session.flush()
+        session.rollback()
+        assert find_nearest_location(session, 52.52, 13.405, "c1") is None
+    finally:
+        session_gen.close()
+
+
+def test_find_nearest_picks_up_changes_from_other_processes(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        loc = models.Location(
+            name="Site", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+        )
+        session.add(loc)
+        session.commit()
+        assert find_nearest_location(session, 52.52, 13.405, "c1") == loc.id
+
+        # Core statements bypass the ORM events, like a write from the sync worker.
+        table = models.Location.__table__
+        session.connection().execute(
+            update(table).where(table.c.id == loc.id).values(geog="POINT(11.575 48.137)")
+        )
+        session.commit()
+        assert find_nearest_location(session, 52.52, 13.405, "c1") is None
+        assert find_nearest_location(session, 48.137, 11.575, "c1") == loc.id
+    finally:
+        session_gen.close()
@@ -0,0 +1,82 @@
+import gzip
+import importlib
+import json
+from datetime import UTC, datetime
+
+from sqlmodel import SQLModel
+
+from app.api.schemas import LocationRead
+from app.core.config import settings
+from app.core.storage import InMemoryObjectStore
+from app.db.delta import SyncToken
+from app.services.location_snapshots import FIELDS, LocationSnapshotService, snapshot_key
+
+
+def setup_db(monkeypatch):
+    monkeypatch.setenv("DOKUSUITE_DATABASE_URL", "sqlite:///:memory:")
+    import app.db.session as session_module
+    session_module = importlib.reload(session_module)
+    import app.db.models as models
+    SQLModel.metadata.drop_all(session_module.engine)
+    SQLModel.metadata.create_all(session_module.engine)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    return session, session_gen, models
+
+
+def read_snapshot(store, key):
+    return json.loads(gzip.decompress(store.objects[(settings.s3_bucket, key)]))
+
+
+def test_snapshot_fields_match_location_read():
+    assert FIELDS == list(LocationRead.model_fields)
+
+
+def test_snapshot_is_columnar_and_versioned(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    store = InMemoryObjectStore()
+    try:
+        session.add_all(
+            [
+                models.Location(name="A", address="X", customer_id="c1"),
+                models.Location(name="B", address="Y", customer_id="c1"),
+                models.Location(
+                    name="Gone", address="Z", customer_id="c1", deleted_at=datetime.now(UTC)
+                ),
+                models.Location(name="Other", address="Q", customer_id="c2"),
+            ]
+        )
+        session.commit()
+        service = LocationSnapshotService(session, store)
+
+        results = {r.customer_id: r for r in service.build_all()}
+        assert results["c1"].version == 1 and results["c1"].built
+        doc = read_snapshot(store, snapshot_key("c1", 1))
+        assert doc["version"] == 1
+        assert doc["count"] == 2
+        assert doc["columns"]["name"] == ["A", "B"]
+        assert list(doc["columns"]) == FIELDS
+        snapshot = session.get(models.LocationSnapshot, "c1")
+        assert SyncToken.decode(doc["token"]) == SyncToken(snapshot.watermark, 0)
+
+        # Nothing changed: no new version is written.
+        assert not service.build("c1").built
+        assert len(store.objects) == 2
+
+        loc = session.get(models.Location, 1)
+        loc.name = "A2"
+        session.add(loc)
+        session.commit()
+        assert service.build("c1").version == 2
+        assert service.build("c2").version == 1
+        loc.deleted_at = datetime.now(UTC)
+        session.add(loc)
+        session.commit()
+        assert service.build("c1").version == 3
+
+        # Two versions are kept per customer.
+        c1_keys = sorted(k for _, k in store.objects if "/c1/" in k)
+        assert c1_keys == [snapshot_key("c1", 2), snapshot_key("c1", 3)]
+        assert read_snapshot(store, snapshot_key("c1", 3))["columns"]["name"] == ["B"]
+    finally:
+        session_gen.close()
@@ -1,9 +1,11 @@
 import importlib
+import json
 from datetime import UTC, datetime
 
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, select
 
+from app.api.schemas import LocationRead
 from app.core.config import settings
 from app.core.security import create_access_token
 
@@ -152,6 +154,123 @@ def test_locations_offline_delta_tombstones(monkeypatch):
     assert data["tombstones"][0]["id"] == loc_id
 
 
+def _delta_pages(client, token=None, **params):
+    """Follow ``next_token`` until ``more`` is false; return lines and the last token."""
+    lines = []
+    while True:
+        r = client.get(
+            "/locations/offline-delta",
+            params={**params, **({"token": token} if token else {})},
+            headers=auth_headers(),
+        )
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        page = [json.loads(line) for line in r.text.splitlines()]
+        assert page[-1]["type"] == "end"
+        lines.extend(page[:-1])
+        token = page[-1]["next_token"]
+        if not page[-1]["more"]:
+            return lines, token
+
+
+def test_locations_offline_delta_token_pages(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        session.add_all(
+            [models.Location(name=f"L{i}", address="A", customer_id="c1") for i in range(5)]
+        )
+        session.add(models.Location(name="Other", address="B", customer_id="c2"))
+        session.commit()
+    finally:
+        session_gen.close()
+
+    lines, token = _delta_pages(client, limit=2)
+    assert [line["type"] for line in lines] == ["upsert"] * 5
+    assert sorted(line["row"]["name"] for line in lines) == [f"L{i}" for i in range(5)]
+    assert set(lines[0]["row"]) == set(LocationRead.model_fields)
+    assert _delta_pages(client, token) == ([], token)
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        rows = session.exec(select(models.Location).where(models.Location.customer_id == "c1"))
+        first, second = list(rows)[:2]
+        first.name = "Renamed"
+        second.deleted_at = datetime.now(UTC)
+        session.add_all([first, second])
+        session.commit()
+        first_id, second_id = first.id, second.id
+    finally:
+        session_gen.close()
+
+    lines, _ = _delta_pages(client, token)
+    assert lines == [
+        {"type": "upsert", "row": {**lines[0]["row"], "id": first_id, "name": "Renamed"}},
+        {"type": "tombstone", "id": second_id},
+    ]
+
+
+def test_locations_offline_delta_bounded_and_compressed(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    monkeypatch.setattr(settings, "offline_delta_page_bytes", 1)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        session.add_all(
+            [models.Location(name=f"L{i}", address="A", customer_id="c1") for i in range(3)]
+        )
+        session.commit()
+    finally:
+        session_gen.close()
+
+    r = client.get(
+        "/locations/offline-delta", headers={**auth_headers(), "Accept-Encoding": "gzip"}
+    )
+    assert r.headers["content-encoding"] == "gzip"
+    page = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["type"] for line in page] == ["upsert", "end"]
+    assert page[-1]["more"] is True
+
+    lines, _ = _delta_pages(client, page[-1]["next_token"])
+    assert [line["row"]["name"] for line in lines] == ["L1", "L2"]
+
+    r = client.get("/locations/offline-delta", params={"token": "x"}, headers=auth_headers())
+    assert r.status_code == 400
+
+
+def test_location_snapshot_link_and_delta_token(monkeypatch):
+    from app.core.storage import InMemoryObjectStore
+    from app.services.location_snapshots import LocationSnapshotService
+
+    client, session_module, models = make_client(monkeypatch)
+    r = client.get("/locations/snapshot", headers=auth_headers())
+    assert r.status_code == 404
+
+    store = InMemoryObjectStore()
+    monkeypatch.setattr("app.api.routes.locations.get_s3_client", lambda: store)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        session.add(models.Location(name="A", address="X", customer_id="c1"))
+        session.commit()
+        LocationSnapshotService(session, store).build("c1")
+        session.add(models.Location(name="After", address="Y", customer_id="c1"))
+        session.commit()
+    finally:
+        session_gen.close()
+
+    r = client.get("/locations/snapshot", headers=auth_headers())
+    assert r.status_code == 200
+    data = r.json()
+    assert data["version"] == 1
+    assert data["count"] == 1
+    assert data["url"].endswith("/v1.json.gz")
+    lines, _ = _delta_pages(client, data["token"])
+    assert [line["row"]["name"] for line in lines] == ["After"]
+
+
 def test_update_location(monkeypatch):
     client, session_module, models = make_client(monkeypatch)
     session_gen = session_module.get_session()
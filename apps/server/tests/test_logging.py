@@ -0,0 +1,73 @@
+import json
+import logging
+import queue
+import threading
+
+from prometheus_client import REGISTRY
+
+from app.core import logging as app_logging
+from app.core.config import settings
+
+
+def _record(status_code=None, msg="request completed"):
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, msg, None, None)
+    if status_code is not None:
+        record.status_code = status_code
+        record.request_id = "r1"
+    return record
+
+
+def test_json_formatter_serializers_agree():
+    record = _record(200)
+    plain = app_logging.JsonFormatter().format(record)
+    fast = app_logging.JsonFormatter(serializer="orjson").format(record)
+    assert json.loads(plain) == json.loads(fast)
+    assert json.loads(plain)["request_id"] == "r1"
+
+
+def test_success_sampler_keeps_errors():
+    sampler = app_logging.SuccessSampler(0.0)
+    assert not sampler.filter(_record(200))
+    assert sampler.filter(_record(500))
+    assert sampler.filter(_record())
+    assert app_logging.SuccessSampler(1.0).filter(_record(200))
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = app_logging.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = REGISTRY.get_sample_value("dokusuite_log_records_dropped_total") or 0
+    handler.emit(_record(msg="a %s", status_code=200))
+    handler.emit(_record(status_code=200))
+    assert REGISTRY.get_sample_value("dokusuite_log_records_dropped_total") == before + 1
+    assert handler.queue.qsize() == 1
+
+
+def test_configure_logging_writes_from_listener(monkeypatch, capfd):
+    monkeypatch.setattr(settings, "log_queue_size", 100)
+    app_logging.configure_logging()
+    try:
+        logging.getLogger("test").info("hello %s", "queue", extra={"status_code": 201})
+        assert isinstance(logging.getLogger().handlers[0], app_logging.NonBlockingQueueHandler)
+    finally:
+        app_logging._stop_listener()
+    line = capfd.readouterr().err.strip().splitlines()[-1]
+    assert json.loads(line)["message"] == "hello queue"
+
+
+def test_listener_stops_with_a_full_queue():
+    release = threading.Event()
+    written = []
+
+    class SlowHandler(logging.Handler):
+        def emit(self, record):
+            release.wait(5)
+            written.append(record.msg)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=2)
+    listener = app_logging.DrainingQueueListener(log_queue, SlowHandler())
+    listener.start()
+    for msg in ("a", "b", "c"):
+        log_queue.put(_record(msg=msg), timeout=5)
+    threading.Timer(0.1, release.set).start()
+    listener.stop()
+    assert written == ["a", "b", "c"]
@@ -0,0 +1,61 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+
+from app.services.media import process_image, thumbnail_key
+from app.services.phash import compute_phash
+
+
+def _image_bytes(size=(400, 200), fmt="JPEG", orientation=None, mode="RGB") -> bytes:
+    img = Image.new(mode, size, "white")
+    exif = img.getexif()
+    if orientation is not None:
+        exif[274] = orientation
+    buf = BytesIO()
+    img.save(buf, format=fmt, exif=exif)
+    return buf.getvalue()
+
+
+def test_process_image_keeps_unrotated_original():
+    data = _image_bytes()
+    result = process_image(data, (256, 64))
+    assert result.rotated is False
+    assert result.data is data
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.phash == compute_phash(data)
+    assert {"decode", "phash", "sha256", "thumbnails"} <= set(result.timings)
+
+
+def test_process_image_applies_orientation():
+    data = _image_bytes(orientation=6)
+    result = process_image(data, ())
+    assert result.rotated is True
+    with Image.open(BytesIO(result.data)) as img:
+        assert img.size == (200, 400)
+    assert result.sha256 == hashlib.sha256(result.data).hexdigest()
+    assert "orient" in result.timings
+
+
+def test_process_image_without_derivatives_only_hashes():
+    data = _image_bytes()
+    result = process_image(data, (), phash=False)
+    assert result.phash is None
+    assert result.thumbnails == {}
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert "phash" not in result.timings
+
+
+def test_process_image_multi_size_thumbnails():
+    result = process_image(_image_bytes(fmt="PNG", mode="RGBA"), (64, 256))
+    sizes = {}
+    for size, thumb in result.thumbnails.items():
+        with Image.open(BytesIO(thumb)) as img:
+            assert img.format == "JPEG"
+            sizes[size] = img.size
+    assert sizes == {256: (256, 128), 64: (64, 32)}
+
+
+def test_thumbnail_key_keeps_legacy_default():
+    assert thumbnail_key("k1") == "thumbnails/k1.jpg"
+    assert thumbnail_key("k1", 1024) == "thumbnails/1024/k1.jpg"
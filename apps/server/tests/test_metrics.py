@@ -0,0 +1,56 @@
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.middleware import UNMATCHED_ROUTE
+from app.main import create_app
+
+
+def _count(method, path, status_code):
+    value = REGISTRY.get_sample_value(
+        "dokusuite_requests_total",
+        {"method": method, "path": path, "status_code": str(status_code)},
+    )
+    return value or 0
+
+
+def _latency_count(method, path):
+    value = REGISTRY.get_sample_value(
+        "dokusuite_request_duration_seconds_count", {"method": method, "path": path}
+    )
+    return value or 0
+
+
+def test_metrics_labelled_by_route_template():
+    client = TestClient(create_app())
+    before = _count("GET", "/photos/{photo_id}/status", 401)
+    latency_before = _latency_count("GET", "/photos/{photo_id}/status")
+    for photo_id in (1, 2, 3):
+        r = client.get(f"/photos/{photo_id}/status")
+        assert r.status_code == 401
+    assert _count("GET", "/photos/{photo_id}/status", 401) == before + 3
+    assert _latency_count("GET", "/photos/{photo_id}/status") == latency_before + 3
+    assert _count("GET", "/photos/1/status", 401) == 0
+
+    unmatched = _count("GET", UNMATCHED_ROUTE, 404)
+    assert client.get("/does-not-exist/123").status_code == 404
+    assert _count("GET", UNMATCHED_ROUTE, 404) == unmatched + 1
+
+    body = client.get("/metrics").text
+    assert 'path="/photos/1/status"' not in body
+
+
+def test_request_id_header_and_streaming_response():
+    app = create_app()
+
+    @app.get("/_stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    client = TestClient(app)
+    r = client.get("/_stream")
+    assert r.status_code == 200
+    assert r.text == "abc"
+    assert r.headers["X-Request-ID"]
+    assert client.get("/healthz").headers["X-Request-ID"] != r.headers["X-Request-ID"]
+    assert _count("GET", "/_stream", 200) >= 1
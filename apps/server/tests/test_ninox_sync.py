@@ -1,14 +1,18 @@
 import importlib
 import pathlib
 import sys
+import urllib.error
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
 
+import pytest
+from benchmarks.ninox_stub import NinoxStub, synthetic_tables
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, select
 
 from app.core.config import settings
 from app.core.security import create_access_token
+from app.services.ninox_client import NinoxClient
 from app.services.ninox_sync import NinoxSyncService
 
 
@@ -114,3 +118,145 @@ def test_ninox_sync_job_enqueued(monkeypatch):
     assert r.status_code == 200
     assert r.json()["job_id"] == "ninox-id"
     assert calls["ninox"] == {"foo": "bar"}
+
+
+def test_ninox_sync_batches_round_trips(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        # SQLite inserts new rows one by one (no ordered RETURNING batches);
+        # PostgreSQL batches them as well.
+        if not statement.startswith("INSERT INTO location"):
+            statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        progress = []
+        service = NinoxSyncService(
+            session, batch_size=100, progress=lambda table, done: progress.append((table, done))
+        )
+        records = [
+            {"id": str(i), "customer_id": "c1", "name": f"L{i}", "address": "A", "etag": "1"}
+            for i in range(250)
+        ]
+        service.run({"locations": records})
+        first = len(statements)
+        assert progress == [("location", 100), ("location", 200), ("location", 250)]
+
+        statements.clear()
+        service.run({"locations": [{**rec, "name": "X", "etag": "2"} for rec in records]})
+        updates = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    try:
+        # A handful of statements per batch instead of two or more per record
+        assert first < 20
+        assert updates < 20
+        assert session.exec(select(models.Location).where(models.Location.name == "X")).all()
+        refs = session.exec(select(models.ExtRef)).all()
+        assert len(refs) == 250
+        assert {ref.etag for ref in refs} == {"2"}
+    finally:
+        session_gen.close()
+
+
+def test_ninox_sync_duplicate_record_in_batch(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        NinoxSyncService(session).run(
+            {
+                "locations": [
+                    {"id": "1", "customer_id": "c1", "name": "A", "address": "B"},
+                    {"id": "1", "customer_id": "c1", "name": "C", "address": "B"},
+                ]
+            }
+        )
+        loc = session.exec(select(models.Location)).one()
+        assert loc.name == "C"
+        assert session.exec(select(models.ExtRef)).one().local_id == loc.id
+    finally:
+        session_gen.close()
+
+
+def test_ninox_sync_skips_unchanged_records(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        service = NinoxSyncService(session)
+        records = [
+            {"id": "1", "customer_id": "c1", "name": "A", "address": "B", "etag": "e1"},
+            {"id": "2", "customer_id": "c1", "name": "C", "address": "D"},
+        ]
+        stats = service.run({"locations": records})
+        assert stats["location"] == {"created": 2, "updated": 0, "deleted": 0, "skipped": 0}
+        before = {loc.id: loc.updated_at for loc in session.exec(select(models.Location))}
+
+        stats = service.run({"locations": records})
+        assert stats["location"] == {"created": 0, "updated": 0, "deleted": 0, "skipped": 2}
+        session.expire_all()
+        after = {loc.id: loc.updated_at for loc in session.exec(select(models.Location))}
+        assert after == before
+
+        stats = service.run(
+            {"locations": [{**records[0], "name": "X", "etag": "e2"}, records[1]]}
+        )
+        assert stats["location"]["updated"] == 1
+        assert stats["location"]["skipped"] == 1
+        names = {loc.name for loc in session.exec(select(models.Location))}
+        assert names == {"X", "C"}
+    finally:
+        session_gen.close()
+
+
+def test_ninox_sync_streams_pages_and_stores_cursor(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    monkeypatch.setattr(settings, "ninox_page_size", 10)
+    monkeypatch.setattr(settings, "ninox_prefetch", 3)
+    try:
+        with NinoxStub(synthetic_tables(25, 3)) as stub:
+            progress = []
+            service = NinoxSyncService(
+                session,
+                base_url=stub.base_url,
+                progress=lambda table, done: progress.append((table, done)),
+            )
+            stats = service.run()
+            assert stats["location"]["created"] == 25
+            assert stats["order"]["created"] == 3
+            assert progress == [
+                ("location", 10), ("location", 20), ("location", 25), ("order", 3)
+            ]
+            state = session.get(models.SyncState, "ninox:location")
+            assert (state.cursor, state.page) == ("25", None)
+
+            stats = service.run()
+            assert stats["location"] == {"created": 0, "updated": 0, "deleted": 0, "skipped": 0}
+        assert len(session.exec(select(models.Location)).all()) == 25
+    finally:
+        session_gen.close()
+
+
+def test_ninox_sync_resumes_from_checkpoint(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    monkeypatch.setattr(settings, "ninox_page_size", 10)
+    try:
+        session.add(models.SyncState(source="ninox:location", page=2))
+        session.commit()
+        with NinoxStub(synthetic_tables(25)) as stub:
+            stats = NinoxSyncService(session, base_url=stub.base_url).sync_locations()
+        assert stats.created == 5
+        assert session.get(models.SyncState, "ninox:location").page is None
+    finally:
+        session_gen.close()
+
+
+def test_ninox_client_retries_transient_errors():
+    with NinoxStub(synthetic_tables(5), fail_every=2) as stub:
+        client = NinoxClient(stub.base_url, page_size=2, prefetch=2, backoff=0)
+        pages = list(client.pages("locations"))
+        assert [len(page.records) for page in pages] == [2, 2, 1]
+        with pytest.raises(urllib.error.HTTPError):
+            client.get_page("unknown", 0)
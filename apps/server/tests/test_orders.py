@@ -57,6 +57,27 @@ def test_orders_list(monkeypatch):
     assert len(data["items"]) == 1
 
 
+def test_orders_cursor_pagination(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        for i in range(3):
+            session.add(models.Order(customer_id="c1", name=f"o{i}", status="NEW"))
+        session.add(models.Order(customer_id="c2", name="other", status="NEW"))
+        session.commit()
+    finally:
+        session_gen.close()
+    r = client.get("/orders?limit=2&cursor=", headers=auth_headers())
+    data = r.json()
+    assert [o["name"] for o in data["items"]] == ["o0", "o1"]
+    assert data["next_cursor"]
+    r = client.get(f"/orders?limit=2&cursor={data['next_cursor']}", headers=auth_headers())
+    data = r.json()
+    assert [o["name"] for o in data["items"]] == ["o2"]
+    assert data["next_cursor"] is None
+
+
 def test_orders_filter(monkeypatch):
     client, session_module, models = make_client(monkeypatch)
     session_gen = session_module.get_session()
@@ -1,5 +1,7 @@
+import hashlib
 import importlib
 import io
+import json
 from datetime import UTC, datetime
 
 from fastapi.testclient import TestClient
@@ -11,6 +13,16 @@ from app.core.security import create_access_token
 from app.services.phash import compute_phash
 
 
+def _jpeg_bytes(orientation: int | None = None) -> bytes:
+    img = Image.new("RGB", (64, 32), "white")
+    exif = img.getexif()
+    if orientation is not None:
+        exif[274] = orientation
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
 def make_client(monkeypatch):
     monkeypatch.setenv("DOKUSUITE_DATABASE_URL", "sqlite:///:memory:")
     import app.db.session as session_module
@@ -37,17 +49,16 @@ def make_client(monkeypatch):
 
     class S3Stub:
         def __init__(self):
-            self.last_put: bytes | None = None
+            self.puts: dict[str, bytes] = {}
 
         def get_object(self, Bucket, Key):
-            return {"Body": io.BytesIO(b"raw")}
+            return {"Body": io.BytesIO(_jpeg_bytes())}
 
         def put_object(self, Bucket, Key, Body):
-            self.last_put = Body
+            self.puts[Key] = Body
 
     s3_stub = S3Stub()
-    monkeypatch.setattr(photos_module, "_s3_client", lambda: s3_stub)
-    monkeypatch.setattr(photos_module, "normalize_orientation", lambda b: b"norm")
+    monkeypatch.setattr(photos_module, "get_s3_client", lambda: s3_stub)
     called: dict = {}
 
     def fake_enqueue(payload):
@@ -55,6 +66,11 @@ def make_client(monkeypatch):
 
     monkeypatch.setattr(photos_module, "enqueue_ingest", fake_enqueue)
 
+    def fake_enqueue_many(payloads):
+        called.setdefault("batches", []).append(payloads)
+
+    monkeypatch.setattr(photos_module, "enqueue_ingest_many", fake_enqueue_many)
+
     import app.main as app_main
     app_main = importlib.reload(app_main)
     return TestClient(app_main.create_app()), session_module, models, s3_stub, called
@@ -114,7 +130,8 @@ def test_photo_ingest_happy_path(monkeypatch):
     finally:
         session_gen.close()
 
-    assert s3_stub.last_put == b"norm"
+    # No EXIF rotation: the original is left untouched; thumbnails are the worker's.
+    assert s3_stub.puts == {}
     assert called["payload"]["photo_id"] == data["id"]
     assert called["payload"]["object_key"] == "k1"
     assert called["payload"]["mode"] == "FIXED_SITE"
@@ -123,6 +140,32 @@ def test_photo_ingest_happy_path(monkeypatch):
     assert called["payload"]["uploader_id"] == "u1"
 
 
+def test_photo_ingest_applies_exif_orientation(monkeypatch):
+    client, session_module, models, s3_stub, _ = make_client(monkeypatch)
+    monkeypatch.setattr(
+        s3_stub, "get_object", lambda Bucket, Key: {"Body": io.BytesIO(_jpeg_bytes(6))}
+    )
+    payload = {
+        "object_key": "k1",
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "FIXED_SITE",
+        "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+    }
+    r = client.post("/photos", json=payload, headers=auth_headers())
+    assert r.status_code == 201
+    with Image.open(io.BytesIO(s3_stub.puts["k1"])) as img:
+        assert img.size == (32, 64)
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = session.get(models.Photo, r.json()["id"])
+        assert photo.hash == hashlib.sha256(s3_stub.puts["k1"]).hexdigest()
+        assert photo.phash is None
+    finally:
+        session_gen.close()
+
+
 def test_photo_ingest_creates_audit_log(monkeypatch):
     client, session_module, models, *_ = make_client(monkeypatch)
     payload = {
@@ -312,6 +355,49 @@ def test_photos_filter(monkeypatch):
     assert data["items"][0]["uploader_id"] == "u1"
 
 
+def test_photos_cursor_pagination(monkeypatch):
+    client, session_module, models, *_ = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        for i, day in enumerate([1, 3, 3, 2, 5]):
+            session.add(
+                models.Photo(
+                    object_key=f"k{i}",
+                    taken_at=datetime(2024, 1, day),
+                    status="INGESTED",
+                    hash=f"h{i}",
+                    mode="FIXED_SITE",
+                    customer_id="c1",
+                )
+            )
+        session.commit()
+    finally:
+        session_gen.close()
+
+    keys: list[str] = []
+    cursor = ""
+    while True:
+        r = client.get(f"/photos?limit=2&cursor={cursor}", headers=auth_headers())
+        assert r.status_code == 200
+        data = r.json()
+        assert data["total"] is None
+        keys.extend(item["object_key"] for item in data["items"])
+        if data["next_cursor"] is None:
+            break
+        cursor = data["next_cursor"]
+    # newest first, ties broken by id descending
+    assert keys == ["k4", "k2", "k1", "k3", "k0"]
+
+    r = client.get("/photos?limit=2&cursor=&count=exact", headers=auth_headers())
+    assert r.json()["total"] == 5
+    r = client.get("/photos?limit=2&cursor=&count=estimate", headers=auth_headers())
+    assert r.json()["total"] == 5
+
+    r = client.get("/photos?cursor=not-a-cursor", headers=auth_headers())
+    assert r.status_code == 400
+
+
 def test_get_photo(monkeypatch):
     client, session_module, models, *_ = make_client(monkeypatch)
     session_gen = session_module.get_session()
@@ -512,26 +598,8 @@ def test_batch_assign_validation_error(monkeypatch):
     assert r.status_code == 422
 
 
-def test_photo_ingest_geocoding_cache_miss(monkeypatch):
-    client, session_module, models, *_ = make_client(monkeypatch)
-    import app.api.routes.photos as photos_module
-
-    class StubGeocoder:
-        def __init__(self):
-            self.calls = 0
-            self.cache: dict[str, str] = {}
-
-        def reverse_geocode(self, lat, lon):
-            key = f"{lat},{lon}"
-            if key in self.cache:
-                return self.cache[key]
-            self.calls += 1
-            addr = "Stub Address"
-            self.cache[key] = addr
-            return addr
-
-    stub = StubGeocoder()
-    monkeypatch.setattr(photos_module, "_geocoder", stub)
+def test_photo_ingest_leaves_geocoding_to_worker(monkeypatch):
+    client, session_module, models, _s3, called = make_client(monkeypatch)
     payload = {
         "object_key": "k5",
         "taken_at": "2024-01-01T00:00:00Z",
@@ -540,51 +608,16 @@ def test_photo_ingest_geocoding_cache_miss(monkeypatch):
     }
     r = client.post("/photos", json=payload, headers=auth_headers())
     assert r.status_code == 201
-    assert stub.calls == 1
-    data = r.json()
+    assert called["payload"]["photo_id"] == r.json()["id"]
+    assert called["payload"]["ad_hoc_spot"]["lat"] == 1.0
     session_gen = session_module.get_session()
     session = next(session_gen)
     try:
-        photo = session.get(models.Photo, data["id"])
-        assert photo.note == "Stub Address"
+        assert session.get(models.Photo, r.json()["id"]).note is None
     finally:
         session_gen.close()
 
 
-def test_photo_ingest_geocoding_cache_hit(monkeypatch):
-    client, *_ = make_client(monkeypatch)
-    import app.api.routes.photos as photos_module
-
-    class StubGeocoder:
-        def __init__(self):
-            self.calls = 0
-            self.cache: dict[str, str] = {}
-
-        def reverse_geocode(self, lat, lon):
-            key = f"{lat},{lon}"
-            if key in self.cache:
-                return self.cache[key]
-            self.calls += 1
-            addr = "Stub Address"
-            self.cache[key] = addr
-            return addr
-
-    stub = StubGeocoder()
-    monkeypatch.setattr(photos_module, "_geocoder", stub)
-    payload1 = {
-        "object_key": "k6",
-        "taken_at": "2024-01-01T00:00:00Z",
-        "mode": "FIXED_SITE",
-        "ad_hoc_spot": {"lat": 1.0, "lon": 2.0},
-    }
-    payload2 = {**payload1, "object_key": "k7"}
-    r1 = client.post("/photos", json=payload1, headers=auth_headers())
-    assert r1.status_code == 201
-    r2 = client.post("/photos", json=payload2, headers=auth_headers())
-    assert r2.status_code == 201
-    assert stub.calls == 1
-
-
 def test_delete_photo(monkeypatch):
     client, session_module, models, *_ = make_client(monkeypatch)
     session_gen = session_module.get_session()
@@ -622,6 +655,9 @@ def test_delete_photo(monkeypatch):
     finally:
         session_gen.close()
 
+    r = client.get("/photos", headers=auth_headers())
+    assert r.json()["total"] == 0
+
 
 def test_photos_offline_delta_upserts(monkeypatch):
     client, session_module, models, *_ = make_client(monkeypatch)
@@ -700,6 +736,46 @@ def test_photos_offline_delta_tombstones(monkeypatch):
     assert data["tombstones"][0]["id"] == photo_id
 
 
+def test_photos_offline_delta_token(monkeypatch):
+    client, session_module, models, *_ = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = models.Photo(
+            object_key="a",
+            taken_at=datetime(2024, 1, 1),
+            status="INGESTED",
+            hash="h1",
+            mode="FIXED_SITE",
+            customer_id="c1",
+        )
+        session.add(photo)
+        session.commit()
+        session.refresh(photo)
+        photo_id = photo.id
+    finally:
+        session_gen.close()
+
+    r = client.get("/photos/offline-delta", headers=auth_headers())
+    assert r.status_code == 200
+    first = [json.loads(line) for line in r.text.splitlines()]
+    assert first[0]["type"] == "upsert"
+    assert first[0]["row"]["object_key"] == "a"
+    assert first[0]["row"]["mode"] == "FIXED_SITE"
+    assert first[-1]["more"] is False
+
+    r = client.delete(f"/photos/{photo_id}", headers=auth_headers())
+    assert r.status_code == 200
+    r = client.get(
+        "/photos/offline-delta",
+        params={"token": first[-1]["next_token"]},
+        headers=auth_headers(),
+    )
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[0] == {"type": "tombstone", "id": photo_id}
+    assert lines[-1]["type"] == "end"
+
+
 def test_photos_customer_isolation(monkeypatch):
     client, session_module, models, *_ = make_client(monkeypatch)
     session_gen = session_module.get_session()
@@ -748,3 +824,311 @@ def test_photos_customer_isolation(monkeypatch):
         f"/photos/{other_id}", headers={"Authorization": f"Bearer {token_c1}"}
     )
     assert r.status_code == 404
+
+
+def test_photo_ingest_fast_ack(monkeypatch):
+    client, session_module, models, s3_stub, called = make_client(monkeypatch)
+    monkeypatch.setattr(settings, "ingest_fast_ack", True)
+    payload = {
+        "object_key": "k1",
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "FIXED_SITE",
+        "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+    }
+    r = client.post("/photos", json=payload, headers=auth_headers())
+    assert r.status_code == 201
+    data = r.json()
+    assert data["status"] == "PENDING"
+    assert s3_stub.puts == {}
+    assert called["payload"]["photo_id"] == data["id"]
+
+    r = client.get(f"/photos/{data['id']}/status", headers=auth_headers())
+    assert r.status_code == 200
+    assert r.json() == {
+        "id": data["id"],
+        "status": "PENDING",
+        "is_duplicate": False,
+        "location_id": None,
+    }
+
+
+def test_photo_status_customer_isolation(monkeypatch):
+    client, session_module, models, *_ = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photo = models.Photo(
+            object_key="k1",
+            taken_at=datetime.now(UTC),
+            mode="FIXED_SITE",
+            customer_id="c2",
+            hash="h1",
+        )
+        session.add(photo)
+        session.commit()
+        session.refresh(photo)
+        photo_id = photo.id
+    finally:
+        session_gen.close()
+
+    r = client.get(f"/photos/{photo_id}/status", headers=auth_headers())
+    assert r.status_code == 404
+
+
+def _batch_item(key, lat=52.52, lon=13.405):
+    return {
+        "object_key": key,
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "MOBILE",
+        "ad_hoc_spot": {"lat": lat, "lon": lon},
+    }
+
+
+def test_photo_batch_ingest(monkeypatch):
+    client, session_module, models, s3_stub, called = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        loc = models.Location(
+            name="Site", address="Addr", geog="POINT(13.405 52.52)", customer_id="c1"
+        )
+        session.add(loc)
+        session.commit()
+        session.refresh(loc)
+        loc_id = loc.id
+    finally:
+        session_gen.close()
+
+    items = [_batch_item("b1"), _batch_item("b2", lat=48.1, lon=11.5), _batch_item("b1")]
+    r = client.post("/photos/batch", json={"items": items}, headers=auth_headers())
+    assert r.status_code == 200
+    results = r.json()["items"]
+    assert [i["status"] for i in results] == ["created", "created", "exists"]
+    assert results[2]["photo"]["id"] == results[0]["photo"]["id"]
+    assert all(i["photo"]["status"] == "PENDING" for i in results)
+    assert s3_stub.puts == {}
+    assert len(called["batches"]) == 1
+    assert [p["object_key"] for p in called["batches"][0]] == ["b1", "b2"]
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photos = {p.object_key: p for p in session.exec(select(models.Photo))}
+        assert len(photos) == 2
+        assert photos["b1"].location_id == loc_id
+        assert photos["b2"].location_id is None
+        logs = session.exec(select(models.AuditLog).where(models.AuditLog.entity == "photo"))
+        assert len(logs.all()) == 2
+    finally:
+        session_gen.close()
+
+    # retrying the batch does not duplicate photos and re-enqueues pending ones
+    r = client.post("/photos/batch", json={"items": items[:2]}, headers=auth_headers())
+    assert [i["status"] for i in r.json()["items"]] == ["exists", "exists"]
+    assert [p["object_key"] for p in called["batches"][1]] == ["b1", "b2"]
+
+
+def test_photo_batch_ingest_partial_failure(monkeypatch):
+    client, session_module, models, *_ = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        session.add(
+            models.Photo(
+                object_key="foreign",
+                taken_at=datetime.now(UTC),
+                mode="MOBILE",
+                customer_id="c2",
+                hash="h",
+            )
+        )
+        session.commit()
+    finally:
+        session_gen.close()
+    import app.api.routes.photos as photos_module
+
+    def failing_enqueue(payloads):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(photos_module, "enqueue_ingest_many", failing_enqueue)
+    items = [_batch_item("foreign"), _batch_item("b1")]
+    r = client.post("/photos/batch", json={"items": items}, headers=auth_headers())
+    assert r.status_code == 200
+    first, second = r.json()["items"]
+    assert first["status"] == "failed" and first["photo"] is None
+    assert second["status"] == "created"
+    assert second["error"] == "enqueue failed"
+
+
+def test_photo_batch_ingest_concurrent_retry(monkeypatch):
+    client, session_module, models, s3_stub, called = make_client(monkeypatch)
+    import app.api.routes.photos as photos_module
+
+    original = photos_module.find_nearest_locations
+    raced = []
+
+    def racing_lookup(session, points, customer_id=None):
+        # The other retry commits "b1" after this request checked for existing rows.
+        if not raced:
+            raced.append(True)
+            other_gen = session_module.get_session()
+            other = next(other_gen)
+            try:
+                other.add(
+                    models.Photo(
+                        object_key="b1",
+                        taken_at=datetime(2024, 1, 1, tzinfo=UTC),
+                        mode="MOBILE",
+                        customer_id="c1",
+                        hash="",
+                        status="PENDING",
+                    )
+                )
+                other.commit()
+            finally:
+                other_gen.close()
+        return original(session, points, customer_id)
+
+    monkeypatch.setattr(photos_module, "find_nearest_locations", racing_lookup)
+    items = [_batch_item("b1"), _batch_item("b2")]
+    r = client.post("/photos/batch", json={"items": items}, headers=auth_headers())
+    assert r.status_code == 200
+    assert [i["status"] for i in r.json()["items"]] == ["exists", "created"]
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        assert len(session.exec(select(models.Photo)).all()) == 2
+    finally:
+        session_gen.close()
+
+
+def test_photo_batch_ingest_too_large(monkeypatch):
+    client, *_ = make_client(monkeypatch)
+    monkeypatch.setattr(settings, "photo_batch_max_items", 1)
+    items = [_batch_item("b1"), _batch_item("b2")]
+    r = client.post("/photos/batch", json={"items": items}, headers=auth_headers())
+    assert r.status_code == 400
+
+
+def test_photo_ingest_retry_returns_existing_photo(monkeypatch):
+    client, session_module, models, s3_stub, called = make_client(monkeypatch)
+    payload = {
+        "object_key": "k1",
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "FIXED_SITE",
+        "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+    }
+    r1 = client.post("/photos", json=payload, headers=auth_headers())
+    assert r1.status_code == 201
+    s3_stub.puts.clear()
+    called.clear()
+
+    r2 = client.post("/photos", json=payload, headers=auth_headers())
+    assert r2.status_code == 201
+    assert r2.json() == r1.json()
+    assert r2.headers["Idempotent-Replayed"] == "true"
+    assert s3_stub.puts == {}
+    # The worker has not added pHash and thumbnails yet: enqueue again.
+    assert called["payload"]["photo_id"] == r1.json()["id"]
+    called.clear()
+
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        photos = session.exec(select(models.Photo)).all()
+        assert len(photos) == 1
+        photos[0].phash = "ffff0000ffff0000"
+        session.add(photos[0])
+        session.commit()
+    finally:
+        session_gen.close()
+
+    r3 = client.post("/photos", json=payload, headers=auth_headers())
+    assert r3.status_code == 201
+    assert called == {}
+
+
+def test_photo_ingest_retry_enqueues_pending_photo_again(monkeypatch):
+    client, _, _, _, called = make_client(monkeypatch)
+    monkeypatch.setattr(settings, "ingest_fast_ack", True)
+    payload = {
+        "object_key": "k1",
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "FIXED_SITE",
+        "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+    }
+    r1 = client.post("/photos", json=payload, headers=auth_headers())
+    assert r1.json()["status"] == "PENDING"
+    called.clear()
+
+    r2 = client.post("/photos", json=payload, headers=auth_headers())
+    assert r2.headers["Idempotent-Replayed"] == "true"
+    assert called["payload"]["photo_id"] == r1.json()["id"]
+    assert called["payload"]["object_key"] == "k1"
+
+
+def test_photo_ingest_idempotency_key(monkeypatch):
+    client, session_module, models, s3_stub, called = make_client(monkeypatch)
+    payload = {
+        "object_key": "k1",
+        "taken_at": "2024-01-01T00:00:00Z",
+        "mode": "FIXED_SITE",
+        "ad_hoc_spot": {"lat": 52.52, "lon": 13.405},
+    }
+    headers = {**auth_headers(), "Idempotency-Key": "upload-1"}
+    r1 = client.post("/photos", json=payload, headers=headers)
+    assert r1.status_code == 201
+    assert "Idempotent-Replayed" not in r1.headers
+
+    import app.api.routes.photos as photos_module
+
+    def no_db(*args, **kwargs):
+        raise AssertionError("replay must not query photos")
+
+    monkeypatch.setattr(photos_module, "_photo_by_object_key", no_db)
+    r2 = client.post("/photos", json=payload, headers=headers)
+    assert r2.status_code == 201
+    assert r2.json() == r1.json()
+    assert r2.headers["Idempotent-Replayed"] == "true"
+
+    r3 = client.post("/photos", json={**payload, "object_key": "k2"}, headers=headers)
+    assert r3.status_code == 422
+
+
+def test_similar_photos(monkeypatch):
+    client, session_module, models, *_ = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        ids = []
+        for key, phash, customer_id in [
+            ("a", "ffff0000ffff0000", "c1"),
+            ("b", "ffff0000ffff00ff", "c1"),
+            ("c", "0000ffff0000ffff", "c1"),
+            ("d", "ffff0000ffff0000", "c2"),
+        ]:
+            photo = models.Photo(
+                object_key=key,
+                taken_at=datetime.now(UTC),
+                mode="MOBILE",
+                customer_id=customer_id,
+                hash=key,
+                phash=phash,
+            )
+            session.add(photo)
+            session.commit()
+            session.refresh(photo)
+            ids.append(photo.id)
+    finally:
+        session_gen.close()
+
+    r = client.get(f"/photos/{ids[0]}/similar", headers=auth_headers())
+    assert r.status_code == 200
+    assert [(i["photo"]["id"], i["distance"]) for i in r.json()["items"]] == [(ids[1], 8)]
+
+    r = client.get(f"/photos/{ids[0]}/similar?distance=4", headers=auth_headers())
+    assert r.json()["items"] == []
+
+    r = client.get(f"/photos/{ids[3]}/similar", headers=auth_headers())
+    assert r.status_code == 404
@@ -0,0 +1,56 @@
+from datetime import date, datetime
+
+from app.core.config import settings
+from app.core.storage import InMemoryObjectStore
+from app.db.models import Photo
+from app.services import renditions
+
+
+def _photo(**kwargs):
+    fields = {"object_key": "k1", "hash": "abc", **kwargs}
+    return Photo(taken_at=datetime(2024, 1, 1), mode="m", customer_id="c1", **fields)
+
+
+def test_rendition_key_is_content_addressed():
+    day = date(2024, 5, 1)
+    assert renditions.rendition_key(_photo(), None, day) == "renditions/abc/default/2024-05-01.jpg"
+    assert renditions.rendition_key(_photo(object_key="other"), "agency", day) == (
+        "renditions/abc/agency/2024-05-01.jpg"
+    )
+    odd = renditions.rendition_key(_photo(), "../x y", day)
+    assert odd.startswith("renditions/abc/p-") and ".." not in odd
+    pending = renditions.rendition_key(_photo(hash=""), None, day)
+    assert pending.startswith("renditions/key-")
+
+
+def test_get_or_create_rendition_renders_once(monkeypatch):
+    store = InMemoryObjectStore()
+    store.put_object(Bucket=settings.s3_bucket, Key="k1", Body=b"img")
+    calls = []
+    monkeypatch.setattr(
+        renditions, "apply_watermark", lambda data, day: calls.append(data) or b"wm"
+    )
+    day = date(2024, 5, 1)
+    key = renditions.get_or_create_rendition(store, _photo(), None, day)
+    renditions._known.clear()
+    assert renditions.get_or_create_rendition(store, _photo(), None, day) == key
+    assert calls == [b"img"]
+    assert store.objects[(settings.s3_bucket, key)] == b"wm"
+
+
+def test_sweep_renditions_deletes_expired(monkeypatch):
+    store = InMemoryObjectStore()
+    for key in [
+        "renditions/abc/default/2024-04-28.jpg",
+        "renditions/abc/default/2024-04-30.jpg",
+        "renditions/abc/default/2024-05-01.jpg",
+        "k1",
+    ]:
+        store.put_object(Bucket=settings.s3_bucket, Key=key, Body=b"x")
+    monkeypatch.setattr(settings, "rendition_retention_days", 1)
+    assert renditions.sweep_renditions(store, today=date(2024, 5, 1)) == 1
+    assert sorted(k for _b, k in store.objects) == [
+        "k1",
+        "renditions/abc/default/2024-04-30.jpg",
+        "renditions/abc/default/2024-05-01.jpg",
+    ]
@@ -6,6 +6,7 @@ from sqlmodel import SQLModel, select
 
 from app.core.config import settings
 from app.core.security import create_access_token
+from app.services.share_tokens import hash_token
 
 
 def make_client(monkeypatch):
@@ -329,6 +330,13 @@ class _FakeS3:
     def delete_object(self, Bucket, Key):  # pragma: no cover - stub
         self.deleted.append((Key, self.objects.pop(Key, None)))
 
+    def head_object(self, Bucket, Key):  # pragma: no cover - stub
+        from botocore.exceptions import ClientError
+
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
 
 def test_public_share_list(monkeypatch):
     client, session_module, models = make_client(monkeypatch)
@@ -380,6 +388,7 @@ def test_public_share_list(monkeypatch):
             order_id=order.id,
             customer_id="c1",
             url=f"{settings.share_base_url}/tok1",
+            token_hash=hash_token("tok1"),
         )
         session.add(share)
         session.commit()
@@ -416,12 +425,13 @@ def test_public_share_photo(monkeypatch):
             order_id=order.id,
             customer_id="c1",
             url=f"{settings.share_base_url}/tok1",
+            token_hash=hash_token("tok1"),
         )
         session.add(share)
         session.commit()
     finally:
         session_gen.close()
-    monkeypatch.setattr("app.api.routes.shares._s3_client", lambda: _FakeS3())
+    monkeypatch.setattr("app.api.routes.shares.get_s3_client", lambda: _FakeS3())
     r = client.get(f"/public/shares/tok1/photos/{photo_id}")
     assert r.status_code == 200
     data = r.json()
@@ -453,17 +463,56 @@ def test_public_share_expired(monkeypatch):
             order_id=order.id,
             customer_id="c1",
             url=f"{settings.share_base_url}/tok1",
+            token_hash=hash_token("tok1"),
             expires_at=datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=1),
         )
         session.add(share)
         session.commit()
     finally:
         session_gen.close()
-    monkeypatch.setattr("app.api.routes.shares._s3_client", lambda: _FakeS3())
+    monkeypatch.setattr("app.api.routes.shares.get_s3_client", lambda: _FakeS3())
     r = client.get(f"/public/shares/tok1/photos/{photo_id}")
     assert r.status_code == 404
 
 
+def test_public_share_lookup_cached_and_invalidated_on_revoke(monkeypatch):
+    client, session_module, models = make_client(monkeypatch)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    try:
+        order = models.Order(customer_id="c1", name="o1", status="NEW")
+        session.add(order)
+        session.commit()
+        session.refresh(order)
+        order_id = order.id
+    finally:
+        session_gen.close()
+    r = client.post("/shares", json={"order_id": order_id}, headers=auth_headers())
+    assert r.status_code == 201
+    share = r.json()
+    token = share["url"].rsplit("/", 1)[-1]
+
+    import app.services.share_tokens as share_tokens
+
+    calls = []
+    original = share_tokens.Session.exec
+
+    def counting_exec(self, *args, **kwargs):
+        calls.append(args)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(share_tokens.Session, "exec", counting_exec)
+    assert client.get(f"/public/shares/{token}/photos").status_code == 200
+    lookups = len(calls)
+    assert client.get(f"/public/shares/{token}/photos").status_code == 200
+    # second request reuses the cached share: only the photo query hits the DB
+    assert len(calls) - lookups == lookups - 1
+
+    r = client.post(f"/shares/{share['id']}/revoke", headers=auth_headers())
+    assert r.status_code == 204
+    assert client.get(f"/public/shares/{token}/photos").status_code == 404
+
+
 def test_public_share_watermark(monkeypatch):
     client, session_module, models = make_client(monkeypatch)
     session_gen = session_module.get_session()
@@ -489,6 +538,7 @@ def test_public_share_watermark(monkeypatch):
             order_id=order.id,
             customer_id="c1",
             url=f"{settings.share_base_url}/tok1",
+            token_hash=hash_token("tok1"),
             download_allowed=False,
         )
         session.add(share)
@@ -497,20 +547,29 @@ def test_public_share_watermark(monkeypatch):
         session_gen.close()
 
     fake_s3 = _FakeS3()
-    monkeypatch.setattr("app.api.routes.shares._s3_client", lambda: fake_s3)
+    monkeypatch.setattr("app.api.routes.shares.get_s3_client", lambda: fake_s3)
     called = {}
 
-    def fake_watermark(data):
+    def fake_watermark(data, day=None):
         called["ok"] = True
         return b"wm"
 
-    monkeypatch.setattr("app.api.routes.shares.apply_watermark", fake_watermark)
-    monkeypatch.setattr("app.api.routes.shares.settings.s3_presign_ttl", 0)
+    monkeypatch.setattr("app.services.renditions.apply_watermark", fake_watermark)
 
     r = client.get(f"/public/shares/tok1/photos/{photo_id}")
     assert r.status_code == 200
-    assert called.get("ok")
-    assert ("k1-wm", b"wm") in fake_s3.deleted
+    assert called.pop("ok")
+    today = datetime.now(UTC).date().isoformat()
+    wm_key = f"renditions/h/default/{today}.jpg"
+    assert fake_s3.objects[wm_key] == b"wm"
+    assert r.json()["original_url"].endswith(wm_key)
+    assert r.json()["thumbnail_url"].endswith("thumbnails/k1.jpg")
+
+    # The rendition is reused instead of being rebuilt.
+    r = client.get(f"/public/shares/tok1/photos/{photo_id}")
+    assert r.status_code == 200
+    assert "ok" not in called
+    assert not fake_s3.deleted
 
 
 def test_public_share_rate_limit(monkeypatch):
@@ -538,13 +597,14 @@ def test_public_share_rate_limit(monkeypatch):
             order_id=order.id,
             customer_id="c1",
             url=f"{settings.share_base_url}/tok1",
+            token_hash=hash_token("tok1"),
         )
         session.add(share)
         session.commit()
     finally:
         session_gen.close()
 
-    monkeypatch.setattr("app.api.routes.shares._s3_client", lambda: _FakeS3())
+    monkeypatch.setattr("app.api.routes.shares.get_s3_client", lambda: _FakeS3())
     for _ in range(5):
         client.get(f"/public/shares/tok1/photos/{photo_id}")
     r = client.get(f"/public/shares/tok1/photos/{photo_id}")
@@ -0,0 +1,92 @@
+import importlib
+import random
+from datetime import UTC, datetime
+
+from sqlmodel import SQLModel
+
+from app.services.similarity import PhashIndex, find_similar
+
+
+def setup_db(monkeypatch):
+    monkeypatch.setenv("DOKUSUITE_DATABASE_URL", "sqlite:///:memory:")
+    import app.db.session as session_module
+    session_module = importlib.reload(session_module)
+    import app.db.models as models
+    SQLModel.metadata.drop_all(session_module.engine)
+    SQLModel.metadata.create_all(session_module.engine)
+    session_gen = session_module.get_session()
+    session = next(session_gen)
+    return session, session_gen, models
+
+
+def _flip(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    base = rng.getrandbits(64)
+    hashes = {i: _flip(base, *rng.sample(range(64), rng.randint(0, 20))) for i in range(500)}
+    hashes.update({1000 + i: rng.getrandbits(64) for i in range(500)})
+    index = PhashIndex()
+    for photo_id, value in hashes.items():
+        index.upsert(photo_id, value)
+    for distance in (0, 3, 8, 12, 16):
+        expected = sorted(
+            ((value ^ base).bit_count(), photo_id)
+            for photo_id, value in hashes.items()
+            if (value ^ base).bit_count() <= distance
+        )
+        assert index.search(base, distance) == [(pid, dist) for dist, pid in expected]
+
+
+def test_index_remove_and_update():
+    index = PhashIndex()
+    index.upsert(1, 0xFFFF)
+    index.upsert(1, 0)
+    assert len(index) == 1
+    assert index.search(0xFFFF, 4) == []
+    assert index.search(0, 0) == [(1, 0)]
+    index.remove(1)
+    assert index.search(0, 16) == []
+
+
+def test_find_similar_tracks_changes(monkeypatch):
+    session, session_gen, models = setup_db(monkeypatch)
+    try:
+        def photo(key, phash, customer_id="c1"):
+            p = models.Photo(
+                object_key=key,
+                taken_at=datetime.now(UTC),
+                mode="MOBILE",
+                customer_id=customer_id,
+                hash=key,
+                phash=phash,
+            )
+            session.add(p)
+            session.commit()
+            session.refresh(p)
+            return p
+
+        a = photo("a", "ffff0000ffff0000")
+        b = photo("b", "ffff0000ffff0001")
+        photo("c", "0000ffff0000ffff")
+        photo("d", "ffff0000ffff0000", customer_id="c2")
+        assert find_similar(session, a, 4) == [(b.id, 1)]
+
+        # photos processed later (e.g. by the ingestion worker) are picked up
+        e = photo("e", None)
+        e.phash = "ffff0000ffff0003"
+        session.add(e)
+        session.commit()
+        assert find_similar(session, a, 4) == [(b.id, 1), (e.id, 2)]
+
+        b.deleted_at = datetime.now(UTC)
+        session.add(b)
+        session.commit()
+        assert find_similar(session, a, 4) == [(e.id, 2)]
+        assert find_similar(session, a, 4, limit=0) == []
+    finally:
+        session_gen.close()
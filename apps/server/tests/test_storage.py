@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.core import storage
+
+
+def test_get_s3_client_is_shared(monkeypatch):
+    created = []
+
+    def fake_create():
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(storage, "_create_client", fake_create)
+    storage.set_s3_client(None)
+    try:
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(storage.get_s3_client()))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(created) == 1
+        assert all(r is created[0] for r in results)
+    finally:
+        storage.set_s3_client(None)
+
+
+def test_memory_backend_from_settings(monkeypatch):
+    monkeypatch.setattr(storage.settings, "storage_backend", "memory")
+    storage.set_s3_client(None)
+    try:
+        assert isinstance(storage.get_s3_client(), storage.InMemoryObjectStore)
+    finally:
+        storage.set_s3_client(None)
+
+
+@pytest.mark.parametrize("kind", ["memory", "filesystem"])
+def test_object_store_roundtrip(kind, tmp_path):
+    if kind == "memory":
+        store = storage.InMemoryObjectStore()
+    else:
+        store = storage.FileSystemObjectStore(tmp_path)
+    store.put_object(Bucket="b", Key="thumbnails/k1.jpg", Body=b"data")
+    assert store.get_object(Bucket="b", Key="thumbnails/k1.jpg")["Body"].read() == b"data"
+    assert store.generate_presigned_url(
+        "get_object", Params={"Bucket": "b", "Key": "thumbnails/k1.jpg"}, ExpiresIn=60
+    )
+    store.delete_object(Bucket="b", Key="thumbnails/k1.jpg")
+    with pytest.raises(ClientError):
+        store.get_object(Bucket="b", Key="thumbnails/k1.jpg")
+
+
+def test_filesystem_store_rejects_escaping_keys(tmp_path):
+    store = storage.FileSystemObjectStore(tmp_path / "root")
+    with pytest.raises(ValueError):
+        store.put_object(Bucket="b", Key="../../evil", Body=b"x")
+
+
+def test_multipart_writer_uploads_parts():
+    store = storage.InMemoryObjectStore()
+    with storage.MultipartWriter(store, "b", "big", part_size=4) as out:
+        out.write(b"abcdefghij")
+        assert out.parts == 2
+        assert out.tell() == 10
+    assert store.objects[("b", "big")] == b"abcdefghij"
+    assert not store.uploads
+
+
+def test_multipart_writer_small_output_uses_put_object():
+    store = storage.InMemoryObjectStore()
+    with storage.MultipartWriter(store, "b", "small", part_size=1024) as out:
+        out.write(b"abc")
+    assert store.objects[("b", "small")] == b"abc"
+
+
+def test_multipart_writer_aborts_on_error():
+    store = storage.InMemoryObjectStore()
+    with pytest.raises(RuntimeError):
+        with storage.MultipartWriter(store, "b", "broken", part_size=4) as out:
+            out.write(b"abcdefgh")
+            raise RuntimeError("boom")
+    assert ("b", "broken") not in store.objects
+    assert not store.uploads
+
+
+def test_filesystem_store_multipart(tmp_path):
+    store = storage.FileSystemObjectStore(tmp_path)
+    with storage.MultipartWriter(store, "b", "exports/x.zip", part_size=3) as out:
+        out.write(b"1234567")
+    assert (tmp_path / "b" / "exports" / "x.zip").read_bytes() == b"1234567"
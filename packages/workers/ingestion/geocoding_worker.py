@@ -0,0 +1,18 @@
+from rq import Connection, Worker
+
+from .queue import _redis, geocoding_queue
+
+
+def run_worker() -> None:
+    """Start a worker to process geocoding jobs.
+
+    A separate process, so batches waiting on the provider's rate limit and
+    timeouts never hold up ingest jobs.
+    """
+    with Connection(_redis):
+        worker = Worker([geocoding_queue])
+        worker.work()
+
+
+if __name__ == "__main__":
+    run_worker()
@@ -1,98 +1,214 @@
 from __future__ import annotations
 
-import hashlib
-import io
+import logging
+import tempfile
+import time
 import uuid
-import zipfile
 from typing import Any
 
-import boto3
-from openpyxl import Workbook
-from PIL import Image
-
-from app.services.phash import compute_phash
+from rq import get_current_job
 
 from app.core.config import settings
+from app.core.storage import MultipartWriter, get_s3_client, upload_fileobj
 from app.db.models import Photo
 from app.db.session import get_session
-
-
-def _s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.s3_endpoint_url,
-        region_name=settings.s3_region,
-        aws_access_key_id=settings.s3_access_key,
-        aws_secret_access_key=settings.s3_secret_key,
-    )
+from app.services import renditions
+from app.services.exports import (
+    ZipEntry,
+    excel_rows_query,
+    photo_export_query,
+    write_excel,
+    write_photo_zip,
+    zip_entry,
+)
+from app.services.geocoding import GeocodingService
+from app.services.ingestion import (
+    FAILED,
+    INGESTED,
+    PENDING,
+    add_derivatives,
+    fill_addresses,
+    process_upload,
+)
+from app.services.media import process_image, thumbnail_key
+
+logger = logging.getLogger(__name__)
+
+
+_geocoder = GeocodingService()
 
 
 def ingest(payload: dict[str, Any]) -> None:
-    """Ingest a photo by generating a thumbnail and persisting the hash."""
-    client = _s3_client()
-    key = payload["object_key"]
-    obj = client.get_object(Bucket=settings.s3_bucket, Key=key)
-    data = obj["Body"].read()
-
-    # Create thumbnail
-    with Image.open(io.BytesIO(data)) as img:
-        img.thumbnail((256, 256))
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG")
-    thumb_key = f"thumbnails/{key}.jpg"
-    client.put_object(Bucket=settings.s3_bucket, Key=thumb_key, Body=buf.getvalue())
+    """Run the ingest pipeline for an uploaded photo.
 
-    # Compute hash values
-    digest = hashlib.sha256(data).hexdigest()
-    phash = compute_phash(data)
-
-    # Persist hash to database
+    The original is fetched and decoded once; orientation, thumbnails, hashes,
+    duplicate detection and location matching all derive from that read.
+    Photos the API already hashed and matched only get pHash and thumbnails;
+    fully processed photos are skipped.
+    """
+    client = get_s3_client()
     session_gen = get_session()
     session = next(session_gen)
     try:
         photo = session.get(Photo, payload.get("photo_id"))
-        if photo:
-            photo.hash = digest
-            photo.phash = phash
+        if photo is None:
+            _write_thumbnails(client, payload["object_key"])
+            return
+        if photo.phash is not None and photo.status not in (PENDING, FAILED):
+            return
+        spot = payload.get("ad_hoc_spot") or {}
+        try:
+            if photo.hash and photo.status == INGESTED:
+                result = add_derivatives(session, photo, client)
+            else:
+                result = process_upload(
+                    session, photo, client, spot.get("lat"), spot.get("lon")
+                )
+            session.add(photo)
+            session.commit()
+        except Exception:
+            session.rollback()
+            photo.status = FAILED
             session.add(photo)
             session.commit()
+            raise
+        _record_timings(photo.id, result.timings)
+    finally:
+        session_gen.close()
+
+
+def geocode(payload: dict[str, Any]) -> dict[str, int]:
+    """Fill ``Photo.note`` with reverse-geocoded addresses.
+
+    ``payload["spots"]`` lists ``{"photo_id", "lat", "lon"}``; spots in the
+    same grid cell share one provider call.
+    """
+    session_gen = get_session()
+    session = next(session_gen)
+    try:
+        updated = fill_addresses(session, payload.get("spots") or [], _geocoder)
+        session.commit()
+    finally:
+        session_gen.close()
+    return {"updated": updated}
+
+
+def _write_thumbnails(client: Any, key: str) -> None:
+    obj = client.get_object(Bucket=settings.s3_bucket, Key=key)
+    result = process_image(obj["Body"].read(), settings.thumbnail_sizes)
+    for size, thumb in result.thumbnails.items():
+        client.put_object(Bucket=settings.s3_bucket, Key=thumbnail_key(key, size), Body=thumb)
+
+
+def _record_timings(photo_id: int | None, timings: dict[str, float]) -> None:
+    logger.info("photo ingested", extra={"photo_id": photo_id, "timings": timings})
+    job = get_current_job()
+    if job is not None:
+        job.meta["timings"] = timings
+        job.save_meta()
+
+
+class _Progress:
+    """Throttled progress reporting into the current RQ job's ``meta``."""
+
+    def __init__(self, total: int | None, interval: float = 1.0) -> None:
+        self.job = get_current_job()
+        self.total = total
+        self.interval = interval
+        self._last = 0.0
+
+    def update(self, done: int, force: bool = False, **extra: Any) -> None:
+        if self.job is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        self.job.meta["progress"] = {"done": done, "total": self.total, **extra}
+        self.job.save_meta()
+
+
+def _zip_entries(payload: dict[str, Any]) -> list[ZipEntry]:
+    if payload.get("orderId") is None and not payload.get("photoIds"):
+        return []
+    session_gen = get_session()
+    session = next(session_gen)
+    try:
+        return [zip_entry(p) for p in session.exec(photo_export_query(payload))]
     finally:
         session_gen.close()
 
 
 def export_zip(payload: dict[str, Any] | None = None) -> dict[str, str]:
-    """Generate a ZIP archive and upload it to S3.
+    """Stream the photos of an order (or an explicit selection) into a ZIP on S3.
+
+    Objects are fetched in parallel and copied chunk-wise into a ZIP stream
+    that is uploaded with S3 multipart upload, so memory stays flat regardless
+    of the export size. Progress is reported in ``job.meta["progress"]``.
 
     The returned dictionary is stored as the job result so that the API can
     expose a download link once the job has finished.
     """
-    client = _s3_client()
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w") as zf:
-        zf.writestr("export.txt", "export")
-    buffer.seek(0)
+    payload = payload or {}
+    client = get_s3_client()
+    entries = _zip_entries(payload)
     key = f"exports/{uuid.uuid4()}.zip"
-    client.put_object(Bucket=settings.s3_bucket, Key=key, Body=buffer.getvalue())
+    progress = _Progress(len(entries))
+    with MultipartWriter(client, settings.s3_bucket, key) as out:
+        skipped = write_photo_zip(
+            client,
+            entries,
+            out,
+            progress=lambda done, skipped: progress.update(
+                done, bytes=out.tell(), skipped=len(skipped)
+            ),
+        )
+        size = out.tell()
+    progress.update(len(entries), force=True, bytes=size, skipped=len(skipped))
+    if skipped:
+        logger.warning("export objects missing", extra={"result_key": key, "missing": skipped})
     return {"result_key": key}
 
 
+# Filters that select rows for an Excel export; without any the sheet is empty.
+_EXCEL_FILTERS = ("customerId", "orderId", "calendarWeek", "siteId", "photoIds")
+
+
 def export_excel(payload: dict[str, Any] | None = None) -> dict[str, str]:
-    """Generate an Excel file and upload it to S3.
+    """Export the site list for a filter (order, customer, week, site) as Excel.
+
+    Rows are streamed from a server-side cursor into a write-only workbook
+    spooled to a temporary file, which is then uploaded in bounded-size
+    parts, so memory stays constant for large lists.
 
     The returned dictionary is stored as the job result so that the API can
     expose a download link once the job has finished.
     """
-    client = _s3_client()
-    wb = Workbook()
-    ws = wb.active
-    ws.append(["id", "value"])
-    if payload and payload.get("rows"):
-        for row in payload["rows"]:
-            ws.append(row)
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
+    payload = payload or {}
+    client = get_s3_client()
     key = f"exports/{uuid.uuid4()}.xlsx"
-    client.put_object(Bucket=settings.s3_bucket, Key=key, Body=buf.getvalue())
+    progress = _Progress(None)
+    session_gen = get_session()
+    session = next(session_gen)
+    try:
+        rows: Any = []
+        if any(payload.get(name) for name in _EXCEL_FILTERS):
+            query = excel_rows_query(payload).execution_options(
+                yield_per=settings.export_batch_size
+            )
+            rows = session.exec(query)
+        with tempfile.SpooledTemporaryFile(max_size=settings.export_spool_max_size) as spool:
+            count = write_excel(rows, spool, progress=progress.update)
+            spool.seek(0)
+            upload_fileobj(client, settings.s3_bucket, key, spool)
+    finally:
+        session_gen.close()
+    progress.update(count, force=True)
     return {"result_key": key}
 
+
+def sweep_renditions(payload: dict[str, Any] | None = None) -> dict[str, int]:
+    """Delete expired watermarked share renditions from S3."""
+    deleted = renditions.sweep_renditions(get_s3_client())
+    logger.info("renditions swept", extra={"deleted": deleted})
+    return {"deleted": deleted}
@@ -2,18 +2,54 @@ import os
 from typing import Any
 
 from redis import Redis
-from rq import Queue
+from rq import Queue, Retry
 
 from . import jobs
 
 _redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 _redis = Redis.from_url(_redis_url)
 queue = Queue("ingestion", connection=_redis)
+# Separate queue so a slow or throttled geocoding provider never delays ingest.
+geocoding_queue = Queue("geocoding", connection=_redis)
+# Provider timeouts are retried; cells resolved before the failure are cached.
+_geocode_retry = Retry(max=3, interval=[10, 60, 300])
+
+
+def _geocode_spots(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    spots = []
+    for payload in payloads:
+        spot = payload.get("ad_hoc_spot") or {}
+        if payload.get("photo_id") is not None and spot.get("lat") is not None:
+            spots.append({"photo_id": payload["photo_id"], "lat": spot["lat"], "lon": spot["lon"]})
+    return spots
 
 
 def enqueue_ingest(payload: dict[str, Any]) -> Any:
-    """Enqueue an ingestion job."""
-    return queue.enqueue(jobs.ingest, payload)
+    """Enqueue an ingestion job and, for photos with a spot, its geocoding."""
+    job = queue.enqueue(jobs.ingest, payload)
+    spots = _geocode_spots([payload])
+    if spots:
+        geocoding_queue.enqueue(jobs.geocode, {"spots": spots}, retry=_geocode_retry)
+    return job
+
+
+def enqueue_ingest_many(payloads: list[dict[str, Any]]) -> list[Any]:
+    """Enqueue several ingestion jobs and one geocoding job in one Redis round trip."""
+    if not payloads:
+        return []
+    spots = _geocode_spots(payloads)
+    with _redis.pipeline() as pipe:
+        jobs_ = queue.enqueue_many(
+            [Queue.prepare_data(jobs.ingest, (payload,)) for payload in payloads],
+            pipeline=pipe,
+        )
+        if spots:
+            geocoding_queue.enqueue_many(
+                [Queue.prepare_data(jobs.geocode, ({"spots": spots},), retry=_geocode_retry)],
+                pipeline=pipe,
+            )
+        pipe.execute()
+    return jobs_
 
 
 def enqueue_export_zip(payload: dict[str, Any] | None = None) -> Any:
@@ -24,3 +60,8 @@ def enqueue_export_zip(payload: dict[str, Any] | None = None) -> Any:
 def enqueue_export_excel(payload: dict[str, Any] | None = None) -> Any:
     """Enqueue an Excel export job."""
     return queue.enqueue(jobs.export_excel, payload)
+
+
+def enqueue_rendition_sweep() -> Any:
+    """Enqueue a sweep of expired share renditions."""
+    return queue.enqueue(jobs.sweep_renditions)
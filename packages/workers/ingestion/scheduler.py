@@ -0,0 +1,14 @@
+import time
+
+from .queue import enqueue_rendition_sweep
+
+
+def run_scheduler(interval_seconds: int = 3600) -> None:
+    """Periodically enqueue sweeps of expired share renditions."""
+    while True:  # pragma: no cover - long running
+        enqueue_rendition_sweep()
+        time.sleep(interval_seconds)
+
+
+if __name__ == "__main__":
+    run_scheduler()
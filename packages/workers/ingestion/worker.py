@@ -1,10 +1,13 @@
 from rq import Connection, Worker
 
-from .queue import queue, _redis
+from .queue import _redis, queue
 
 
 def run_worker() -> None:
-    """Start a worker to process ingestion jobs."""
+    """Start a worker to process ingestion jobs.
+
+    Geocoding jobs run in their own process (:mod:`.geocoding_worker`).
+    """
     with Connection(_redis):
         worker = Worker([queue])
         worker.work()
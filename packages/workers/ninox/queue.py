@@ -14,3 +14,10 @@ def enqueue_ninox_sync(payload: dict[str, Any] | None = None) -> Any:
     from .worker import sync_ninox
 
     return queue.enqueue(sync_ninox, payload)
+
+
+def enqueue_location_snapshots() -> Any:
+    """Enqueue a rebuild of the per-customer location snapshots."""
+    from .worker import build_location_snapshots
+
+    return queue.enqueue(build_location_snapshots)
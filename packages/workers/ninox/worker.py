@@ -1,19 +1,47 @@
+from dataclasses import asdict
 from typing import Any
 
-from rq import Connection, Worker
+from rq import Connection, Worker, get_current_job
 
 from app.db.session import get_session
+from app.services.location_snapshots import LocationSnapshotService
 from app.services.ninox_sync import NinoxSyncService
 
-from .queue import _redis, queue
+from .queue import _redis, enqueue_location_snapshots, queue
 
 
-def sync_ninox(payload: dict[str, Any] | None = None) -> None:
-    """Job to synchronise Ninox data."""
+def sync_ninox(payload: dict[str, Any] | None = None) -> dict[str, dict[str, int]]:
+    """Job to synchronise Ninox data.
+
+    Records synced per table are reported in ``job.meta["progress"]``; the
+    created/updated/deleted/skipped counters are the job result. Afterwards
+    the location snapshots are rebuilt in a follow-up job.
+    """
+    job = get_current_job()
+    progress: dict[str, int] = {}
+
+    def report(table: str, done: int) -> None:
+        if job is not None:
+            progress[table] = done
+            job.meta["progress"] = progress
+            job.save_meta()
+
+    session_gen = get_session()
+    session = next(session_gen)
+    try:
+        stats = NinoxSyncService(session, progress=report).run(payload)
+    finally:
+        session_gen.close()
+    enqueue_location_snapshots()
+    return stats
+
+
+def build_location_snapshots() -> list[dict[str, Any]]:
+    """Job to rebuild the location snapshots of customers with changes."""
     session_gen = get_session()
     session = next(session_gen)
     try:
-        NinoxSyncService(session).run(payload)
+        return [asdict(result) for result in LocationSnapshotService(session).build_all()]
     finally:
         session_gen.close()
 